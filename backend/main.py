@@ -1,61 +1,267 @@
-from fastapi import APIRouter, HTTPException, BackgroundTasks
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
 from apps.backend.models.schemas import (
     ResumeInput, 
+    BatchResumeInput,
+    ResumeVariant,
     ResumeSectionInput, 
     GeneratedResume,
     ChatMessage,
     CompilePDFRequest,
+    PreviewPagesRequest,
     FileTreeNode
 )
-from apps.backend.services.gemini_service import generate_resume_content, edit_resume_section
-from apps.backend.services.latex_service import compile_latex_to_pdf, compile_latex_to_image
+from apps.backend.services.gemini_service import (
+    agenerate_resume_content,
+    agenerate_resume_slots,
+    aedit_resume_section,
+    astream_resume_content,
+    astream_resume_edit,
+    extract_latex_document
+)
+from apps.backend.services.latex_service import compile_latex_to_pdf, compile_latex_to_bytes, compile_latex_to_image, compile_latex_to_pages, TEMP_DIR
+from apps.backend.services.compile_cache import compile_cache
+from apps.backend.services.toolchain import toolchain
+from apps.backend.services.preview_service import preview_service, IMAGE_FORMATS
+from apps.backend.services.streaming import sse_event, SSE_HEADERS
+from apps.backend.services.preamble_format import preamble_formats
+from apps.backend.services.latex_workers import latex_workers
+from apps.backend.services.compile_sandbox import compile_sandbox
+from apps.backend.services.workspace import workspace
+from apps.backend.services.llm_cache import llm_cache
+from apps.backend.services.cache_backend import shared_cache
+from apps.backend.services.llm_resilience import llm_caller, LLMDeadlineExceeded
+from apps.backend.services.template_slots import load_slot_templates, render_slots, slot_names
+from apps.backend.services.compile_executor import compile_executor, CompileQueueFull, CompileDeadlineExceeded
+from apps.backend.services.pdf_service import pdf_service
+from apps.backend.routes.auth import api_user
+from apps.backend.routes.errors import compile_unavailable, invalid_latex
+from apps.backend.services.latex_validator import check_latex, LatexValidationError
+from typing import AsyncIterator
+import asyncio
 import os
 
 
 app = APIRouter()
 
-# Simple in-memory storage for demo purposes
-# In production, use Redis or a database
-user_sessions = {}
+# First-frame resolution for progressive previews
+PREVIEW_THUMBNAIL_DPI = int(os.getenv("PREVIEW_THUMBNAIL_DPI", "48"))
+
+# Batch generation limits
+BATCH_MAX_VARIANTS = int(os.getenv("BATCH_MAX_VARIANTS", "20"))
+BATCH_LLM_CONCURRENCY = int(os.getenv("BATCH_LLM_CONCURRENCY", "4"))
+BATCH_COMPILE_CONCURRENCY = int(os.getenv("BATCH_COMPILE_CONCURRENCY", "2"))
+
+# Streamed generations start compiling once this marker arrives
+END_DOCUMENT = "\\end{document}"
 
 # Load templates
 TEMPLATES = {}
 TEMPLATE_DIR = os.path.join(os.path.dirname(__file__), "templates")
 try:
     for filename in os.listdir(TEMPLATE_DIR):
-        if filename.endswith(".tex"):
+        if filename.endswith(".tex") and not filename.endswith(".slots.tex"):
             name = filename.replace(".tex", "")
             with open(os.path.join(TEMPLATE_DIR, filename), "r", encoding="utf-8") as f:
                 TEMPLATES[name] = f.read()
 except FileNotFoundError:
     print("Templates directory not found. Please ensure 'templates' directory exists.")
 
-@app.post("/generate", response_model=GeneratedResume)
-async def generate_resume(data: ResumeInput):
-    template_content = TEMPLATES.get(data.template_id)
+# Slot versions of the templates (templates/<name>.slots.tex) for mode="slots"
+SLOT_TEMPLATES = load_slot_templates(TEMPLATE_DIR, list(TEMPLATES.keys()))
+
+async def compile_artifact(latex_content: str):
+    """
+    Validate, then compile into the compile cache.
+    Returns (success, artifact_id, error) like pdf_service.compile_to_artifact;
+    documents that fail validation never take a compile slot.
+    """
+    try:
+        check_latex(latex_content)
+    except LatexValidationError as e:
+        return False, None, str(e)
+    return await compile_executor.run(pdf_service.compile_to_artifact, latex_content)
+
+def get_template(template_id: str) -> str:
+    """Template source by id, falling back to the first template"""
+    template_content = TEMPLATES.get(template_id)
     if not template_content:
         # Fallback to a default if ID not found, or error
         if TEMPLATES:
              template_content = list(TEMPLATES.values())[0]
         else:
             raise HTTPException(status_code=500, detail="No templates available")
-            
+    return template_content
+
+async def stream_latex(chunks: AsyncIterator[str]) -> AsyncIterator[str]:
+    """
+    Relay LLM output as server-sent events.
+    Emits "token" for each chunk, "compiled" (or "compile_error") for an
+    early compile started as soon as \end{document} arrives, "document" with
+    the final LaTeX, then "done". Failures are sent as an "error" event,
+    with "timeout": true when the model missed its deadline or stalled.
+    """
+    text = ""
+    early_latex = None
+    early_compile = None
+    compiled_sent = False
+
+    def compiled_event(task: "asyncio.Task") -> str:
+        try:
+            success, artifact_id, error = task.result()
+        except Exception as e:
+            success, artifact_id, error = False, None, str(e)
+        if not success:
+            return sse_event("compile_error", {"detail": error or "Unknown compilation error"})
+        return sse_event("compiled", {"artifact_id": artifact_id, "pdf_url": f"/api/artifacts/{artifact_id}"})
+
     try:
-        latex_code = generate_resume_content(
+        async for chunk in chunks:
+            text += chunk
+            yield sse_event("token", {"text": chunk})
+            # Only look at the tail, in case the marker spans two chunks
+            if early_compile is None and END_DOCUMENT in text[-(len(chunk) + len(END_DOCUMENT)):]:
+                early_latex = extract_latex_document(text)
+                if early_latex:
+                    early_compile = asyncio.ensure_future(compile_artifact(early_latex))
+            if early_compile is not None and not compiled_sent and early_compile.done():
+                compiled_sent = True
+                yield compiled_event(early_compile)
+
+        latex = extract_latex_document(text)
+        if not latex:
+            yield sse_event("error", {"detail": "The model did not return a complete LaTeX document"})
+            return
+        yield sse_event("document", {"latex_content": latex})
+
+        if latex != early_latex:
+            # The early compile was for different source (or never started)
+            early_compile = asyncio.ensure_future(compile_artifact(latex))
+            compiled_sent = False
+        if not compiled_sent:
+            await asyncio.wait([early_compile])
+            yield compiled_event(early_compile)
+        yield sse_event("done", {})
+    except LLMDeadlineExceeded as e:
+        yield sse_event("error", {"detail": str(e), "timeout": True})
+    except Exception as e:
+        yield sse_event("error", {"detail": str(e)})
+
+async def generate_latex(data: ResumeInput) -> str:
+    """Generate a resume's LaTeX in the requested mode"""
+    template_content = get_template(data.template_id)
+    slot_template = SLOT_TEMPLATES.get(data.template_id)
+    if data.mode == "slots" and slot_template:
+        slots = await agenerate_resume_slots(
             role=data.role,
             skills=data.skills,
             experience=data.experience,
-            template_latex=template_content
+            slot_names=slot_names(slot_template)
         )
+        return render_slots(slot_template, slots)
+
+    return await agenerate_resume_content(
+        role=data.role,
+        skills=data.skills,
+        experience=data.experience,
+        template_latex=template_content
+    )
+
+@app.post("/generate", response_model=GeneratedResume, dependencies=[Depends(api_user)])
+async def generate_resume(data: ResumeInput):
+    try:
+        latex_code = await generate_latex(data)
         return GeneratedResume(latex_content=latex_code)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/preview")
+@app.post("/generate/batch", dependencies=[Depends(api_user)])
+async def generate_resume_batch(data: BatchResumeInput):
+    """
+    Generate (and compile) one resume per (role, template_id) variant.
+    LLM calls and compiles run concurrently, bounded by BATCH_LLM_CONCURRENCY
+    and BATCH_COMPILE_CONCURRENCY. Each finished variant is sent as a
+    "result" server-sent event in completion order:
+    {"index", "role", "template_id", "latex_content", "artifact_id", "pdf_url", "error"}
+    followed by "done" with {"count", "failed"}.
+    """
+    if not data.variants:
+        raise HTTPException(status_code=400, detail="No variants given")
+    if len(data.variants) > BATCH_MAX_VARIANTS:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_VARIANTS} variants per batch")
+
+    llm_slots = asyncio.Semaphore(BATCH_LLM_CONCURRENCY)
+    compile_slots = asyncio.Semaphore(BATCH_COMPILE_CONCURRENCY)
+
+    async def run_variant(index: int, variant: ResumeVariant) -> dict:
+        result = {
+            "index": index,
+            "role": variant.role,
+            "template_id": variant.template_id,
+            "latex_content": None,
+            "artifact_id": None,
+            "pdf_url": None,
+            "error": None
+        }
+        try:
+            async with llm_slots:
+                result["latex_content"] = await generate_latex(ResumeInput(
+                    role=variant.role,
+                    skills=data.skills,
+                    experience=data.experience,
+                    template_id=variant.template_id,
+                    mode=data.mode
+                ))
+            if data.compile:
+                async with compile_slots:
+                    success, artifact_id, error = await compile_artifact(result["latex_content"])
+                if success:
+                    result["artifact_id"] = artifact_id
+                    result["pdf_url"] = f"/api/artifacts/{artifact_id}"
+                else:
+                    result["error"] = error or "Unknown compilation error"
+        except HTTPException as e:
+            result["error"] = e.detail
+        except Exception as e:
+            result["error"] = str(e)
+        return result
+
+    async def results():
+        tasks = [asyncio.ensure_future(run_variant(index, variant)) for index, variant in enumerate(data.variants)]
+        failed = 0
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                result = await next_done
+                failed += 1 if result["error"] else 0
+                yield sse_event("result", result)
+            yield sse_event("done", {"count": len(tasks), "failed": failed})
+        finally:
+            # Client went away: don't keep spending LLM quota on the rest
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(results(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+@app.post("/generate/stream", dependencies=[Depends(api_user)])
+async def generate_resume_stream(data: ResumeInput):
+    """
+    Streaming /generate over server-sent events (see stream_latex for the events).
+    """
+    chunks = astream_resume_content(
+        role=data.role,
+        skills=data.skills,
+        experience=data.experience,
+        template_latex=get_template(data.template_id)
+    )
+    return StreamingResponse(stream_latex(chunks), media_type="text/event-stream", headers=SSE_HEADERS)
+
+@app.post("/preview", dependencies=[Depends(api_user)])
 async def preview_resume(data: GeneratedResume):
     try:
-        pdf_path = compile_latex_to_pdf(data.latex_content)
+        check_latex(data.latex_content)
+        pdf_path = await compile_executor.run(compile_latex_to_pdf, data.latex_content, data.session_id, data.engine)
         if not pdf_path or not os.path.exists(pdf_path):
              raise HTTPException(status_code=500, detail="PDF generation failed")
         
@@ -65,92 +271,265 @@ async def preview_resume(data: GeneratedResume):
         # Ideally, return a unique ID to fetch the PDF.
         filename = os.path.basename(pdf_path)
         return {"pdf_url": f"/api/download/{filename}"}
+    except HTTPException:
+        raise
+    except LatexValidationError as e:
+        raise invalid_latex(e)
+    except (CompileQueueFull, CompileDeadlineExceeded) as e:
+        raise compile_unavailable(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/download/{filename}")
 async def download_pdf(filename: str):
     # Security check: ensure filename is safe and exists in temp dir
-    # This is a naive check; production needs better path traversal protection
-    if ".." in filename or "/" in filename:
+    if ".." in filename or "/" in filename or "\\" in filename:
         raise HTTPException(status_code=400, detail="Invalid filename")
         
-    temp_dir = "temp_latex" 
-    file_path = os.path.join(temp_dir, filename)
-    if not os.path.exists(file_path):
+    # Resolve against the directory latex_service writes to, not the CWD
+    file_path = os.path.join(TEMP_DIR, filename)
+    if not os.path.isfile(file_path):
         raise HTTPException(status_code=404, detail="File not found")
         
-    return FileResponse(file_path, media_type="application/pdf", filename="resume.pdf")
+    # Preview files get a unique name per compile, so they can be cached
+    return FileResponse(
+        file_path,
+        media_type="application/pdf",
+        filename="resume.pdf",
+        headers={"Cache-Control": "private, max-age=3600"}
+    )
 
-@app.post("/edit", response_model=GeneratedResume)
+@app.post("/edit", response_model=GeneratedResume, dependencies=[Depends(api_user)])
 async def edit_resume(data: ResumeSectionInput):
     try:
-        # data.current_content is the FULL latex content or a CHUNK?
-        # The prompt in gemini_service expects 'current_latex'.
-        # If the user sends a chunk, we might need to know WHERE to replace it.
-        # For this "agent check-wise searching" requirement:
-        # We'll assume the client sends the FULL latex and the instruction.
-        # The LLM will identify the relevant part and change it.
-        
-        # If we wanted purely chunk-based:
-        # 1. LLM identifies chunk to change
-        # 2. LLM rewrites chunk
-        # 3. Code replaces chunk
-        # For simplicity and robustness with LLMs, sending context is better.
-        
-        new_latex = edit_resume_section(data.current_content, data.instruction)
+        # The client sends the FULL latex and the instruction.
+        # With section_name, only that \section is sent to the LLM and the
+        # rewritten section is spliced back in; otherwise the LLM sees the
+        # whole document and identifies the relevant part itself.
+        new_latex = await aedit_resume_section(data.current_content, data.instruction, data.section_name)
         return GeneratedResume(latex_content=new_latex)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/compile-preview")
+@app.post("/compile-preview", dependencies=[Depends(api_user)])
 async def compile_preview(data: GeneratedResume):
     """
     Compiles LaTeX to a base64-encoded PNG image for real-time preview.
     Returns: {"image": "data:image/png;base64,..."}
     """
     try:
-        image_data = compile_latex_to_image(data.latex_content)
+        check_latex(data.latex_content)
+        image_data = await compile_executor.run(compile_latex_to_image, data.latex_content, data.session_id, data.engine)
         return {"image": image_data}
+    except LatexValidationError as e:
+        raise invalid_latex(e)
+    except (CompileQueueFull, CompileDeadlineExceeded) as e:
+        raise compile_unavailable(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/preview-pages", dependencies=[Depends(api_user)])
+async def preview_pages(data: PreviewPagesRequest):
+    """
+    Compiles LaTeX and returns images only for pages that changed.
+    Returns: {"version": str, "page_count": int,
+              "pages": [{"index", "digest", "changed", "image"}]}
+    Pages whose digest is listed in known_pages come back with image = null.
+    """
+    try:
+        check_latex(data.latex_content)
+        return await compile_executor.run(
+            compile_latex_to_pages,
+            data.latex_content,
+            data.known_pages,
+            data.dpi,
+            data.image_format,
+            data.session_id,
+            data.engine
+        )
+    except LatexValidationError as e:
+        raise invalid_latex(e)
+    except (CompileQueueFull, CompileDeadlineExceeded) as e:
+        raise compile_unavailable(e)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/compile-preview/stream", dependencies=[Depends(api_user)])
+async def compile_preview_stream(data: PreviewPagesRequest):
+    """
+    Progressive preview over server-sent events.
+    Emits "thumbnail" (low-DPI JPEG pages) as soon as the PDF exists, then
+    "full" (pages at the requested DPI/format), then "done". Both frames use
+    the /preview-pages payload; a failure after streaming starts is sent as
+    an "error" event.
+    """
+    if data.image_format.lower() not in IMAGE_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported image format '{data.image_format}'")
+
+    try:
+        check_latex(data.latex_content)
+        pdf_bytes = await compile_executor.run(
+            compile_latex_to_bytes, data.latex_content, data.session_id, data.engine
+        )
+    except LatexValidationError as e:
+        raise invalid_latex(e)
+    except (CompileQueueFull, CompileDeadlineExceeded) as e:
+        raise compile_unavailable(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    async def frames():
+        try:
+            thumbnail = await compile_executor.run(
+                preview_service.render_pages,
+                pdf_bytes,
+                known_pages=data.known_pages,
+                dpi=min(PREVIEW_THUMBNAIL_DPI, data.dpi),
+                image_format="jpeg"
+            )
+            yield sse_event("thumbnail", thumbnail)
+
+            full = await compile_executor.run(
+                preview_service.render_pages,
+                pdf_bytes,
+                known_pages=data.known_pages,
+                dpi=data.dpi,
+                image_format=data.image_format
+            )
+            yield sse_event("full", full)
+            yield sse_event("done", {"version": full["version"]})
+        except Exception as e:
+            yield sse_event("error", {"detail": str(e)})
+
+    return StreamingResponse(frames(), media_type="text/event-stream", headers=SSE_HEADERS)
+
 @app.get("/templates")
 async def get_templates():
     return [{"id": name, "name": name.title()} for name in TEMPLATES.keys()]
 
-@app.post("/compile-pdf-base64")
+@app.get("/toolchain")
+async def get_toolchain():
+    """
+    List the detected LaTeX engines and rasterizers with their capabilities.
+    """
+    return toolchain.describe()
+
+@app.post("/compile-pdf-base64", dependencies=[Depends(api_user)])
 async def compile_pdf_base64(data: CompilePDFRequest):
     """
     Compile LaTeX to PDF and return as base64 data URL for iframe embedding.
     Returns: {"success": bool, "pdf": "data:application/pdf;base64,...", "error": str}
+    Documents that fail validation also get "errors": [{"kind", "message", "line", "column"}].
     """
-    from apps.backend.services.pdf_service import pdf_service
-    
     try:
-        success, base64_pdf, error = pdf_service.compile_and_encode(data.latex_content)
+        check_latex(data.latex_content)
+    except LatexValidationError as e:
+        return {"success": False, "pdf": None, "error": str(e), "errors": [issue.to_dict() for issue in e.issues]}
+
+    try:
+        success, base64_pdf, error = await compile_executor.run(pdf_service.compile_and_encode, data.latex_content, data.session_id, data.engine)
         
         if success:
             return {"success": True, "pdf": base64_pdf, "error": None}
         else:
             return {"success": False, "pdf": None, "error": error or "Unknown compilation error"}
+    except (CompileQueueFull, CompileDeadlineExceeded) as e:
+        raise compile_unavailable(e)
     except Exception as e:
         return {"success": False, "pdf": None, "error": str(e)}
 
-@app.post("/chat-edit")
+@app.get("/compile-cache/stats")
+async def get_compile_cache_stats():
+    """
+    Report compile cache hits, misses and tier sizes.
+    """
+    return compile_cache.stats()
+
+@app.get("/compile-formats/stats")
+async def get_compile_format_stats():
+    """
+    Report precompiled preamble format hits, builds and fallbacks.
+    """
+    return preamble_formats.stats()
+
+@app.get("/compile-executor/stats")
+async def get_compile_executor_stats():
+    """
+    Report compile worker utilisation and queue depth.
+    """
+    return compile_executor.stats()
+
+@app.get("/preview-cache/stats")
+async def get_preview_cache_stats():
+    """
+    Report page raster cache hits and rendered page counts.
+    """
+    return preview_service.stats()
+
+@app.get("/compile-workers/stats")
+async def get_compile_worker_stats():
+    """
+    Report warm LaTeX worker pool size and reuse.
+    """
+    return latex_workers.stats()
+
+@app.get("/compile-limits/stats")
+async def get_compile_limit_stats():
+    """
+    Report TeX runs stopped by a timeout or resource limit, by reason.
+    """
+    return compile_sandbox.stats()
+
+@app.get("/llm-cache/stats")
+async def get_llm_cache_stats():
+    """
+    Report LLM response cache hits and coalesced duplicate calls.
+    """
+    return llm_cache.stats()
+
+@app.get("/cache-backend/stats")
+async def get_cache_backend_stats():
+    """
+    Report the cache/session backend in use (memory, sqlite or redis) and its hit rate.
+    """
+    return shared_cache.stats()
+
+@app.get("/llm/stats")
+async def get_llm_stats():
+    """
+    Report LLM retries, hedges, deadline failures and recent latency percentiles.
+    """
+    return llm_caller.stats()
+
+@app.get("/workspace/stats")
+async def get_workspace_stats():
+    """
+    Report disk usage per workspace area and janitor activity.
+    """
+    return workspace.stats()
+
+@app.post("/chat-edit", dependencies=[Depends(api_user)])
 async def chat_edit(data: ChatMessage):
     """
     Use AI to edit LaTeX based on user instruction.
     Returns: {"latex_content": str, "success": bool, "error": str}
     """
     try:
-        from apps.backend.services.gemini_service import edit_resume_section
-        
-        new_latex = edit_resume_section(data.latex_content, data.message)
+        new_latex = await aedit_resume_section(data.latex_content, data.message)
         return {"latex_content": new_latex, "success": True, "error": None}
     except Exception as e:
         return {"latex_content": data.latex_content, "success": False, "error": str(e)}
 
+@app.post("/chat-edit/stream", dependencies=[Depends(api_user)])
+async def chat_edit_stream(data: ChatMessage):
+    """
+    Streaming /chat-edit over server-sent events (see stream_latex for the events).
+    """
+    chunks = astream_resume_edit(data.latex_content, data.message)
+    return StreamingResponse(stream_latex(chunks), media_type="text/event-stream", headers=SSE_HEADERS)
+
 @app.get("/file-tree")
 async def get_file_tree():
     """
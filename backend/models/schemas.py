@@ -6,15 +6,29 @@ class ResumeInput(BaseModel):
     skills: List[str]
     experience: str
     template_id: str = "modern"
+    mode: str = "latex"  # 'latex' (model writes the document) or 'slots' (model fills typed fields)
+
+class ResumeVariant(BaseModel):
+    role: str
+    template_id: str = "modern"
+
+class BatchResumeInput(BaseModel):
+    skills: List[str]
+    experience: str
+    variants: List[ResumeVariant]
+    mode: str = "latex"
+    compile: bool = True  # also compile each result into a PDF artifact
 
 class ResumeSectionInput(BaseModel):
-    section_name: str
+    section_name: Optional[str] = None  # edit only this \section; omit to edit the whole document
     current_content: str
     instruction: str
 
 class GeneratedResume(BaseModel):
     latex_content: str
     markdown_content: Optional[str] = None
+    session_id: Optional[str] = None  # keeps .aux files between compiles of one document
+    engine: Optional[str] = None  # pdflatex, xelatex, lualatex or tectonic
 
 class ChatMessage(BaseModel):
     message: str
@@ -22,6 +36,16 @@ class ChatMessage(BaseModel):
 
 class CompilePDFRequest(BaseModel):
     latex_content: str
+    session_id: Optional[str] = None
+    engine: Optional[str] = None
+
+class PreviewPagesRequest(BaseModel):
+    latex_content: str
+    known_pages: List[str] = []  # page digests the client already displays
+    dpi: int = 150
+    image_format: str = "png"  # png, webp or jpeg
+    session_id: Optional[str] = None
+    engine: Optional[str] = None
 
 class FileTreeNode(BaseModel):
     name: str
@@ -50,3 +74,31 @@ class TokenResponse(BaseModel):
     user: UserResponse
 
 
+
+# Saved resume schemas
+class ResumeCreate(BaseModel):
+    title: str
+    latex_content: str
+    template_id: Optional[str] = None
+
+class ResumeVersionCreate(BaseModel):
+    latex_content: str
+    note: Optional[str] = None
+
+class ResumeVersionSummary(BaseModel):
+    version: int
+    source_hash: str
+    note: Optional[str] = None
+    createdAt: str
+    pdf_url: str
+
+class ResumeSummary(BaseModel):
+    id: int
+    title: str
+    template_id: Optional[str] = None
+    latest_version: int
+    updatedAt: str
+
+class ResumeDetail(ResumeSummary):
+    latex_content: str
+    versions: List[ResumeVersionSummary]
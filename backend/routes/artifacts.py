@@ -0,0 +1,149 @@
+import os
+import re
+from typing import Iterator, Optional, Tuple
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from apps.backend.models.schemas import CompilePDFRequest
+from apps.backend.services.compile_cache import compile_cache
+from apps.backend.services.compile_executor import compile_executor, CompileQueueFull, CompileDeadlineExceeded
+from apps.backend.routes.auth import api_user
+from apps.backend.routes.errors import compile_unavailable
+from apps.backend.services.latex_validator import check_latex, LatexValidationError
+from apps.backend.services.pdf_service import pdf_service
+
+artifacts_router = APIRouter(tags=["Artifacts"])
+
+ARTIFACT_ID_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+CHUNK_SIZE = 64 * 1024
+
+# Artifacts are addressed by the hash of their source, so they never change
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+def _etag(artifact_id: str) -> str:
+    return f'"{artifact_id}"'
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Check an If-None-Match header against a strong ETag"""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+
+def _parse_range(range_header: str, size: int) -> Optional[Tuple[int, int]]:
+    """Parse a single bytes range into inclusive (start, end); None if unsatisfiable"""
+    match = RANGE_PATTERN.match(range_header.strip())
+    if not match or (not match.group(1) and not match.group(2)):
+        return None
+    start_text, end_text = match.groups()
+    if start_text:
+        start = int(start_text)
+        end = int(end_text) if end_text else size - 1
+    else:
+        # Suffix range: the last N bytes
+        length = int(end_text)
+        if length == 0:
+            return None
+        start = max(0, size - length)
+        end = size - 1
+    end = min(end, size - 1)
+    if start > end or start >= size:
+        return None
+    return start, end
+
+
+def _iter_file_range(path: str, start: int, end: int) -> Iterator[bytes]:
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+@artifacts_router.get("/artifacts/{artifact_id}")
+async def get_artifact(artifact_id: str, request: Request):
+    """
+    Serve a compiled PDF by its content hash.
+    Supports If-None-Match (304) and single byte Range requests (206).
+    """
+    if not ARTIFACT_ID_PATTERN.match(artifact_id):
+        raise HTTPException(status_code=400, detail="Invalid artifact id")
+
+    etag = _etag(artifact_id)
+    headers = {
+        "ETag": etag,
+        "Cache-Control": IMMUTABLE_CACHE_CONTROL,
+        "Accept-Ranges": "bytes",
+    }
+
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    path = compile_cache.materialize(artifact_id)
+    if not path:
+        raise HTTPException(status_code=404, detail="Artifact not found")
+
+    range_header = request.headers.get("range")
+    if range_header:
+        if_range = request.headers.get("if-range")
+        if not if_range or if_range.strip() == etag:
+            size = os.path.getsize(path)
+            byte_range = _parse_range(range_header, size)
+            if byte_range is None:
+                return Response(
+                    status_code=416,
+                    headers={**headers, "Content-Range": f"bytes */{size}"},
+                )
+            start, end = byte_range
+            return StreamingResponse(
+                _iter_file_range(path, start, end),
+                status_code=206,
+                media_type="application/pdf",
+                headers={
+                    **headers,
+                    "Content-Range": f"bytes {start}-{end}/{size}",
+                    "Content-Length": str(end - start + 1),
+                },
+            )
+
+    # FileResponse streams from disk (sendfile where the server supports it)
+    return FileResponse(path, media_type="application/pdf", headers=headers)
+
+
+@artifacts_router.post("/compile-pdf", dependencies=[Depends(api_user)])
+async def compile_pdf(data: CompilePDFRequest):
+    """
+    Compile LaTeX into a content-addressed PDF artifact.
+    Returns: {"success": bool, "artifact_id": str, "pdf_url": "/api/artifacts/...", "error": str}
+    Documents that fail validation also get "errors": [{"kind", "message", "line", "column"}].
+    """
+    try:
+        check_latex(data.latex_content)
+    except LatexValidationError as e:
+        return {"success": False, "artifact_id": None, "pdf_url": None, "error": str(e), "errors": [issue.to_dict() for issue in e.issues]}
+
+    try:
+        success, artifact_id, error = await compile_executor.run(
+            pdf_service.compile_to_artifact, data.latex_content, data.session_id, data.engine
+        )
+    except (CompileQueueFull, CompileDeadlineExceeded) as e:
+        raise compile_unavailable(e)
+    except Exception as e:
+        return {"success": False, "artifact_id": None, "pdf_url": None, "error": str(e)}
+
+    if not success:
+        return {"success": False, "artifact_id": None, "pdf_url": None, "error": error or "Unknown compilation error"}
+    return {
+        "success": True,
+        "artifact_id": artifact_id,
+        "pdf_url": f"/api/artifacts/{artifact_id}",
+        "error": None,
+    }
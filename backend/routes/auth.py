@@ -1,12 +1,63 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException
 from apps.backend.models.schemas import UserSignup, UserLogin, TokenResponse, UserResponse
-from apps.backend.services.auth_service import hash_password, verify_password, create_access_token
+from apps.backend.services.auth_service import create_access_token, needs_rehash
+from apps.backend.services.password_hasher import password_hasher, HashQueueFull
+from apps.backend.services import auth_cache
+from apps.backend.services.auth_cache import decode_token, parse_bearer, user_cache
 from prisma import Prisma
+from prisma.models import User
 from datetime import datetime
+from typing import Optional
+import os
 
 auth_router = APIRouter(tags=["Authentication"])
 prisma = Prisma()
 
+# Require a signed-in user on the generate/edit/compile endpoints
+AUTH_REQUIRED = os.getenv("AUTH_REQUIRED", "false").lower() in ("1", "true", "yes")
+
+
+async def get_optional_user(authorization: Optional[str] = Header(None)) -> Optional[User]:
+    """
+    The user behind a Bearer token, or None for missing/invalid tokens.
+    Decoded claims and users are cached, so repeat requests skip both the
+    JWT verification and the database.
+    """
+    token = parse_bearer(authorization)
+    if not token:
+        return None
+    claims = decode_token(token)
+    user_id = claims.get("user_id") if claims else None
+    if user_id is None:
+        return None
+
+    user = user_cache.get(user_id)
+    if user is None:
+        user = await prisma.user.find_unique(where={"id": user_id})
+        if user is None:
+            return None
+        user_cache.put(user_id, user)
+    return user
+
+
+async def get_current_user(user: Optional[User] = Depends(get_optional_user)) -> User:
+    """Dependency for endpoints that need a signed-in user"""
+    if user is None:
+        raise HTTPException(status_code=401, detail="Not authenticated", headers={"WWW-Authenticate": "Bearer"})
+    return user
+
+
+async def api_user(user: Optional[User] = Depends(get_optional_user)) -> Optional[User]:
+    """Dependency for the expensive endpoints: optional unless AUTH_REQUIRED is set"""
+    if AUTH_REQUIRED:
+        return await get_current_user(user)
+    return user
+
+
+def hasher_busy(e: HashQueueFull) -> HTTPException:
+    """Map a full hashing queue to 503 with Retry-After"""
+    return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
 
 @auth_router.get("/test-db")
 async def test_database_connection():
@@ -29,16 +80,41 @@ async def test_database_connection():
 @auth_router.post("/test-signup-simple")
 async def test_signup_simple(user_data: UserSignup):
     """Simple signup test without error handling"""
-    from apps.backend.services.auth_service import hash_password
-    
     # Just hash the password and return
     try:
-        hashed = hash_password(user_data.password)
+        hashed = await password_hasher.hash(user_data.password)
         return {"message": "Password hashed successfully", "length": len(hashed)}
     except Exception as e:
         return {"error": str(e), "type": type(e).__name__}
 
 
+@auth_router.get("/me", response_model=UserResponse)
+async def get_me(user: User = Depends(get_current_user)):
+    """The signed-in user"""
+    return UserResponse(
+        id=user.id,
+        email=user.email,
+        name=user.name,
+        createdAt=user.createdAt.isoformat()
+    )
+
+
+@auth_router.get("/cache/stats")
+async def get_auth_cache_stats():
+    """
+    Report hit rates of the JWT claims and user caches.
+    """
+    return auth_cache.stats()
+
+
+@auth_router.get("/hasher/stats")
+async def get_hasher_stats():
+    """
+    Report password hashing queue depth and queue-wait/hash-time percentiles.
+    """
+    return password_hasher.stats()
+
+
 @auth_router.post("/signup", response_model=TokenResponse)
 async def signup(user_data: UserSignup):
     """Register a new user"""
@@ -53,7 +129,7 @@ async def signup(user_data: UserSignup):
         
         print("Hashing password...")
         # Hash password
-        hashed_password = hash_password(user_data.password)
+        hashed_password = await password_hasher.hash(user_data.password)
         print(f"Password hashed successfully")
         
         # Create user
@@ -85,6 +161,8 @@ async def signup(user_data: UserSignup):
         
     except HTTPException:
         raise
+    except HashQueueFull as e:
+        raise hasher_busy(e)
     except Exception as e:
         print(f"SIGNUP ERROR: {type(e).__name__}: {str(e)}")
         import traceback
@@ -104,9 +182,17 @@ async def login(credentials: UserLogin):
             raise HTTPException(status_code=401, detail="Invalid credentials")
         
         # Verify password
-        if not verify_password(credentials.password, user.password):
+        if not await password_hasher.verify(credentials.password, user.password):
             raise HTTPException(status_code=401, detail="Invalid credentials")
         
+        # Upgrade hashes made with an older BCRYPT_ROUNDS while we have the password
+        if needs_rehash(user.password):
+            await prisma.user.update(
+                where={"id": user.id},
+                data={"password": await password_hasher.hash(credentials.password)}
+            )
+            user_cache.invalidate(user.id)
+        
         # Create token
         access_token = create_access_token(data={"sub": user.email, "user_id": user.id})
         
@@ -125,5 +211,7 @@ async def login(credentials: UserLogin):
         
     except HTTPException:
         raise
+    except HashQueueFull as e:
+        raise hasher_busy(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Login failed: {str(e)}")
@@ -0,0 +1,16 @@
+from fastapi import HTTPException
+
+from apps.backend.services.compile_executor import CompileQueueFull
+from apps.backend.services.latex_validator import LatexValidationError
+
+
+def compile_unavailable(e: Exception) -> HTTPException:
+    """Map compile executor backpressure errors to HTTP responses"""
+    if isinstance(e, CompileQueueFull):
+        return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    return HTTPException(status_code=504, detail=str(e))
+
+
+def invalid_latex(e: LatexValidationError) -> HTTPException:
+    """422 with every validation issue and its line/column"""
+    return HTTPException(status_code=422, detail=e.to_dict())
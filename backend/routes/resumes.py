@@ -0,0 +1,242 @@
+import base64
+from pathlib import Path
+from typing import List
+
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import FileResponse
+from prisma.errors import UniqueViolationError
+from prisma.models import User
+from apps.backend.models.schemas import (
+    ResumeCreate,
+    ResumeVersionCreate,
+    ResumeVersionSummary,
+    ResumeSummary,
+    ResumeDetail
+)
+from apps.backend.routes.auth import prisma, get_current_user
+from apps.backend.routes.errors import compile_unavailable, invalid_latex
+from apps.backend.services.blob_store import blob_store, source_digest
+from apps.backend.services.compile_cache import compile_cache
+from apps.backend.services.compile_executor import compile_executor, CompileQueueFull, CompileDeadlineExceeded
+from apps.backend.services.latex_validator import check_latex, LatexValidationError
+from apps.backend.services.pdf_service import pdf_service
+from apps.backend.services.preview_service import preview_service
+
+resumes_router = APIRouter(tags=["Resumes"])
+
+# Blobs never change once written
+IMMUTABLE_CACHE_CONTROL = "private, max-age=31536000, immutable"
+PREVIEW_DPI = 96
+# Attempts to claim the next version number when saves race
+SAVE_ATTEMPTS = 3
+
+
+def version_summary(resume_id: int, version) -> ResumeVersionSummary:
+    return ResumeVersionSummary(
+        version=version.version,
+        source_hash=version.sourceHash,
+        note=version.note,
+        createdAt=version.createdAt.isoformat(),
+        pdf_url=f"/api/resumes/{resume_id}/versions/{version.version}/pdf"
+    )
+
+
+async def get_owned_resume(resume_id: int, user: User, include_versions: bool = False):
+    """A resume of the current user (404 for other users' resumes)"""
+    include = {"versions": {"order_by": {"version": "desc"}}} if include_versions else None
+    resume = await prisma.resume.find_first(where={"id": resume_id, "userId": user.id}, include=include)
+    if not resume:
+        raise HTTPException(status_code=404, detail="Resume not found")
+    return resume
+
+
+async def get_version(resume_id: int, version: int, user: User):
+    await get_owned_resume(resume_id, user)
+    found = await prisma.resumeversion.find_unique(
+        where={"resumeId_version": {"resumeId": resume_id, "version": version}}
+    )
+    if not found:
+        raise HTTPException(status_code=404, detail="Version not found")
+    return found
+
+
+async def latest_version(resume_id: int):
+    """Number and source hash of a resume's latest version (None if it has none), without loading any source"""
+    rows = await prisma.resumeversion.group_by(
+        ["version", "sourceHash"],
+        where={"resumeId": resume_id},
+        order={"version": "desc"},
+        take=1
+    )
+    return rows[0] if rows else None
+
+
+async def build_pdf(source_hash: str, latex_content: str) -> Path:
+    """The PDF blob for a source, compiling it only the first time"""
+    path = blob_store.find(source_hash, "pdf")
+    if path:
+        return path
+    try:
+        check_latex(latex_content)
+        success, artifact_id, error = await compile_executor.run(pdf_service.compile_to_artifact, latex_content)
+    except LatexValidationError as e:
+        raise invalid_latex(e)
+    except (CompileQueueFull, CompileDeadlineExceeded) as e:
+        raise compile_unavailable(e)
+    if not success:
+        raise HTTPException(status_code=422, detail=error or "Unknown compilation error")
+    pdf_bytes = compile_cache.get(artifact_id)
+    if pdf_bytes is None:
+        raise HTTPException(status_code=500, detail="Compiled PDF was evicted before it could be stored")
+    return blob_store.put(source_hash, "pdf", pdf_bytes)
+
+
+@resumes_router.get("/blob-store/stats")
+async def get_blob_store_stats():
+    """
+    Report blob store hits (PDFs and previews served without recompiling).
+    """
+    return blob_store.stats()
+
+
+@resumes_router.post("/resumes", response_model=ResumeDetail)
+async def create_resume(data: ResumeCreate, user: User = Depends(get_current_user)):
+    """Save a new resume as version 1"""
+    resume = await prisma.resume.create(
+        data={
+            "userId": user.id,
+            "title": data.title,
+            "templateId": data.template_id,
+            "versions": {
+                "create": [{
+                    "version": 1,
+                    "latexContent": data.latex_content,
+                    "sourceHash": source_digest(data.latex_content)
+                }]
+            }
+        },
+        include={"versions": True}
+    )
+    return ResumeDetail(
+        id=resume.id,
+        title=resume.title,
+        template_id=resume.templateId,
+        latest_version=1,
+        updatedAt=resume.updatedAt.isoformat(),
+        latex_content=data.latex_content,
+        versions=[version_summary(resume.id, version) for version in resume.versions]
+    )
+
+
+@resumes_router.get("/resumes", response_model=List[ResumeSummary])
+async def list_resumes(user: User = Depends(get_current_user)):
+    """The current user's resumes, most recently edited first"""
+    resumes = await prisma.resume.find_many(
+        where={"userId": user.id},
+        order={"updatedAt": "desc"},
+        include={"versions": {"order_by": {"version": "desc"}, "take": 1}}
+    )
+    return [
+        ResumeSummary(
+            id=resume.id,
+            title=resume.title,
+            template_id=resume.templateId,
+            latest_version=resume.versions[0].version if resume.versions else 0,
+            updatedAt=resume.updatedAt.isoformat()
+        )
+        for resume in resumes
+    ]
+
+
+@resumes_router.get("/resumes/{resume_id}", response_model=ResumeDetail)
+async def get_resume(resume_id: int, user: User = Depends(get_current_user)):
+    """A resume's latest source and its version history"""
+    resume = await get_owned_resume(resume_id, user, include_versions=True)
+    latest = resume.versions[0]
+    return ResumeDetail(
+        id=resume.id,
+        title=resume.title,
+        template_id=resume.templateId,
+        latest_version=latest.version,
+        updatedAt=resume.updatedAt.isoformat(),
+        latex_content=latest.latexContent,
+        versions=[version_summary(resume.id, version) for version in resume.versions]
+    )
+
+
+@resumes_router.post("/resumes/{resume_id}/versions", response_model=ResumeVersionSummary)
+async def create_version(resume_id: int, data: ResumeVersionCreate, user: User = Depends(get_current_user)):
+    """Save a new version; saving unchanged source returns the latest version"""
+    source_hash = source_digest(data.latex_content)
+    resume = await get_owned_resume(resume_id, user)
+    for _ in range(SAVE_ATTEMPTS):
+        latest = await latest_version(resume_id)
+        if latest and latest["sourceHash"] == source_hash:
+            unchanged = await prisma.resumeversion.find_unique(
+                where={"resumeId_version": {"resumeId": resume_id, "version": latest["version"]}}
+            )
+            return version_summary(resume_id, unchanged)
+
+        # (resumeId, version) is unique: a concurrent save that claimed this
+        # number makes the insert fail, and the next attempt takes the one after
+        try:
+            version = await prisma.resumeversion.create(
+                data={
+                    "resumeId": resume_id,
+                    "version": (latest["version"] if latest else 0) + 1,
+                    "latexContent": data.latex_content,
+                    "sourceHash": source_hash,
+                    "note": data.note
+                }
+            )
+        except UniqueViolationError:
+            continue
+        # Touch updatedAt so the resume list stays ordered by last edit
+        await prisma.resume.update(where={"id": resume_id}, data={"title": resume.title})
+        return version_summary(resume_id, version)
+    raise HTTPException(status_code=409, detail="Resume is being saved elsewhere, please retry")
+
+
+@resumes_router.get("/resumes/{resume_id}/versions/{version}")
+async def get_resume_version(resume_id: int, version: int, user: User = Depends(get_current_user)):
+    """The source of one version"""
+    found = await get_version(resume_id, version, user)
+    summary = version_summary(resume_id, found)
+    return {**summary.model_dump(), "latex_content": found.latexContent}
+
+
+@resumes_router.get("/resumes/{resume_id}/versions/{version}/pdf")
+async def get_resume_version_pdf(resume_id: int, version: int, user: User = Depends(get_current_user)):
+    """
+    The PDF of one version, from the blob store when any version with the
+    same source has been compiled before.
+    """
+    found = await get_version(resume_id, version, user)
+    path = await build_pdf(found.sourceHash, found.latexContent)
+    return FileResponse(
+        path,
+        media_type="application/pdf",
+        filename="resume.pdf",
+        headers={"ETag": f'"{found.sourceHash}"', "Cache-Control": IMMUTABLE_CACHE_CONTROL}
+    )
+
+
+@resumes_router.get("/resumes/{resume_id}/versions/{version}/preview")
+async def get_resume_version_preview(resume_id: int, version: int, user: User = Depends(get_current_user)):
+    """A PNG of the first page of one version, stored alongside its PDF"""
+    found = await get_version(resume_id, version, user)
+    path = blob_store.find(found.sourceHash, "png")
+    if not path:
+        pdf_path = await build_pdf(found.sourceHash, found.latexContent)
+        preview = await compile_executor.run(
+            preview_service.render_pages, pdf_path.read_bytes(), dpi=PREVIEW_DPI, max_pages=1
+        )
+        if not preview["pages"] or not preview["pages"][0]["image"]:
+            raise HTTPException(status_code=500, detail="Preview rendering failed")
+        image = base64.b64decode(preview["pages"][0]["image"].split(",", 1)[1])
+        path = blob_store.put(found.sourceHash, "png", image)
+    return FileResponse(
+        path,
+        media_type="image/png",
+        headers={"ETag": f'"{found.sourceHash}"', "Cache-Control": IMMUTABLE_CACHE_CONTROL}
+    )
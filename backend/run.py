@@ -9,6 +9,13 @@ sys.path.insert(0, str(Path(__file__).parent.parent.parent))
 
 from apps.backend.main import app as backend_router
 from apps.backend.routes.auth import auth_router, prisma
+from apps.backend.routes.artifacts import artifacts_router
+from apps.backend.routes.resumes import resumes_router
+from apps.backend.services.compile_executor import compile_executor
+from apps.backend.services.latex_workers import latex_workers
+from apps.backend.services.password_hasher import password_hasher
+from apps.backend.services.toolchain import toolchain, EngineUnavailable
+from apps.backend.services.workspace import workspace
 
 app = FastAPI(title="Res-Gen API")
 
@@ -27,16 +34,35 @@ async def startup():
     """Connect to database on startup"""
     await prisma.connect()
     print("✅ Database connected successfully!")
+    # Probe the TeX toolchain once instead of on every request
+    for tool in toolchain.detect().values():
+        print(f"🔧 Found {tool.name}: {tool.version}")
+    # Keep warm LaTeX workers ready for both compile paths
+    try:
+        engine = toolchain.engine()
+        if engine.supports_warm_workers:
+            latex_workers.prewarm(engine.path, halt_on_error=True)
+            latex_workers.prewarm(engine.path, halt_on_error=False)
+    except EngineUnavailable as e:
+        print(f"⚠️  {e}; PDFs will use the simple fallback renderer")
+    # Expire old outputs and keep temp_latex within its quota
+    workspace.start_janitor()
 
 @app.on_event("shutdown")
 async def shutdown():
     """Disconnect from database on shutdown"""
     await prisma.disconnect()
     print("👋 Database disconnected")
+    compile_executor.shutdown()
+    latex_workers.shutdown()
+    password_hasher.shutdown()
+    workspace.stop_janitor()
 
 # Mount backend routes with /api prefix
 app.include_router(backend_router, prefix="/api")
 app.include_router(auth_router, prefix="/api/auth")
+app.include_router(artifacts_router, prefix="/api")
+app.include_router(resumes_router, prefix="/api")
 
 @app.get("/")
 def read_root():
@@ -0,0 +1,106 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from apps.backend.services.auth_service import verify_token
+
+load_dotenv()
+
+# Cache settings
+AUTH_CLAIMS_TTL_SECONDS = float(os.getenv("AUTH_CLAIMS_TTL_SECONDS", "300"))
+AUTH_CLAIMS_MAX_ITEMS = int(os.getenv("AUTH_CLAIMS_MAX_ITEMS", "1024"))
+AUTH_USER_TTL_SECONDS = float(os.getenv("AUTH_USER_TTL_SECONDS", "60"))
+AUTH_USER_MAX_ITEMS = int(os.getenv("AUTH_USER_MAX_ITEMS", "1024"))
+
+
+class TTLCache:
+    """Thread-safe LRU whose entries also expire after a TTL"""
+
+    def __init__(self, ttl_seconds: float, max_items: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_items = max_items
+        self._entries: "OrderedDict[Any, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "expired": 0, "invalidated": 0}
+
+    def get(self, key: Any) -> Optional[Any]:
+        """Return a fresh cached value, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            expires_at, value = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                self._stats["expired"] += 1
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return value
+
+    def put(self, key: Any, value: Any, expires_at: Optional[float] = None) -> None:
+        """Store a value until min(now + ttl, expires_at) (wall-clock seconds)"""
+        if self.ttl_seconds <= 0 or self.max_items <= 0:
+            return
+        deadline = time.time() + self.ttl_seconds
+        if expires_at is not None:
+            deadline = min(deadline, expires_at)
+        with self._lock:
+            self._entries[key] = (deadline, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_items:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key: Any) -> None:
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self._stats["invalidated"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._stats)
+            stats["items"] = len(self._entries)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 3) if lookups else 0.0
+        return stats
+
+
+# Singleton instances: decoded JWT claims by token digest, users by id
+token_claims = TTLCache(AUTH_CLAIMS_TTL_SECONDS, AUTH_CLAIMS_MAX_ITEMS)
+user_cache = TTLCache(AUTH_USER_TTL_SECONDS, AUTH_USER_MAX_ITEMS)
+
+
+def parse_bearer(authorization: Optional[str]) -> Optional[str]:
+    """Token from an 'Authorization: Bearer <token>' header (whitespace tolerant)"""
+    if not authorization:
+        return None
+    scheme, _, token = authorization.strip().partition(" ")
+    token = token.strip()
+    if scheme.lower() != "bearer" or not token:
+        return None
+    return token
+
+
+def decode_token(token: str) -> Optional[dict]:
+    """verify_token, cached until the token's own expiry at the latest"""
+    key = hashlib.sha256(token.encode("utf-8")).hexdigest()
+    claims = token_claims.get(key)
+    if claims is not None:
+        return claims
+    claims = verify_token(token)
+    if claims is not None:
+        expires_at = claims.get("exp")
+        token_claims.put(key, claims, float(expires_at) if isinstance(expires_at, (int, float)) else None)
+    return claims
+
+
+def stats() -> Dict[str, Any]:
+    """Return hit rates for both auth caches"""
+    return {"claims": token_claims.stats(), "users": user_cache.stats()}
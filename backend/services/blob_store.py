@@ -0,0 +1,94 @@
+import hashlib
+import os
+import re
+import tempfile
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Persistent, never evicted (unlike the temp_latex workspace); defaults to backend/blob_store
+BLOB_STORE_DIR = Path(os.getenv("BLOB_STORE_DIR", Path(__file__).resolve().parent.parent / "blob_store"))
+
+DIGEST_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+KIND_PATTERN = re.compile(r"^[a-z0-9]+$")
+
+
+def source_digest(latex_content: str) -> str:
+    """Content address of a document's source"""
+    return hashlib.sha256(latex_content.encode("utf-8")).hexdigest()
+
+
+class BlobStore:
+    """
+    Content-addressed files on disk: <root>/<ab>/<digest>.<kind>.
+
+    Blobs are keyed by the digest of the LaTeX source they were built from,
+    so every resume version with the same source shares one PDF and one
+    preview. Writes go to a temporary file and are renamed into place, so
+    readers never see a partial blob and concurrent writers are harmless.
+    """
+
+    def __init__(self, root: Path = BLOB_STORE_DIR):
+        self.root = Path(root).resolve()
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "stores": 0}
+
+    def path(self, digest: str, kind: str) -> Path:
+        if not DIGEST_PATTERN.match(digest) or not KIND_PATTERN.match(kind):
+            raise ValueError("Invalid blob address")
+        return self.root / digest[:2] / f"{digest}.{kind}"
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._stats[name] += 1
+
+    def find(self, digest: str, kind: str) -> Optional[Path]:
+        """Path of a stored blob, or None"""
+        path = self.path(digest, kind)
+        if path.is_file():
+            self._count("hits")
+            return path
+        self._count("misses")
+        return None
+
+    def get(self, digest: str, kind: str) -> Optional[bytes]:
+        path = self.find(digest, kind)
+        if path is None:
+            return None
+        try:
+            return path.read_bytes()
+        except OSError:
+            return None
+
+    def put(self, digest: str, kind: str, data: bytes) -> Path:
+        """Store a blob (a no-op if it already exists) and return its path"""
+        path = self.path(digest, kind)
+        if path.is_file():
+            return path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except OSError:
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+            raise
+        self._count("stores")
+        return path
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._stats)
+
+
+# Singleton instance
+blob_store = BlobStore()
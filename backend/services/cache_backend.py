@@ -0,0 +1,358 @@
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from dotenv import load_dotenv
+
+from apps.backend.services.workspace import workspace
+
+load_dotenv()
+
+# Backend selection: memory (per process), sqlite (per node) or redis (shared)
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory").lower()
+CACHE_DEFAULT_TTL_SECONDS = float(os.getenv("CACHE_DEFAULT_TTL_SECONDS", str(24 * 3600)))
+CACHE_MEMORY_BYTES = int(os.getenv("CACHE_MEMORY_BYTES", str(64 * 1024 * 1024)))
+CACHE_SQLITE_PATH = os.getenv("CACHE_SQLITE_PATH", str(workspace.root / "shared_cache.sqlite3"))
+CACHE_SQLITE_MAX_BYTES = int(os.getenv("CACHE_SQLITE_MAX_BYTES", str(512 * 1024 * 1024)))
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+REDIS_TIMEOUT_SECONDS = float(os.getenv("REDIS_TIMEOUT_SECONDS", "0.5"))
+REDIS_RETRY_AFTER_SECONDS = float(os.getenv("REDIS_RETRY_AFTER_SECONDS", "5"))
+PRUNE_EVERY_WRITES = 200
+
+
+class CacheBackend:
+    """
+    Byte-oriented key/value store with per-key TTLs.
+
+    ``shared`` tells callers whether other workers see the same entries; the
+    in-process backend is not shared, so callers that already keep their own
+    in-memory tier skip it. Backends never raise on lookups: an unreachable
+    store behaves like an empty one and is counted under "errors".
+    """
+
+    name = "base"
+    shared = False
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "sets": 0, "errors": 0}
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._stats[name] += 1
+
+    def get(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    def get_json(self, key: str) -> Optional[Any]:
+        data = self.get(key)
+        if data is None:
+            return None
+        try:
+            return json.loads(data)
+        except ValueError:
+            return None
+
+    def set_json(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        self.set(key, json.dumps(value, separators=(",", ":")).encode("utf-8"), ttl)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._stats)
+        stats["backend"] = self.name
+        stats["shared"] = self.shared
+        return stats
+
+
+class MemoryBackend(CacheBackend):
+    """In-process TTL + LRU store bounded by total value size"""
+
+    name = "memory"
+
+    def __init__(self, max_bytes: int = CACHE_MEMORY_BYTES):
+        super().__init__()
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+        self._bytes = 0
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.time():
+                if entry is not None:
+                    self._bytes -= len(self._entries.pop(key)[1])
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return entry[1]
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        expires_at = time.time() + (ttl or CACHE_DEFAULT_TTL_SECONDS)
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= len(previous[1])
+            self._entries[key] = (expires_at, value)
+            self._bytes += len(value)
+            self._stats["sets"] += 1
+            while self._entries and self._bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= len(previous[1])
+
+    def stats(self) -> Dict[str, Any]:
+        stats = super().stats()
+        with self._lock:
+            stats["items"] = len(self._entries)
+            stats["bytes"] = self._bytes
+        return stats
+
+
+class SQLiteBackend(CacheBackend):
+    """
+    Store shared by every worker process on one node, in a WAL-mode SQLite file.
+    Expired rows and, past max_bytes, least recently written rows are pruned
+    every PRUNE_EVERY_WRITES writes.
+    """
+
+    name = "sqlite"
+    shared = True
+
+    def __init__(self, path: str = CACHE_SQLITE_PATH, max_bytes: int = CACHE_SQLITE_MAX_BYTES):
+        super().__init__()
+        self.path = path
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._writes = 0
+        with self._connection() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL,"
+                " expires_at REAL NOT NULL, written_at REAL NOT NULL)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS cache_written_at ON cache(written_at)")
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            row = self._connection().execute(
+                "SELECT value FROM cache WHERE key = ? AND expires_at >= ?", (key, time.time())
+            ).fetchone()
+        except sqlite3.Error as e:
+            print(f"SQLite cache lookup failed: {e}")
+            self._count("errors")
+            return None
+        self._count("hits" if row else "misses")
+        return bytes(row[0]) if row else None
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        now = time.time()
+        try:
+            self._connection().execute(
+                "INSERT OR REPLACE INTO cache (key, value, size, expires_at, written_at) VALUES (?, ?, ?, ?, ?)",
+                (key, sqlite3.Binary(value), len(value), now + (ttl or CACHE_DEFAULT_TTL_SECONDS), now),
+            )
+        except sqlite3.Error as e:
+            print(f"SQLite cache write failed: {e}")
+            self._count("errors")
+            return
+        with self._lock:
+            self._stats["sets"] += 1
+            self._writes += 1
+            prune = self._writes % PRUNE_EVERY_WRITES == 0
+        if prune:
+            self.prune()
+
+    def delete(self, key: str) -> None:
+        try:
+            self._connection().execute("DELETE FROM cache WHERE key = ?", (key,))
+        except sqlite3.Error:
+            self._count("errors")
+
+    def prune(self) -> None:
+        """Drop expired rows, then the oldest rows until the size cap holds"""
+        try:
+            connection = self._connection()
+            connection.execute("DELETE FROM cache WHERE expires_at < ?", (time.time(),))
+            total = connection.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()[0]
+            if total > self.max_bytes:
+                cutoff = None
+                for written_at, size in connection.execute("SELECT written_at, size FROM cache ORDER BY written_at"):
+                    total -= size
+                    cutoff = written_at
+                    if total <= self.max_bytes:
+                        break
+                if cutoff is not None:
+                    connection.execute("DELETE FROM cache WHERE written_at <= ?", (cutoff,))
+        except sqlite3.Error as e:
+            print(f"SQLite cache prune failed: {e}")
+            self._count("errors")
+
+
+class RedisBackend(CacheBackend):
+    """
+    Client for any server speaking the Redis protocol (RESP2), using only
+    GET, SET ... PX and DEL, so Redis, Valkey, KeyDB or a local stand-in all
+    work. One connection per thread; a failed command drops the connection.
+    After a connection error the server is not dialled again for
+    retry_after seconds: calls in that window miss at once (counted under
+    "skipped") instead of each waiting out the connect timeout.
+    """
+
+    name = "redis"
+    shared = True
+
+    def __init__(self, url: str = REDIS_URL, timeout: float = REDIS_TIMEOUT_SECONDS, retry_after: float = REDIS_RETRY_AFTER_SECONDS):
+        super().__init__()
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self._local = threading.local()
+        self._unavailable_until = 0.0
+        self._stats["skipped"] = 0
+
+    def _connect(self) -> Tuple[socket.socket, Any]:
+        sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        reader = sock.makefile("rb")
+        self._local.connection = (sock, reader)
+        if self.password:
+            self._call("AUTH", self.password)
+        if self.db:
+            self._call("SELECT", str(self.db))
+        return sock, reader
+
+    def _close(self) -> None:
+        connection = getattr(self._local, "connection", None)
+        self._local.connection = None
+        if connection:
+            try:
+                connection[1].close()
+                connection[0].close()
+            except OSError:
+                pass
+
+    def _read_reply(self, reader) -> Any:
+        line = reader.readline()
+        if not line:
+            raise ConnectionError("Connection closed by cache server")
+        kind, payload = line[:1], line[1:-2]
+        if kind == b"+":
+            return payload.decode("utf-8")
+        if kind == b"-":
+            raise RuntimeError(payload.decode("utf-8", errors="replace"))
+        if kind == b":":
+            return int(payload)
+        if kind == b"$":
+            length = int(payload)
+            if length < 0:
+                return None
+            data = reader.read(length + 2)
+            return data[:-2]
+        if kind == b"*":
+            count = int(payload)
+            return None if count < 0 else [self._read_reply(reader) for _ in range(count)]
+        raise ConnectionError(f"Unexpected reply from cache server: {line[:20]!r}")
+
+    def _call(self, *args: Any) -> Any:
+        connection = getattr(self._local, "connection", None)
+        sock, reader = connection if connection else self._connect()
+        parts: List[bytes] = [f"*{len(args)}\r\n".encode("ascii")]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode("utf-8")
+            parts.append(f"${len(data)}\r\n".encode("ascii"))
+            parts.append(data)
+            parts.append(b"\r\n")
+        sock.sendall(b"".join(parts))
+        return self._read_reply(reader)
+
+    def _command(self, *args: Any) -> Any:
+        with self._lock:
+            if time.monotonic() < self._unavailable_until:
+                self._stats["skipped"] += 1
+                raise ConnectionError("Cache server unavailable")
+        try:
+            return self._call(*args)
+        except (OSError, ConnectionError) as e:
+            self._close()
+            with self._lock:
+                self._stats["errors"] += 1
+                self._unavailable_until = time.monotonic() + self.retry_after
+            print(f"Cache server {self.host}:{self.port} unreachable, retrying in {self.retry_after:g}s: {e}")
+            raise ConnectionError(str(e)) from e
+        except (RuntimeError, ValueError) as e:
+            self._close()
+            self._count("errors")
+            raise ConnectionError(str(e)) from e
+
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            value = self._command("GET", key)
+        except ConnectionError:
+            return None
+        self._count("hits" if value is not None else "misses")
+        return value
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        milliseconds = int((ttl or CACHE_DEFAULT_TTL_SECONDS) * 1000)
+        try:
+            self._command("SET", key, value, "PX", milliseconds)
+        except ConnectionError:
+            return
+        self._count("sets")
+
+    def delete(self, key: str) -> None:
+        try:
+            self._command("DEL", key)
+        except ConnectionError:
+            pass
+
+    def stats(self) -> Dict[str, Any]:
+        stats = super().stats()
+        stats["server"] = f"{self.host}:{self.port}/{self.db}"
+        stats["available"] = time.monotonic() >= self._unavailable_until
+        return stats
+
+
+def create_backend(name: str = CACHE_BACKEND) -> CacheBackend:
+    """Build the backend named by CACHE_BACKEND"""
+    if name == "sqlite":
+        return SQLiteBackend()
+    if name == "redis":
+        return RedisBackend()
+    if name != "memory":
+        print(f"Unknown CACHE_BACKEND '{name}', using the in-process cache")
+    return MemoryBackend()
+
+
+# Singleton instance
+shared_cache = create_backend()
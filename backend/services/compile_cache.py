@@ -0,0 +1,213 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+from dotenv import load_dotenv
+
+from apps.backend.services.cache_backend import shared_cache
+from apps.backend.services.workspace import workspace
+
+load_dotenv()
+
+# Cache settings
+CACHE_DIR = workspace.cache_dir
+MEMORY_MAX_ITEMS = int(os.getenv("COMPILE_CACHE_MEMORY_ITEMS", "64"))
+MEMORY_MAX_BYTES = int(os.getenv("COMPILE_CACHE_MEMORY_BYTES", str(64 * 1024 * 1024)))
+DISK_MAX_BYTES = int(os.getenv("COMPILE_CACHE_DISK_BYTES", str(512 * 1024 * 1024)))
+
+
+def make_cache_key(latex_content: str, engine: str, options: Iterable[str] = ()) -> str:
+    """Build a content-addressed key from the source, engine and compile options"""
+    digest = hashlib.sha256()
+    digest.update(engine.encode("utf-8"))
+    digest.update(b"\0")
+    for option in options:
+        digest.update(str(option).encode("utf-8"))
+        digest.update(b"\0")
+    digest.update(b"\0")
+    digest.update(latex_content.encode("utf-8"))
+    return digest.hexdigest()
+
+
+class CompileCache:
+    """
+    Cache of compiled PDF bytes: an in-memory LRU backed by a size-bounded
+    disk spill, plus the shared cache backend (when it is shared) so other
+    workers' compiles are reused.
+    """
+
+    def __init__(
+        self,
+        cache_dir: Path = CACHE_DIR,
+        memory_max_items: int = MEMORY_MAX_ITEMS,
+        memory_max_bytes: int = MEMORY_MAX_BYTES,
+        disk_max_bytes: int = DISK_MAX_BYTES,
+    ):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.memory_max_items = memory_max_items
+        self.memory_max_bytes = memory_max_bytes
+        self.disk_max_bytes = disk_max_bytes
+
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "shared_hits": 0, "misses": 0, "stores": 0, "disk_evictions": 0}
+
+    def _disk_path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.pdf"
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Return cached PDF bytes for key, or None on a miss"""
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self._stats["memory_hits"] += 1
+                return data
+
+        path = self._disk_path(key)
+        try:
+            data = path.read_bytes()
+        except OSError:
+            data = self._get_shared(key)
+            with self._lock:
+                self._stats["shared_hits" if data is not None else "misses"] += 1
+            return data
+
+        # Touch the file so disk eviction stays least-recently-used
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+        with self._lock:
+            self._stats["disk_hits"] += 1
+            self._remember(key, data)
+        return data
+
+    def _get_shared(self, key: str) -> Optional[bytes]:
+        """Fetch a PDF another worker compiled, keeping a local copy"""
+        if not shared_cache.shared:
+            return None
+        data = shared_cache.get(f"pdf:{key}")
+        if data is not None:
+            self.put(key, data, share=False)
+        return data
+
+    def put(self, key: str, data: bytes, spill: bool = True, share: bool = True) -> None:
+        """
+        Store PDF bytes in memory and, unless spill is False, on disk and in
+        the shared backend (share=False skips only the shared backend)
+        """
+        with self._lock:
+            self._stats["stores"] += 1
+            self._remember(key, data)
+        if not spill:
+            return
+        if share and shared_cache.shared:
+            shared_cache.set(f"pdf:{key}", data)
+
+        path = self._disk_path(key)
+        tmp_path = path.with_suffix(f".{threading.get_ident()}.tmp")
+        try:
+            tmp_path.write_bytes(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Compile cache disk write failed: {e}")
+            try:
+                tmp_path.unlink()
+            except OSError:
+                pass
+            return
+
+        self._enforce_disk_budget()
+
+    def path_for(self, key: str) -> Optional[str]:
+        """Return the on-disk location of a cached PDF, if it is spilled"""
+        path = self._disk_path(key)
+        return str(path) if path.exists() else None
+
+    def materialize(self, key: str) -> Optional[str]:
+        """Return a disk path for a cached PDF, re-spilling it from memory if needed"""
+        data = self.get(key)
+        if data is None:
+            return None
+        path = self.path_for(key)
+        if path:
+            return path
+        self.put(key, data, share=False)
+        return self.path_for(key)
+
+    def _remember(self, key: str, data: bytes) -> None:
+        """Insert into the memory LRU; caller must hold the lock"""
+        if len(data) > self.memory_max_bytes:
+            return
+        previous = self._memory.pop(key, None)
+        if previous is not None:
+            self._memory_bytes -= len(previous)
+        self._memory[key] = data
+        self._memory_bytes += len(data)
+
+        while self._memory and (
+            len(self._memory) > self.memory_max_items or self._memory_bytes > self.memory_max_bytes
+        ):
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+
+    def _enforce_disk_budget(self) -> None:
+        """Delete least-recently-used spill files until the disk budget is met"""
+        try:
+            entries = []
+            total = 0
+            for path in self.cache_dir.glob("*.pdf"):
+                stat = path.stat()
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+        except OSError:
+            return
+
+        if total <= self.disk_max_bytes:
+            return
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.disk_max_bytes:
+                break
+            try:
+                path.unlink()
+                total -= size
+                with self._lock:
+                    self._stats["disk_evictions"] += 1
+            except OSError:
+                pass
+
+    def stats(self) -> Dict[str, float]:
+        """Return hit/miss counters and current tier sizes"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_items"] = len(self._memory)
+            stats["memory_bytes"] = self._memory_bytes
+        hits = stats["memory_hits"] + stats["disk_hits"] + stats["shared_hits"]
+        lookups = hits + stats["misses"]
+        stats["hits"] = hits
+        stats["hit_rate"] = round(hits / lookups, 4) if lookups else 0.0
+        return stats
+
+    def clear(self) -> None:
+        """Drop both tiers"""
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+        for path in self.cache_dir.glob("*.pdf"):
+            try:
+                path.unlink()
+            except OSError:
+                pass
+
+
+# Singleton instance shared by pdf_service and latex_service
+compile_cache = CompileCache()
@@ -0,0 +1,138 @@
+import asyncio
+import functools
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Executor settings
+MAX_WORKERS = int(os.getenv("COMPILE_MAX_WORKERS", str(max(2, (os.cpu_count() or 2)))))
+MAX_QUEUE = int(os.getenv("COMPILE_MAX_QUEUE", "16"))
+DEFAULT_DEADLINE_SECONDS = float(os.getenv("COMPILE_DEADLINE_SECONDS", "60"))
+
+
+class CompileQueueFull(Exception):
+    """Raised when every worker is busy and the wait queue is full"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Compile queue is full, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+class CompileDeadlineExceeded(Exception):
+    """Raised when a job does not finish within its deadline"""
+
+
+class CompileExecutor:
+    """
+    Runs blocking compile jobs off the event loop.
+
+    Jobs execute on a fixed number of worker threads (each one drives an
+    external TeX process, so the GIL is not a bottleneck). At most
+    ``max_queue`` jobs may wait for a worker; beyond that, submissions fail
+    fast with CompileQueueFull so callers can answer 503 with Retry-After.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = MAX_WORKERS,
+        max_queue: int = MAX_QUEUE,
+        default_deadline: float = DEFAULT_DEADLINE_SECONDS,
+    ):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.default_deadline = default_deadline
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="latex-compile")
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._avg_duration = 2.0
+        self._stats = {"submitted": 0, "completed": 0, "rejected": 0, "deadline_exceeded": 0, "failed": 0}
+
+    def _retry_after(self) -> int:
+        """Estimate how long until a queue slot frees up"""
+        waves = max(1, self._in_flight - self.max_workers + 1) / self.max_workers
+        return max(1, math.ceil(self._avg_duration * waves))
+
+    def _acquire(self) -> None:
+        with self._lock:
+            if self._in_flight >= self.max_workers + self.max_queue:
+                self._stats["rejected"] += 1
+                raise CompileQueueFull(self._retry_after())
+            self._in_flight += 1
+            self._stats["submitted"] += 1
+
+    def _release(self, started: Optional[float]) -> None:
+        with self._lock:
+            self._in_flight -= 1
+            if started is not None:
+                # Exponentially weighted average of job run time
+                self._avg_duration = 0.8 * self._avg_duration + 0.2 * (time.monotonic() - started)
+
+    def _run_job(self, func: Callable[..., Any], state: Dict[str, Optional[float]]) -> Any:
+        state["started"] = time.monotonic()
+        return func()
+
+    async def run(self, func: Callable[..., Any], *args, deadline: Optional[float] = None, **kwargs) -> Any:
+        """
+        Run func(*args, **kwargs) on a compile worker and await its result.
+
+        The deadline covers queue wait plus execution. A job that has not
+        started when the deadline passes is cancelled; one that is already
+        running keeps its worker until the TeX process's own timeout fires.
+        """
+        self._acquire()
+        state: Dict[str, Optional[float]] = {"started": None}
+        loop = asyncio.get_running_loop()
+        job = functools.partial(func, *args, **kwargs)
+
+        try:
+            future = self._pool.submit(self._run_job, job, state)
+        except Exception:
+            self._release(None)
+            raise
+
+        # The slot is only freed when the worker actually finishes, so the
+        # queue bound stays honest even after a caller gives up waiting
+        future.add_done_callback(lambda _: self._release(state["started"]))
+
+        timeout = self.default_deadline if deadline is None else deadline
+        try:
+            result = await asyncio.wait_for(asyncio.wrap_future(future, loop=loop), timeout=timeout)
+        except asyncio.TimeoutError:
+            future.cancel()
+            with self._lock:
+                self._stats["deadline_exceeded"] += 1
+            raise CompileDeadlineExceeded(f"Compilation did not finish within {timeout:g}s")
+        except Exception:
+            with self._lock:
+                self._stats["failed"] += 1
+            raise
+
+        with self._lock:
+            self._stats["completed"] += 1
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        """Return queue depth and job counters"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["in_flight"] = self._in_flight
+            stats["queued"] = max(0, self._in_flight - self.max_workers)
+            stats["max_workers"] = self.max_workers
+            stats["max_queue"] = self.max_queue
+            stats["avg_duration_seconds"] = round(self._avg_duration, 3)
+        return stats
+
+    def shutdown(self) -> None:
+        """Stop accepting work and cancel jobs that have not started"""
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+# Singleton instance
+compile_executor = CompileExecutor()
@@ -0,0 +1,242 @@
+import os
+import re
+import shutil
+import signal
+import subprocess
+import threading
+from typing import Dict, List, Optional
+
+from dotenv import load_dotenv
+
+try:
+    import resource
+except ImportError:  # Windows: no rlimits, only the wall-clock timeout applies
+    resource = None
+
+load_dotenv()
+
+# Per-process caps for TeX runs (0 disables a limit)
+CPU_SECONDS = int(os.getenv("LATEX_CPU_SECONDS", "20"))
+MEMORY_MB = int(os.getenv("LATEX_MEMORY_MB", "2048"))
+MAX_FILE_MB = int(os.getenv("LATEX_MAX_FILE_MB", "64"))
+MAX_PAGES = int(os.getenv("LATEX_MAX_PAGES", "50"))
+
+# util-linux prlimit sets the limits on itself and execs TeX, so they hold from the first instruction
+PRLIMIT_PATH = shutil.which("prlimit")
+
+# "Output written on resume.pdf (2 pages, 51234 bytes)."
+PAGES_PATTERN = re.compile(r"Output written on .*?\((\d+) pages?", re.DOTALL)
+# What engines print when an allocation fails under RLIMIT_AS
+OUT_OF_MEMORY_PATTERN = re.compile(rb"out of memory|memory exhausted|cannot allocate memory|not enough memory", re.IGNORECASE)
+
+LIMIT_MESSAGES = {
+    "timeout": "Compilation timeout - LaTeX code may have errors",
+    "cpu_limit": f"Compilation used more than {CPU_SECONDS}s of CPU time",
+    "memory_limit": f"Compilation used more than {MEMORY_MB} MB of memory",
+    "file_size_limit": f"Compilation tried to write a file larger than {MAX_FILE_MB} MB",
+    "page_limit": f"Document has more than {MAX_PAGES} pages",
+    "killed": "Compilation was killed by the system",
+}
+
+
+class CompileLimitExceeded(Exception):
+    """Raised when a TeX run is stopped by a timeout or resource limit"""
+
+    def __init__(self, reason: str, detail: Optional[str] = None):
+        super().__init__(detail or LIMIT_MESSAGES.get(reason, reason))
+        self.reason = reason
+
+
+def _rlimits() -> List[tuple]:
+    """(limit, soft, hard) triples, clamped to the hard limits this process already has"""
+    limits = [(resource.RLIMIT_CORE, 0, 0)]
+    if CPU_SECONDS > 0:
+        # SIGXCPU at the soft limit, SIGKILL a second later
+        limits.append((resource.RLIMIT_CPU, CPU_SECONDS, CPU_SECONDS + 1))
+    if MEMORY_MB > 0:
+        limits.append((resource.RLIMIT_AS, MEMORY_MB * 1024 * 1024, MEMORY_MB * 1024 * 1024))
+    if MAX_FILE_MB > 0:
+        limits.append((resource.RLIMIT_FSIZE, MAX_FILE_MB * 1024 * 1024, MAX_FILE_MB * 1024 * 1024))
+    clamped = []
+    for limit, soft, hard in limits:
+        current_hard = resource.getrlimit(limit)[1]
+        if current_hard != resource.RLIM_INFINITY:
+            soft, hard = min(soft, current_hard), min(hard, current_hard)
+        clamped.append((limit, soft, hard))
+    return clamped
+
+
+def _prlimit_command(command: List[str]) -> List[str]:
+    """Wrap a command in prlimit(1) with the compile limits"""
+    options = {
+        resource.RLIMIT_CORE: "--core",
+        resource.RLIMIT_CPU: "--cpu",
+        resource.RLIMIT_AS: "--as",
+        resource.RLIMIT_FSIZE: "--fsize",
+    }
+    return [PRLIMIT_PATH, *(f"{options[limit]}={soft}:{hard}" for limit, soft, hard in _rlimits()), "--", *command]
+
+
+def _apply_own_limits() -> None:
+    """preexec_fn fallback for platforms without prlimit(1) (macOS)"""
+    for limit, soft, hard in _rlimits():
+        resource.setrlimit(limit, (soft, hard))
+
+
+class _SandboxedProcess(subprocess.Popen):
+    """Popen that keeps the child's resource usage (os.wait4) when it is reaped"""
+
+    rusage = None
+
+    def _try_wait(self, wait_flags):
+        if not hasattr(os, "wait4"):
+            return super()._try_wait(wait_flags)
+        try:
+            pid, sts, rusage = os.wait4(self.pid, wait_flags)
+        except ChildProcessError:
+            return self.pid, 0
+        if pid:
+            self.rusage = rusage
+        return pid, sts
+
+
+class CompileSandbox:
+    """
+    Starts TeX processes with rlimits in their own process group.
+
+    CPU time, address space, written file size and core dumps are capped per
+    process; on timeout the whole group is killed, so helpers an engine
+    spawned go with it. Failures are classified into LIMIT_MESSAGES reasons
+    and counted for GET /compile-limits/stats.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats: Dict[str, int] = {"started": 0, "limits_failed": 0, "unlimited": 0, **{reason: 0 for reason in LIMIT_MESSAGES}}
+        if resource is None:
+            print("Resource limits are unavailable on this platform; TeX runs only under the wall-clock timeout")
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._stats[name] += 1
+
+    def popen(self, command: List[str], cwd, stdin: Optional[int] = None) -> subprocess.Popen:
+        """
+        Start a capped TeX process (stdout/stderr are piped).
+        Raises OSError if the limits cannot be applied, so TeX never runs uncapped.
+        """
+        kwargs = {}
+        if os.name == "posix":
+            kwargs["start_new_session"] = True
+        if resource is None:
+            self._count("unlimited")
+        elif PRLIMIT_PATH:
+            command = _prlimit_command(command)
+        else:
+            kwargs["preexec_fn"] = _apply_own_limits
+
+        try:
+            process = _SandboxedProcess(command, cwd=cwd, stdin=stdin, stdout=subprocess.PIPE, stderr=subprocess.PIPE, **kwargs)
+        except subprocess.SubprocessError as e:
+            # setrlimit failed in preexec_fn; the engine was never started
+            self._limits_failed(str(e))
+            raise OSError(f"Could not apply compile limits: {e}") from e
+        self._count("started")
+        return process
+
+    def _limits_failed(self, detail: str) -> None:
+        print(f"Could not apply compile limits: {detail}")
+        self._count("limits_failed")
+
+    def kill(self, process: subprocess.Popen) -> None:
+        """Kill a process and everything in its process group"""
+        try:
+            if os.name == "posix":
+                os.killpg(process.pid, signal.SIGKILL)
+            else:
+                process.kill()
+        except (ProcessLookupError, PermissionError, OSError):
+            pass
+
+    def communicate(self, process: subprocess.Popen, input: Optional[bytes], timeout: float) -> subprocess.CompletedProcess:
+        """
+        Wait for a process started by popen().
+        Raises CompileLimitExceeded if it times out or is killed by a limit.
+        """
+        try:
+            stdout, stderr = process.communicate(input, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            self.kill(process)
+            process.communicate()
+            self._count("timeout")
+            raise CompileLimitExceeded("timeout")
+        if process.returncode != 0 and PRLIMIT_PATH and stderr.startswith(b"prlimit:"):
+            # prlimit reports its own failures before exec, so TeX never ran
+            self.kill(process)
+            detail = stderr.decode("utf-8", errors="replace").strip()
+            if "failed to execute" in detail:
+                # What Popen itself raises for a missing engine
+                raise FileNotFoundError(detail)
+            self._limits_failed(detail)
+            raise OSError(f"Could not apply compile limits: {detail}")
+        reason = self.classify(process.returncode, getattr(process, "rusage", None))
+        if not reason and process.returncode != 0 and MEMORY_MB > 0 and OUT_OF_MEMORY_PATTERN.search(stdout[-4096:] + stderr[-4096:]):
+            reason = "memory_limit"
+        # Reap anything the engine left running in its group
+        self.kill(process)
+        if reason:
+            self._count(reason)
+            raise CompileLimitExceeded(reason)
+        return subprocess.CompletedProcess(process.args, process.returncode, stdout, stderr)
+
+    def run(self, command: List[str], cwd, timeout: float) -> subprocess.CompletedProcess:
+        """subprocess.run equivalent for one capped TeX pass"""
+        return self.communicate(self.popen(command, cwd), None, timeout)
+
+    def classify(self, returncode: int, rusage=None) -> Optional[str]:
+        """
+        Map death by signal to the limit that caused it. SIGKILL only counts
+        as the CPU limit when the child's rusage shows it used that much CPU
+        time; otherwise something else (e.g. the OOM killer) killed it.
+        """
+        if returncode is None or returncode >= 0 or os.name != "posix":
+            return None
+        sig = -returncode
+        if sig == signal.SIGXCPU:
+            return "cpu_limit"
+        if sig == signal.SIGKILL:
+            if CPU_SECONDS > 0 and rusage is not None and rusage.ru_utime + rusage.ru_stime >= CPU_SECONDS:
+                return "cpu_limit"
+            return "killed"
+        if sig == signal.SIGXFSZ:
+            return "file_size_limit"
+        if sig in (signal.SIGSEGV, signal.SIGBUS, signal.SIGABRT) and MEMORY_MB > 0:
+            return "memory_limit"
+        return None
+
+    def check_pages(self, log: str) -> None:
+        """Raise if the run wrote more than MAX_PAGES pages"""
+        if MAX_PAGES <= 0:
+            return
+        match = PAGES_PATTERN.search(log)
+        if match and int(match.group(1)) > MAX_PAGES:
+            self._count("page_limit")
+            raise CompileLimitExceeded("page_limit")
+
+    def stats(self) -> Dict[str, object]:
+        """Return limit breach counters and the configured caps"""
+        with self._lock:
+            stats: Dict[str, object] = dict(self._stats)
+        stats["limits"] = {
+            "cpu_seconds": CPU_SECONDS,
+            "memory_mb": MEMORY_MB,
+            "max_file_mb": MAX_FILE_MB,
+            "max_pages": MAX_PAGES,
+            "rlimits": resource is not None,
+            "applied_by": "prlimit" if resource is not None and PRLIMIT_PATH else ("preexec_fn" if resource is not None else None),
+        }
+        return stats
+
+
+# Singleton instance
+compile_sandbox = CompileSandbox()
@@ -1,27 +1,35 @@
 import os
+import re
+import threading
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain.prompts import PromptTemplate
 from langchain.output_parsers import PydanticOutputParser
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.runnables import Runnable
 from pydantic import BaseModel, Field
 from dotenv import load_dotenv
 
+from apps.backend.services.llm_cache import llm_cache, make_llm_key, normalize_skills
+from apps.backend.services.latex_sections import LatexSection, find_section, index_sections, replace_section, document_class
+from apps.backend.services.template_slots import ResumeSlots, describe_slots
+from apps.backend.services.llm_resilience import llm_caller
+from apps.backend.services.llm_stub import StubChatModel
+
 load_dotenv()
 
 class ResumeContent(BaseModel):
     latex_code: str = Field(description="The complete LaTeX code for the resume")
 
-def get_llm():
-    api_key = os.getenv("GOOGLE_API_KEY")
-    if not api_key:
-        raise ValueError("GOOGLE_API_KEY not found in environment variables")
-    return ChatGoogleGenerativeAI(model="gemini-2.5-flash", google_api_key=api_key, temperature=0.7)
-
-def generate_resume_content(role: str, skills: list, experience: str, template_latex: str) -> str:
-    llm = get_llm()
-    parser = PydanticOutputParser(pydantic_object=ResumeContent)
-    
-    prompt = PromptTemplate(
-        template="""
+class SectionContent(BaseModel):
+    latex_code: str = Field(description="The LaTeX code for the rewritten section, starting with its \\section line")
+
+# Model settings
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
+GEMINI_TEMPERATURE = float(os.getenv("GEMINI_TEMPERATURE", "0.7"))
+
+GENERATE_TEMPLATE = """
         You are an expert resume writer and LaTeX pro.
         Your task is to take the provided user information and fill into the provided LaTeX template to create a ATS-friendly resume.
         
@@ -41,34 +49,9 @@ def generate_resume_content(role: str, skills: list, experience: str, template_l
         5. Return ONLY the full valid LaTeX code.
         
         {format_instructions}
-        """,
-        input_variables=["role", "skills", "experience", "template_latex"],
-        partial_variables={"format_instructions": parser.get_format_instructions()}
-    )
-    
-    chain = prompt | llm | parser
-    
-    try:
-        result = chain.invoke({
-            "role": role,
-            "skills": ", ".join(skills),
-            "experience": experience,
-            "template_latex": template_latex
-        })
-        return result.latex_code
-    except Exception as e:
-        # Fallback if parsing fails (sometimes Gemini might not match strict JSON perfectly)
-        # For robustness in a demo, we might want to return raw text or retry.
-        # Here we re-raise for now to catch in the UI.
-        print(f"Error generating resume: {e}")
-        raise e
+        """
 
-def edit_resume_section(current_latex: str, instruction: str) -> str:
-    llm = get_llm()
-    parser = PydanticOutputParser(pydantic_object=ResumeContent)
-    
-    prompt = PromptTemplate(
-        template="""
+EDIT_TEMPLATE = """
         You are an expert resume editor.
         Your task is to modify the provided LaTeX resume code based on the user's instruction.
         
@@ -84,11 +67,260 @@ def edit_resume_section(current_latex: str, instruction: str) -> str:
         3. Do not change the overall template structure unless asked.
         
         {format_instructions}
-        """,
-        input_variables=["current_latex", "instruction"],
-        partial_variables={"format_instructions": parser.get_format_instructions()}
+        """
+
+SECTION_EDIT_TEMPLATE = """
+        You are an expert resume editor.
+        Your task is to modify ONE section of a LaTeX resume based on the user's instruction.
+        
+        DOCUMENT CLASS:
+        {document_class}
+        
+        OTHER SECTIONS IN THE DOCUMENT:
+        {other_sections}
+        
+        CURRENT SECTION:
+        {section_latex}
+        
+        INSTRUCTION:
+        {instruction}
+        
+        INSTRUCTIONS:
+        1. Return only the rewritten section, starting with its \\section line.
+        2. Use only commands that already appear in the section or belong to the document class.
+        3. Ensure the LaTeX is valid and capable of compiling.
+        
+        {format_instructions}
+        """
+
+SLOTS_TEMPLATE = """
+        You are an expert resume writer.
+        Your task is to write the content of an ATS-friendly resume for the user below.
+        The server places your content into a LaTeX template, so write plain text only.
+        
+        USER INFORMATION:
+        Role: {role}
+        Skills: {skills}
+        Experience: {experience}
+        
+        FIELDS TO FILL:
+        {slots}
+        
+        INSTRUCTIONS:
+        1. Fill only the fields listed above; leave every other field empty.
+        2. Optimize the content for the role and use professional, formal language.
+        3. Do not use LaTeX commands or escapes.
+        4. Leave contact details you were not given as empty strings.
+        
+        {format_instructions}
+        """
+
+# Clients and chains are built once and shared. Each client keeps its own
+# connection pool, so reusing it avoids a new TLS handshake per request.
+_llms: Dict[Tuple[str, float], BaseChatModel] = {}
+_chains: Dict[Tuple[str, str, float], Runnable] = {}
+_lock = threading.Lock()
+
+parser = PydanticOutputParser(pydantic_object=ResumeContent)
+
+generate_prompt = PromptTemplate(
+    template=GENERATE_TEMPLATE,
+    input_variables=["role", "skills", "experience", "template_latex"],
+    partial_variables={"format_instructions": parser.get_format_instructions()}
+)
+
+edit_prompt = PromptTemplate(
+    template=EDIT_TEMPLATE,
+    input_variables=["current_latex", "instruction"],
+    partial_variables={"format_instructions": parser.get_format_instructions()}
+)
+
+section_parser = PydanticOutputParser(pydantic_object=SectionContent)
+
+section_edit_prompt = PromptTemplate(
+    template=SECTION_EDIT_TEMPLATE,
+    input_variables=["document_class", "other_sections", "section_latex", "instruction"],
+    partial_variables={"format_instructions": section_parser.get_format_instructions()}
+)
+
+slots_parser = PydanticOutputParser(pydantic_object=ResumeSlots)
+# Let slot responses go through the shared cache backend too
+llm_cache.register_model(ResumeSlots)
+
+slots_prompt = PromptTemplate(
+    template=SLOTS_TEMPLATE,
+    input_variables=["role", "skills", "experience", "slots"],
+    partial_variables={"format_instructions": slots_parser.get_format_instructions()}
+)
+
+# Streaming asks for bare LaTeX so tokens can be shown as they arrive
+STREAM_FORMAT_INSTRUCTIONS = (
+    "Return ONLY the raw LaTeX source, starting with \\documentclass and ending with \\end{document}. "
+    "Do not wrap it in JSON or Markdown code fences."
+)
+
+# kind -> (prompt, output parser)
+PROMPTS = {
+    "generate": (generate_prompt, parser),
+    "edit": (edit_prompt, parser),
+    "edit_section": (section_edit_prompt, section_parser),
+    "generate_slots": (slots_prompt, slots_parser),
+    "generate_stream": (generate_prompt.partial(format_instructions=STREAM_FORMAT_INSTRUCTIONS), StrOutputParser()),
+    "edit_stream": (edit_prompt.partial(format_instructions=STREAM_FORMAT_INSTRUCTIONS), StrOutputParser()),
+}
+
+DOCUMENT_PATTERN = re.compile(r"\\documentclass.*?\\end\{document\}", re.DOTALL)
+
+def get_llm(model: str = GEMINI_MODEL, temperature: float = GEMINI_TEMPERATURE) -> BaseChatModel:
+    """Return the shared client for a model and temperature (model "stub" runs offline)"""
+    key = (model, temperature)
+    with _lock:
+        llm = _llms.get(key)
+        if llm is None and model == "stub":
+            llm = StubChatModel()
+            _llms[key] = llm
+        if llm is None:
+            api_key = os.getenv("GOOGLE_API_KEY")
+            if not api_key:
+                raise ValueError("GOOGLE_API_KEY not found in environment variables")
+            # Retries and timeouts are handled by llm_caller, not the client
+            llm = ChatGoogleGenerativeAI(model=model, google_api_key=api_key, temperature=temperature, max_retries=0)
+            _llms[key] = llm
+        return llm
+
+def get_chain(kind: str, model: str = GEMINI_MODEL, temperature: float = GEMINI_TEMPERATURE) -> Runnable:
+    """Return the shared prompt | llm | parser chain for a kind in PROMPTS"""
+    key = (kind, model, temperature)
+    with _lock:
+        chain = _chains.get(key)
+    if chain is None:
+        prompt, output_parser = PROMPTS[kind]
+        chain = prompt | get_llm(model, temperature) | output_parser
+        with _lock:
+            chain = _chains.setdefault(key, chain)
+    return chain
+
+def _generate_inputs(role: str, skills: list, experience: str, template_latex: str) -> dict:
+    return {
+        "role": role,
+        "skills": ", ".join(skills),
+        "experience": experience,
+        "template_latex": template_latex
+    }
+
+def _generate_key(role: str, skills: list, experience: str, template_latex: str) -> str:
+    return make_llm_key(
+        "generate", GEMINI_MODEL, GEMINI_TEMPERATURE,
+        role=" ".join(role.split()).lower(),
+        skills=normalize_skills(skills),
+        experience=experience.strip(),
+        template_latex=template_latex,
     )
-    
-    chain = prompt | llm | parser
-    result = chain.invoke({"current_latex": current_latex, "instruction": instruction})
-    return result.latex_code
+
+def _edit_key(current_latex: str, instruction: str) -> str:
+    return make_llm_key(
+        "edit", GEMINI_MODEL, GEMINI_TEMPERATURE,
+        current_latex=current_latex,
+        instruction=instruction.strip(),
+    )
+
+async def agenerate_resume_content(role: str, skills: list, experience: str, template_latex: str) -> str:
+    """Fill a template for the user without blocking the event loop"""
+    async def generate() -> str:
+        inputs = _generate_inputs(role, skills, experience, template_latex)
+        result = await llm_caller.call(lambda: get_chain("generate").ainvoke(inputs))
+        return result.latex_code
+
+    try:
+        return await llm_cache.get_or_compute(_generate_key(role, skills, experience, template_latex), generate)
+    except Exception as e:
+        print(f"Error generating resume: {e}")
+        raise e
+
+async def agenerate_resume_slots(role: str, skills: list, experience: str, slot_names: List[str]) -> ResumeSlots:
+    """
+    Ask the model for typed slot content only; the caller renders it into
+    the template, so the model never re-emits LaTeX boilerplate.
+    """
+    inputs = {
+        "role": role,
+        "skills": ", ".join(skills),
+        "experience": experience,
+        "slots": describe_slots(slot_names)
+    }
+
+    async def generate() -> ResumeSlots:
+        return await llm_caller.call(lambda: get_chain("generate_slots").ainvoke(inputs))
+
+    key = make_llm_key(
+        "generate_slots", GEMINI_MODEL, GEMINI_TEMPERATURE,
+        role=" ".join(role.split()).lower(),
+        skills=normalize_skills(skills),
+        experience=experience.strip(),
+        slots=slot_names,
+    )
+    try:
+        return await llm_cache.get_or_compute(key, generate)
+    except Exception as e:
+        print(f"Error generating resume slots: {e}")
+        raise e
+
+def _section_inputs(current_latex: str, section: LatexSection, instruction: str) -> dict:
+    """Prompt inputs for a section-scoped edit: the section plus minimal context"""
+    others = [other.title for other in index_sections(current_latex) if other.start != section.start]
+    return {
+        "document_class": document_class(current_latex),
+        "other_sections": ", ".join(others) or "(none)",
+        "section_latex": section.text(current_latex).strip(),
+        "instruction": instruction
+    }
+
+def _splice_section(current_latex: str, section: LatexSection, section_latex: str) -> str:
+    """Put a rewritten section back, keeping the original heading if the model dropped it"""
+    if not section_latex.lstrip().startswith("\\section"):
+        heading = section.text(current_latex).splitlines()[0]
+        section_latex = f"{heading}\n{section_latex.strip()}"
+    return replace_section(current_latex, section, section_latex)
+
+async def aedit_resume_section(current_latex: str, instruction: str, section_name: Optional[str] = None) -> str:
+    """
+    Apply an edit instruction without blocking the event loop.
+    With section_name, only that section goes to the model and is spliced
+    back; an unknown section falls back to editing the whole document.
+    """
+    section = find_section(current_latex, section_name) if section_name else None
+    if section:
+        inputs = _section_inputs(current_latex, section, instruction)
+
+        async def edit_section() -> str:
+            result = await llm_caller.call(lambda: get_chain("edit_section").ainvoke(inputs))
+            return result.latex_code
+
+        key = make_llm_key("edit_section", GEMINI_MODEL, GEMINI_TEMPERATURE, **inputs)
+        return _splice_section(current_latex, section, await llm_cache.get_or_compute(key, edit_section))
+
+    async def edit() -> str:
+        inputs = {"current_latex": current_latex, "instruction": instruction}
+        result = await llm_caller.call(lambda: get_chain("edit").ainvoke(inputs))
+        return result.latex_code
+
+    return await llm_cache.get_or_compute(_edit_key(current_latex, instruction), edit)
+
+def extract_latex_document(text: str) -> Optional[str]:
+    """Return the first complete \\documentclass ... \\end{document} span, if any"""
+    match = DOCUMENT_PATTERN.search(text)
+    return match.group(0) if match else None
+
+async def astream_resume_content(role: str, skills: list, experience: str, template_latex: str) -> AsyncIterator[str]:
+    """Yield raw LaTeX text chunks for a new resume as the model produces them"""
+    inputs = _generate_inputs(role, skills, experience, template_latex)
+    async for chunk in llm_caller.stream(lambda: get_chain("generate_stream").astream(inputs)):
+        if chunk:
+            yield chunk
+
+async def astream_resume_edit(current_latex: str, instruction: str) -> AsyncIterator[str]:
+    """Yield raw LaTeX text chunks for an edited resume as the model produces them"""
+    inputs = {"current_latex": current_latex, "instruction": instruction}
+    async for chunk in llm_caller.stream(lambda: get_chain("edit_stream").astream(inputs)):
+        if chunk:
+            yield chunk
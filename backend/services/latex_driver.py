@@ -0,0 +1,294 @@
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Iterator, List, Optional
+
+from dotenv import load_dotenv
+
+from apps.backend.services.cache_backend import shared_cache
+from apps.backend.services.compile_sandbox import compile_sandbox
+from apps.backend.services.preamble_format import preamble_formats
+from apps.backend.services.latex_workers import latex_workers, LatexWorker
+from apps.backend.services.toolchain import Tool
+from apps.backend.services.workspace import workspace
+
+load_dotenv()
+
+# Driver settings
+MAX_PASSES = int(os.getenv("LATEX_MAX_PASSES", "3"))
+SESSION_DIR = workspace.sessions_dir
+SCRATCH_DIR = workspace.scratch_dir
+
+# Log messages LaTeX and common packages print when another pass is needed
+RERUN_PATTERN = re.compile(
+    r"Rerun to get|Please re-?run|Rerun LaTeX|Label\(s\) may have changed|\(rerunfilecheck\)",
+    re.IGNORECASE,
+)
+
+# Aux lines that carry cross-pass state (labels, citations, toc entries)
+AUX_STATE_PATTERN = re.compile(r"^\\(newlabel|bibcite|@writefile|contentsline)", re.MULTILINE)
+
+# Auxiliary files worth keeping between compiles of the same document
+SESSION_EXTENSIONS = ("aux", "toc", "out", "lof", "lot")
+
+# "l.42 \badcommand": the source line TeX reports for an error
+LOG_LINE_PATTERN = re.compile(r"^l\.(\d+)", re.MULTILINE)
+
+SESSION_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+SESSION_TTL_SECONDS = float(os.getenv("LATEX_SESSION_MAX_AGE_SECONDS", str(7 * 24 * 3600)))
+
+
+@dataclass
+class LatexRun:
+    """Outcome of a multi-pass LaTeX run"""
+    returncode: int
+    passes: int
+    log: str
+    stdout: str
+    stderr: str
+    pdf: Optional[bytes] = None
+
+    def error_summary(self) -> Optional[str]:
+        """Return the first TeX error with a little context, if any"""
+        lines = self.log.splitlines()
+        for i, line in enumerate(lines):
+            if line.startswith("!"):
+                return "\n".join(lines[i:i + 3]).strip()
+        return self.stderr.strip() or None
+
+
+def read_text(path: Path) -> str:
+    """Read a TeX-produced file, tolerating odd encodings"""
+    try:
+        return path.read_bytes().decode("utf-8", errors="replace")
+    except OSError:
+        return ""
+
+
+def aux_signature(aux_path: Path) -> List[str]:
+    """Extract the cross-reference state recorded in an .aux file"""
+    return [
+        line for line in read_text(aux_path).splitlines()
+        if AUX_STATE_PATTERN.match(line)
+    ]
+
+
+def needs_rerun(log: str, previous_aux: List[str], current_aux: List[str]) -> bool:
+    """Decide whether LaTeX asked for (or needs) another pass"""
+    if RERUN_PATTERN.search(log):
+        return True
+    return previous_aux != current_aux
+
+
+def _session_path(session_id: Optional[str]) -> Optional[Path]:
+    if not session_id or not SESSION_ID_PATTERN.match(session_id):
+        return None
+    return SESSION_DIR / session_id
+
+
+def restore_session_files(session_id: Optional[str], workdir: str, jobname: str) -> None:
+    """Seed the working directory with auxiliary files from the previous compile"""
+    session_path = _session_path(session_id)
+    if not session_path:
+        return
+    if not session_path.is_dir():
+        # The previous compile may have run on another worker
+        saved_files = shared_cache.get_json(f"latex-session:{session_id}") if shared_cache.shared else None
+        for ext, text in (saved_files or {}).items():
+            if ext in SESSION_EXTENSIONS:
+                try:
+                    Path(workdir, f"{jobname}.{ext}").write_bytes(text.encode("latin-1"))
+                except OSError:
+                    pass
+        return
+    for ext in SESSION_EXTENSIONS:
+        saved = session_path / f"session.{ext}"
+        if saved.exists():
+            try:
+                shutil.copyfile(saved, os.path.join(workdir, f"{jobname}.{ext}"))
+            except OSError:
+                pass
+
+
+def save_session_files(session_id: Optional[str], workdir: str, jobname: str) -> None:
+    """Keep auxiliary files so the next edit of this document can converge in one pass"""
+    session_path = _session_path(session_id)
+    if not session_path:
+        return
+    shared_files = {}
+    try:
+        session_path.mkdir(parents=True, exist_ok=True)
+        for ext in SESSION_EXTENSIONS:
+            produced = os.path.join(workdir, f"{jobname}.{ext}")
+            if os.path.exists(produced):
+                shutil.copyfile(produced, session_path / f"session.{ext}")
+                if shared_cache.shared:
+                    shared_files[ext] = Path(produced).read_bytes().decode("latin-1")
+    except OSError as e:
+        print(f"Could not save LaTeX session files: {e}")
+    if shared_files:
+        shared_cache.set_json(f"latex-session:{session_id}", shared_files, SESSION_TTL_SECONDS)
+
+
+def run_latex(
+    run_pass: Callable[[], subprocess.CompletedProcess],
+    workdir: str,
+    jobname: str,
+    max_passes: int = MAX_PASSES,
+    session_id: Optional[str] = None,
+) -> LatexRun:
+    """
+    Run LaTeX passes until the output converges.
+
+    After every pass the .log is checked for rerun requests and the .aux
+    cross-reference state is compared with the state the pass started from.
+    Documents without references therefore finish after a single pass.
+
+    Raises CompileLimitExceeded when a pass hits its timeout or a resource
+    limit (or the PDF has too many pages), and FileNotFoundError like
+    subprocess.run.
+    """
+    restore_session_files(session_id, workdir, jobname)
+
+    aux_path = Path(workdir) / f"{jobname}.aux"
+    log_path = Path(workdir) / f"{jobname}.log"
+    previous_aux = aux_signature(aux_path)
+
+    result = None
+    log = ""
+    passes = 0
+    while passes < max(1, max_passes):
+        result = run_pass()
+        passes += 1
+        log = read_text(log_path)
+
+        if result.returncode != 0:
+            break
+
+        current_aux = aux_signature(aux_path)
+        if not needs_rerun(log, previous_aux, current_aux):
+            break
+        previous_aux = current_aux
+
+    pdf = None
+    if result.returncode == 0:
+        compile_sandbox.check_pages(log)
+        save_session_files(session_id, workdir, jobname)
+        try:
+            pdf = (Path(workdir) / f"{jobname}.pdf").read_bytes()
+        except OSError:
+            pdf = None
+
+    return LatexRun(
+        returncode=result.returncode,
+        passes=passes,
+        log=log,
+        stdout=result.stdout.decode("utf-8", errors="replace"),
+        stderr=result.stderr.decode("utf-8", errors="replace"),
+        pdf=pdf,
+    )
+
+
+def latex_command(engine: Tool, jobname: str, halt_on_error: bool, format_path: Optional[str] = None) -> List[str]:
+    """Build the engine command line for one pass"""
+    if engine.name == "tectonic":
+        # Tectonic runs its own rerun loop and has no interaction modes
+        return [engine.path, "--keep-intermediates", "--keep-logs", f"{jobname}.tex"]
+    command = [engine.path, "-interaction=nonstopmode"]
+    if halt_on_error:
+        command.append("-halt-on-error")
+    if format_path:
+        command.append(f"-fmt={format_path}")
+    command.append(f"{jobname}.tex")
+    return command
+
+
+def _run_in(
+    workdir: str,
+    worker: Optional[LatexWorker],
+    source: str,
+    engine: Tool,
+    jobname: str,
+    timeout: float,
+    halt_on_error: bool,
+    session_id: Optional[str],
+    format_path: Optional[str] = None,
+) -> LatexRun:
+    """Write the source and run passes on a warm worker or fresh processes"""
+    (Path(workdir) / f"{jobname}.tex").write_text(source, encoding="utf-8")
+
+    if worker is not None and not (format_path and " " in format_path):
+        def run_pass():
+            return worker.run_pass(jobname, timeout, format_path)
+    else:
+        command = latex_command(engine, jobname, halt_on_error, format_path)
+
+        def run_pass():
+            return compile_sandbox.run(command, cwd=workdir, timeout=timeout)
+
+    max_passes = 1 if engine.manages_passes else MAX_PASSES
+    return run_latex(run_pass, workdir=workdir, jobname=jobname, max_passes=max_passes, session_id=session_id)
+
+
+@contextmanager
+def _no_worker() -> Iterator[None]:
+    yield None
+
+
+def compile_document(
+    latex_content: str,
+    engine: Tool,
+    jobname: str = "resume",
+    timeout: float = 30,
+    halt_on_error: bool = True,
+    session_id: Optional[str] = None,
+) -> LatexRun:
+    """
+    Compile a document to PDF bytes (returned in LatexRun.pdf).
+
+    The job runs in a warm worker's scratch directory when the engine and
+    pool allow it, otherwise in a throwaway directory. When a precompiled
+    format exists for the document's package preamble, only the rest of the
+    document is compiled against it. A failure there is retried in full only
+    when it may be the format's fault (see needs_fallback); if the full
+    document then builds, the format is retired.
+    """
+    if engine.supports_warm_workers:
+        worker_context = latex_workers.worker(engine.path, halt_on_error)
+    else:
+        worker_context = _no_worker()
+
+    with worker_context as worker:
+        if worker is not None:
+            workdir = str(worker.workdir)
+            cleanup = None
+        else:
+            SCRATCH_DIR.mkdir(parents=True, exist_ok=True)
+            workdir = cleanup = tempfile.mkdtemp(dir=SCRATCH_DIR)
+
+        try:
+            prepared = preamble_formats.prepare(latex_content, engine.path) if engine.supports_formats else None
+            if prepared:
+                run = _run_in(workdir, worker, prepared.source, engine, jobname,
+                              timeout, halt_on_error, session_id, prepared.format_path)
+                if run.returncode == 0:
+                    preamble_formats.record_success(prepared)
+                    return run
+                if not preamble_formats.needs_fallback(prepared, run.log):
+                    # Report line numbers of the full document, not of the remainder
+                    run.log = LOG_LINE_PATTERN.sub(lambda m: f"l.{int(m.group(1)) + prepared.line_offset}", run.log)
+                    return run
+
+            run = _run_in(workdir, worker, latex_content, engine, jobname,
+                          timeout, halt_on_error, session_id)
+            if prepared and run.returncode == 0:
+                preamble_formats.mark_broken(prepared.format_name)
+            return run
+        finally:
+            if cleanup:
+                shutil.rmtree(cleanup, ignore_errors=True)
@@ -0,0 +1,419 @@
+import bisect
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+# Environments whose body is not LaTeX and must not be tokenized
+VERBATIM_ENVIRONMENTS = {"verbatim", "verbatim*", "lstlisting", "minted", "comment"}
+# Commands whose first argument is a URL: % and # are literal there
+VERBATIM_ARGUMENT_COMMANDS = {"url", "href"}
+SECTION_COMMANDS = {"section"}
+# Commands that take [...] before their first mandatory argument
+OPTIONAL_ARGUMENT_COMMANDS = {
+    "documentclass", "usepackage", "RequirePackage", "section", "subsection", "subsubsection",
+    "chapter", "paragraph", "item", "includegraphics", "href", "cite", "footnote", "caption",
+    "newcommand", "renewcommand", "providecommand", "newenvironment", "renewenvironment",
+    "makebox", "framebox", "parbox", "color", "textcolor", "sqrt", "cvitem", "cventry",
+}
+# Commands that also take [...] after a mandatory argument (\begin{tabular}[t], \newcommand{\x}[1])
+TRAILING_OPTIONAL_COMMANDS = {
+    "begin", "newcommand", "renewcommand", "providecommand", "DeclareRobustCommand",
+    "newenvironment", "renewenvironment", "raisebox", "scalebox",
+}
+# Preamble commands whose options are commonly spread over several lines
+MULTILINE_OPTIONAL_COMMANDS = {"documentclass", "usepackage", "RequirePackage"}
+INDEX_CACHE_ITEMS = 32
+
+_PARAGRAPH_BREAK = re.compile(r"\n[ \t]*(\n|$)")
+
+
+@dataclass
+class Command:
+    """A control sequence and its brace-matched arguments"""
+    name: str
+    start: int
+    end: int  # just past the last argument
+    starred: bool = False
+    # (number of mandatory arguments before it, text) for each [...] group
+    optional: List[Tuple[int, str]] = field(default_factory=list)
+    args: List[str] = field(default_factory=list)
+
+
+@dataclass
+class Environment:
+    """A \\begin{name} ... \\end{name} span (end is just past \\end{name})"""
+    name: str
+    start: int
+    end: int
+
+
+@dataclass
+class LatexSection:
+    """A \\section block: from its heading up to the next section or \\end{document}"""
+    title: str
+    start: int
+    end: int
+    body_start: int  # just past the heading
+    starred: bool = False
+
+    def text(self, latex_content: str) -> str:
+        return latex_content[self.start:self.end]
+
+
+@dataclass
+class StructureError:
+    """Unbalanced brace or environment found while indexing"""
+    kind: str  # 'unclosed_brace', 'unexpected_brace', 'unclosed_environment', 'mismatched_environment', 'unexpected_end'
+    message: str
+    offset: int
+
+
+@dataclass
+class DocumentIndex:
+    """Structural index of one LaTeX document, built in a single pass"""
+    source: str
+    commands: List[Command]
+    environments: List[Environment]
+    sections: List[LatexSection]
+    errors: List[StructureError]
+    begin_document: Optional[int] = None
+    end_document: Optional[int] = None
+    _line_starts: Optional[List[int]] = None
+
+    def position(self, offset: int) -> Tuple[int, int]:
+        """1-based (line, column) of a character offset"""
+        if self._line_starts is None:
+            starts = [0]
+            find = self.source.find
+            newline = find("\n")
+            while newline >= 0:
+                starts.append(newline + 1)
+                newline = find("\n", newline + 1)
+            self._line_starts = starts
+        line = bisect.bisect_right(self._line_starts, offset) - 1
+        return line + 1, offset - self._line_starts[line] + 1
+
+    def find_commands(self, *names: str) -> List[Command]:
+        return [command for command in self.commands if command.name in names]
+
+    def first_arg(self, name: str) -> Optional[str]:
+        """First argument of the first use of a command, e.g. first_arg('documentclass')"""
+        for command in self.commands:
+            if command.name == name and command.args:
+                return command.args[0]
+        return None
+
+
+def _skip_optional(source: str, i: int, multiline: bool = False) -> int:
+    """
+    Return the index just past a [...] group starting at i (brace-aware),
+    or -1 if the bracket does not open one: the group may not cross a
+    newline (a blank line when multiline), an \\end or an unbalanced brace.
+    """
+    depth = 0
+    n = len(source)
+    j = i + 1
+    while j < n:
+        c = source[j]
+        if c == "\\":
+            if source.startswith("end", j + 1) and not source[j + 4:j + 5].isalpha():
+                return -1
+            j += 2
+            continue
+        if c == "{":
+            depth += 1
+        elif c == "}":
+            depth -= 1
+            if depth < 0:
+                return -1
+        elif c == "]" and depth == 0:
+            return j + 1
+        elif c == "\n" and (not multiline or _PARAGRAPH_BREAK.match(source, j)):
+            return -1
+        j += 1
+    return -1
+
+
+def _skip_verbatim_group(source: str, i: int) -> int:
+    """Return the index just past the {...} group starting at i, or -1 if unclosed (comments are not skipped)"""
+    depth = 0
+    n = len(source)
+    j = i
+    while j < n:
+        c = source[j]
+        if c == "\\":
+            j += 2
+            continue
+        if c == "{":
+            depth += 1
+        elif c == "}":
+            depth -= 1
+            if depth == 0:
+                return j + 1
+        j += 1
+    return -1
+
+
+def _takes_optional(source: str, command: Command, i: int) -> bool:
+    """Whether a [ at i can open an optional argument of command"""
+    if not command.args:
+        return command.name in OPTIONAL_ARGUMENT_COMMANDS
+    # After a mandatory argument only on the same line, for commands that take one there
+    return command.name in TRAILING_OPTIONAL_COMMANDS and "\n" not in source[command.end:i]
+
+
+def build_index(source: str) -> DocumentIndex:
+    """
+    Tokenize a document once and record commands (with their arguments),
+    environments, sections and brace/environment balance errors.
+    Runs in time linear in the document length.
+    """
+    n = len(source)
+    commands: List[Command] = []
+    environments: List[Environment] = []
+    errors: List[StructureError] = []
+    section_heads: List[Tuple[Command, str]] = []
+    groups: List[Tuple[int, Optional[Command]]] = []
+    env_stack: List[Tuple[str, int]] = []
+    begin_document = end_document = None
+
+    # Command that the next {...} or [...] belongs to, if only spaces intervene
+    attach: Optional[Command] = None
+    i = 0
+    while i < n:
+        c = source[i]
+
+        if c == "\\":
+            j = i + 1
+            if j < n and source[j].isalpha():
+                while j < n and source[j].isalpha():
+                    j += 1
+            else:
+                j = min(j + 1, n)
+            name = source[i + 1:j]
+            starred = j < n and source[j] == "*" and name.isalpha()
+            if starred:
+                j += 1
+
+            if name == "verb":
+                # \verb|...|: the delimiter is any character
+                if j < n:
+                    close = source.find(source[j], j + 1)
+                    j = n if close < 0 else close + 1
+                commands.append(Command(name, i, j, starred))
+                attach = None
+                i = j
+                continue
+
+            command = Command(name, i, j, starred)
+            commands.append(command)
+            attach = command if name.isalpha() else None
+            i = j
+            continue
+
+        if c == "%":
+            newline = source.find("\n", i)
+            i = n if newline < 0 else newline + 1
+            continue
+
+        if c == "[" and attach is not None and _takes_optional(source, attach, i):
+            end = _skip_optional(source, i, attach.name in MULTILINE_OPTIONAL_COMMANDS)
+            if end > 0:
+                attach.optional.append((len(attach.args), source[i + 1:end - 1]))
+                attach.end = end
+                i = end
+                continue
+
+        if c == "{" and attach is not None and attach.name in VERBATIM_ARGUMENT_COMMANDS and not attach.args:
+            end = _skip_verbatim_group(source, i)
+            if end < 0:
+                errors.append(StructureError("unclosed_brace", "Unclosed '{'", i))
+                i = n
+                continue
+            attach.args.append(source[i + 1:end - 1])
+            attach.end = end
+            i = end
+            continue
+
+        if c == "{":
+            groups.append((i, attach))
+            attach = None
+            i += 1
+            continue
+
+        if c == "}":
+            if not groups:
+                errors.append(StructureError("unexpected_brace", "Unmatched closing brace '}'", i))
+                i += 1
+                continue
+            start, owner = groups.pop()
+            attach = None
+            i += 1
+            if owner is None:
+                continue
+
+            argument = source[start + 1:i - 1]
+            owner.args.append(argument)
+            owner.end = i
+            attach = owner
+
+            if len(owner.args) == 1:
+                if owner.name == "begin":
+                    env_name = argument.strip()
+                    if env_name == "document":
+                        begin_document = owner.start
+                    if env_name in VERBATIM_ENVIRONMENTS:
+                        marker = f"\\end{{{env_name}}}"
+                        close = source.find(marker, i)
+                        if close < 0:
+                            errors.append(StructureError("unclosed_environment", f"\\begin{{{env_name}}} is never closed", owner.start))
+                            i = n
+                        else:
+                            environments.append(Environment(env_name, owner.start, close + len(marker)))
+                            commands.append(Command("end", close, close + len(marker), args=[env_name]))
+                            i = close + len(marker)
+                        attach = None
+                    else:
+                        env_stack.append((env_name, owner.start))
+                elif owner.name == "end":
+                    env_name = argument.strip()
+                    if env_name == "document":
+                        end_document = owner.start
+                    if not env_stack:
+                        errors.append(StructureError("unexpected_end", f"\\end{{{env_name}}} without a matching \\begin", owner.start))
+                    else:
+                        open_name, open_start = env_stack.pop()
+                        if open_name != env_name:
+                            errors.append(StructureError(
+                                "mismatched_environment",
+                                f"\\begin{{{open_name}}} is closed by \\end{{{env_name}}}",
+                                owner.start,
+                            ))
+                        environments.append(Environment(open_name, open_start, i))
+                elif owner.name in SECTION_COMMANDS and begin_document is not None:
+                    # Headings in the preamble live in macro bodies (\newcommand{\x}[1]{\section{#1}})
+                    section_heads.append((owner, argument.strip()))
+            continue
+
+        if attach is not None and not c.isspace():
+            attach = None
+        i += 1
+
+    for start, _ in groups:
+        errors.append(StructureError("unclosed_brace", "Unclosed '{'", start))
+    for env_name, start in env_stack:
+        errors.append(StructureError("unclosed_environment", f"\\begin{{{env_name}}} is never closed", start))
+    errors.sort(key=lambda error: error.offset)
+    environments.sort(key=lambda environment: environment.start)
+
+    # Sections run to the next heading, or to \end{document}
+    body_end = end_document if end_document is not None else n
+    heads = [(command, title) for command, title in section_heads if command.start < body_end]
+    sections = []
+    for index, (command, title) in enumerate(heads):
+        end = heads[index + 1][0].start if index + 1 < len(heads) else body_end
+        # Start at the beginning of the heading's line so indentation travels with it
+        line_start = source.rfind("\n", 0, command.start) + 1
+        start = line_start if not source[line_start:command.start].strip() else command.start
+        sections.append(LatexSection(title=title, start=start, end=end, body_start=command.end, starred=command.starred))
+
+    return DocumentIndex(
+        source=source,
+        commands=commands,
+        environments=environments,
+        sections=sections,
+        errors=errors,
+        begin_document=begin_document,
+        end_document=end_document,
+    )
+
+
+def plain_text(fragment: str) -> str:
+    """Strip control sequences, keeping argument text; one pass over the fragment"""
+    out: List[str] = []
+    n = len(fragment)
+    i = 0
+    skip_optional = False
+    while i < n:
+        c = fragment[i]
+        if c == "\\":
+            j = i + 1
+            if j < n and fragment[j].isalpha():
+                while j < n and fragment[j].isalpha():
+                    j += 1
+                if j < n and fragment[j] == "*":
+                    j += 1
+                out.append(" ")
+                skip_optional = True
+            else:
+                symbol = fragment[j] if j < n else ""
+                out.append("\n" if symbol == "\\" else symbol)
+                j += 1
+                skip_optional = False
+            i = j
+            continue
+        if c == "%":
+            newline = fragment.find("\n", i)
+            i = n if newline < 0 else newline + 1
+            continue
+        if c == "[" and skip_optional:
+            end = _skip_optional(fragment, i)
+            if end > 0:
+                i = end
+                continue
+        if c in "{}&~":
+            out.append(" ")
+            skip_optional = False
+        elif c == "$":
+            pass
+        else:
+            out.append(c)
+            if not c.isspace():
+                skip_optional = False
+        i += 1
+    return "".join(out)
+
+
+class DocumentIndexCache:
+    """Small LRU of document indexes keyed by content hash"""
+
+    def __init__(self, max_items: int = INDEX_CACHE_ITEMS):
+        self.max_items = max_items
+        self._indexes: "OrderedDict[str, DocumentIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0}
+
+    def get(self, source: str) -> DocumentIndex:
+        key = hashlib.sha256(source.encode("utf-8", errors="surrogatepass")).hexdigest()
+        with self._lock:
+            index = self._indexes.get(key)
+            if index is not None:
+                self._indexes.move_to_end(key)
+                self._stats["hits"] += 1
+                return index
+            self._stats["misses"] += 1
+
+        index = build_index(source)
+        with self._lock:
+            self._indexes[key] = index
+            while len(self._indexes) > self.max_items:
+                self._indexes.popitem(last=False)
+        return index
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["cached_indexes"] = len(self._indexes)
+        return stats
+
+
+# Singleton instance
+document_indexes = DocumentIndexCache()
+
+
+def get_index(source: str) -> DocumentIndex:
+    """Cached structural index for a document"""
+    return document_indexes.get(source)
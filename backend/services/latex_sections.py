@@ -0,0 +1,36 @@
+from typing import List, Optional
+
+from apps.backend.services.latex_index import LatexSection, get_index
+
+
+def _normalize_title(title: str) -> str:
+    return " ".join(title.split()).lower()
+
+
+def index_sections(latex_content: str) -> List[LatexSection]:
+    """Return every top-level section of a document in order"""
+    return get_index(latex_content).sections
+
+
+def find_section(latex_content: str, section_name: str) -> Optional[LatexSection]:
+    """Find a section by title (case and whitespace insensitive)"""
+    wanted = _normalize_title(section_name)
+    for section in index_sections(latex_content):
+        if _normalize_title(section.title) == wanted:
+            return section
+    return None
+
+
+def replace_section(latex_content: str, section: LatexSection, new_text: str) -> str:
+    """Splice rewritten section text back in, keeping the spacing before the next block"""
+    old_text = section.text(latex_content)
+    trailing = old_text[len(old_text.rstrip()):]
+    return latex_content[:section.start] + new_text.strip() + trailing + latex_content[section.end:]
+
+
+def document_class(latex_content: str) -> str:
+    """The \\documentclass line, which tells the model which commands are available"""
+    index = get_index(latex_content)
+    for command in index.find_commands("documentclass"):
+        return latex_content[command.start:command.end]
+    return ""
@@ -1,162 +1,217 @@
-import os
-import subprocess
-import uuid
-import re
 import base64
 import io
+import os
+import tempfile
+from functools import lru_cache
 from pathlib import Path
+from typing import List, Optional, Tuple
+from xml.sax.saxutils import escape
 from PIL import Image, ImageDraw, ImageFont
-from pdf2image import convert_from_path
 from reportlab.lib.pagesizes import letter
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
 from reportlab.lib.enums import TA_LEFT, TA_CENTER
+from apps.backend.services.compile_cache import compile_cache, make_cache_key
+from apps.backend.services.compile_sandbox import CompileLimitExceeded
+from apps.backend.services.latex_driver import compile_document, MAX_PASSES
+from apps.backend.services.toolchain import toolchain, EngineUnavailable
+from apps.backend.services.preview_service import preview_service
+from apps.backend.services.workspace import workspace
+from apps.backend.services.latex_index import get_index, plain_text
+
+TEMP_DIR = workspace.outputs_dir
 
-TEMP_DIR = Path("temp_latex")
-TEMP_DIR.mkdir(exist_ok=True)
+def write_output(pdf_file: Path, pdf_bytes: bytes) -> None:
+    """Write an output PDF atomically (a no-op if it exists), so /download never sees a partial file"""
+    if pdf_file.exists():
+        return
+    fd, temp_path = tempfile.mkstemp(dir=pdf_file.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(pdf_bytes)
+        os.replace(temp_path, pdf_file)
+    except OSError:
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+        raise
 
 def extract_text_from_latex(latex_content: str) -> dict:
     """Extract text content from LaTeX for simple PDF rendering"""
-    # Remove LaTeX commands and extract content
-    text = latex_content
+    index = get_index(latex_content)
     
-    # Extract name (usually after \name or in first section)
-    name_match = re.search(r'\\name\{([^}]+)\}', text)
-    name = name_match.group(1) if name_match else "Resume"
+    # Extract name (\name, or moderncv's \firstname + \familyname)
+    name = index.first_arg("name")
+    if not name:
+        name = " ".join(part for part in (index.first_arg("firstname"), index.first_arg("familyname")) if part)
+    name = " ".join(plain_text(name).split()) if name else "Resume"
     
     # Extract sections
     sections = []
-    
-    # Find section headers and content
-    section_pattern = r'\\section\{([^}]+)\}(.*?)(?=\\section|\\end\{document\}|$)'
-    for match in re.finditer(section_pattern, text, re.DOTALL):
-        section_title = match.group(1)
-        section_content = match.group(2)
-        
-        # Clean up LaTeX commands
-        content_clean = re.sub(r'\\[a-zA-Z]+(\[[^\]]*\])?(\{[^}]*\})?', '', section_content)
-        content_clean = content_clean.replace('\\\\', '\n').replace('&', ' ')
+    for section in index.sections:
+        content_clean = plain_text(latex_content[section.body_start:section.end])
         content_clean = ' '.join(content_clean.split())  # Clean whitespace
         
-        if content_clean.strip():
-            sections.append({'title': section_title, 'content': content_clean})
+        if content_clean:
+            sections.append({'title': " ".join(plain_text(section.title).split()), 'content': content_clean})
     
     return {'name': name, 'sections': sections}
 
-def create_simple_pdf(latex_content: str) -> str:
-    """Create a simple PDF from LaTeX content using reportlab"""
-    session_id = str(uuid.uuid4())
-    pdf_file = TEMP_DIR / f"{session_id}.pdf"
+# Cache key for the reportlab rendering of a document
+FALLBACK_ENGINE = "reportlab"
+
+@lru_cache(maxsize=1)
+def _fallback_styles() -> dict:
+    """Paragraph styles for the simple PDF, built once"""
+    styles = getSampleStyleSheet()
+    return {
+        'title': ParagraphStyle(
+            'CustomTitle',
+            parent=styles['Heading1'],
+            fontSize=24,
+            textColor='black',
+            spaceAfter=12,
+            alignment=TA_CENTER,
+            fontName='Helvetica-Bold'
+        ),
+        'section': ParagraphStyle(
+            'SectionHeader',
+            parent=styles['Heading2'],
+            fontSize=14,
+            textColor='black',
+            spaceAfter=6,
+            spaceBefore=12,
+            fontName='Helvetica-Bold',
+            borderWidth=0,
+            borderPadding=0,
+            borderColor='black',
+            borderRadius=0,
+        ),
+        'body': ParagraphStyle(
+            'CustomBody',
+            parent=styles['BodyText'],
+            fontSize=10,
+            textColor='black',
+            spaceAfter=6,
+            alignment=TA_LEFT,
+            fontName='Helvetica'
+        ),
+        'footer': ParagraphStyle('Footer', parent=styles['Normal'], fontSize=8,
+                                 textColor='gray', alignment=TA_CENTER),
+    }
+
+def render_simple_pdf(latex_content: str) -> bytes:
+    """Render a simple PDF from LaTeX content using reportlab, entirely in memory"""
+    cache_key = make_cache_key(latex_content, FALLBACK_ENGINE)
+    cached_pdf = compile_cache.get(cache_key)
+    if cached_pdf is not None:
+        return cached_pdf
     
     # Extract content
     parsed = extract_text_from_latex(latex_content)
+    styles = _fallback_styles()
     
     # Create PDF
-    doc = SimpleDocTemplate(str(pdf_file), pagesize=letter,
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=letter,
                            topMargin=0.75*inch, bottomMargin=0.75*inch,
                            leftMargin=0.75*inch, rightMargin=0.75*inch)
     
-    styles = getSampleStyleSheet()
-    
-    # Custom styles
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=24,
-        textColor='black',
-        spaceAfter=12,
-        alignment=TA_CENTER,
-        fontName='Helvetica-Bold'
-    )
-    
-    section_style = ParagraphStyle(
-        'SectionHeader',
-        parent=styles['Heading2'],
-        fontSize=14,
-        textColor='black',
-        spaceAfter=6,
-        spaceBefore=12,
-        fontName='Helvetica-Bold',
-        borderWidth=0,
-        borderPadding=0,
-        borderColor='black',
-        borderRadius=0,
-    )
-    
-    body_style = ParagraphStyle(
-        'CustomBody',
-        parent=styles['BodyText'],
-        fontSize=10,
-        textColor='black',
-        spaceAfter=6,
-        alignment=TA_LEFT,
-        fontName='Helvetica'
-    )
-    
     # Build document
     story = []
     
     # Add name/title
-    story.append(Paragraph(parsed['name'], title_style))
+    story.append(Paragraph(escape(parsed['name']), styles['title']))
     story.append(Spacer(1, 0.2*inch))
     
     # Add sections
     for section in parsed['sections']:
-        story.append(Paragraph(f"<b>{section['title']}</b>", section_style))
-        story.append(Paragraph(section['content'], body_style))
+        story.append(Paragraph(f"<b>{escape(section['title'])}</b>", styles['section']))
+        story.append(Paragraph(escape(section['content']), styles['body']))
         story.append(Spacer(1, 0.1*inch))
     
     # Add footer
     story.append(Spacer(1, 0.3*inch))
-    footer_style = ParagraphStyle('Footer', parent=styles['Normal'], fontSize=8, 
-                                  textColor='gray', alignment=TA_CENTER)
-    story.append(Paragraph("Generated by res-gen | AI Resume Generator", footer_style))
+    story.append(Paragraph("Generated by res-gen | AI Resume Generator", styles['footer']))
     
     doc.build(story)
+    pdf_bytes = buffer.getvalue()
+    # Memory only: the degraded path should not add disk churn
+    compile_cache.put(cache_key, pdf_bytes, spill=False)
+    return pdf_bytes
+
+def create_simple_pdf(latex_content: str) -> str:
+    """Create a simple PDF from LaTeX content using reportlab and save it for /download"""
+    pdf_bytes = render_simple_pdf(latex_content)
+    pdf_file = TEMP_DIR / f"{make_cache_key(latex_content, FALLBACK_ENGINE)}.pdf"
+    write_output(pdf_file, pdf_bytes)
     return str(pdf_file)
 
-def compile_latex_to_pdf(latex_content: str) -> str:
+def _compile_with_engine(latex_content: str, session_id: Optional[str], engine: Optional[str]) -> Tuple[Optional[str], Optional[bytes]]:
     """
-    Compiles LaTeX content to PDF.
-    Falls back to simple PDF generation if pdflatex is not available.
+    Compile with a TeX engine, using the shared compile cache.
+    Returns (cache_key, pdf_bytes), or (None, None) when the caller should fall back.
     """
-    # Try pdflatex first
-    session_id = str(uuid.uuid4())
-    tex_file = TEMP_DIR / f"{session_id}.tex"
-    pdf_file = TEMP_DIR / f"{session_id}.pdf"
-    
-    # Check if pdflatex exists
+    # Engines are detected once at startup, not probed per request
     try:
-        subprocess.run(["pdflatex", "--version"], 
-                      stdout=subprocess.PIPE, 
-                      stderr=subprocess.PIPE,
-                      timeout=5)
-        has_pdflatex = True
-    except (FileNotFoundError, subprocess.TimeoutExpired):
-        has_pdflatex = False
-    
-    if has_pdflatex:
-        # Write latex content to file
-        with open(tex_file, "w", encoding="utf-8") as f:
-            f.write(latex_content)
-            
-        try:
-            process = subprocess.run(
-                ["pdflatex", "-interaction=nonstopmode", "-output-directory", str(TEMP_DIR), str(tex_file)],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                timeout=10
-            )
-            
-            if process.returncode == 0 and pdf_file.exists():
-                return str(pdf_file)
-        except Exception as e:
-            print(f"pdflatex failed: {e}, falling back to simple PDF")
+        tool = toolchain.resolve_engine(latex_content, engine)
+    except EngineUnavailable as e:
+        print(f"{e}, falling back to simple PDF")
+        return None, None
     
-    # Fallback to simple PDF generation
-    print("Using simple PDF generation (pdflatex not available)")
-    return create_simple_pdf(latex_content)
+    # Serve byte-for-byte repeats from the shared compile cache
+    cache_key = make_cache_key(latex_content, tool.name, ("nonstopmode", f"max-passes={MAX_PASSES}"))
+    cached_pdf = compile_cache.get(cache_key)
+    if cached_pdf is not None:
+        return cache_key, cached_pdf
+
+    try:
+        process = compile_document(
+            latex_content,
+            tool,
+            jobname="resume",
+            timeout=10,
+            halt_on_error=False,
+            session_id=session_id
+        )
+        
+        if process.returncode == 0 and process.pdf:
+            compile_cache.put(cache_key, process.pdf)
+            return cache_key, process.pdf
+    except CompileLimitExceeded as e:
+        print(f"{tool.name} stopped ({e.reason}): {e}, falling back to simple PDF")
+    except Exception as e:
+        print(f"{tool.name} failed: {e}, falling back to simple PDF")
+    return None, None
+
+def compile_latex_to_bytes(latex_content: str, session_id: Optional[str] = None, engine: Optional[str] = None) -> bytes:
+    """
+    Compiles LaTeX content to PDF bytes without writing an output file.
+    Falls back to simple PDF generation if no suitable engine is available.
+    """
+    _, pdf_bytes = _compile_with_engine(latex_content, session_id, engine)
+    if pdf_bytes is not None:
+        return pdf_bytes
+    print("Using simple PDF generation (LaTeX compilation unavailable)")
+    return render_simple_pdf(latex_content)
+
+def compile_latex_to_pdf(latex_content: str, session_id: Optional[str] = None, engine: Optional[str] = None) -> str:
+    """
+    Compiles LaTeX content to a PDF file that /download can serve.
+    Falls back to simple PDF generation if no suitable engine is available.
+    """
+    cache_key, pdf_bytes = _compile_with_engine(latex_content, session_id, engine)
+    if pdf_bytes is None:
+        # Fallback to simple PDF generation
+        print("Using simple PDF generation (LaTeX compilation unavailable)")
+        return create_simple_pdf(latex_content)
+
+    # Output files are named by content hash, so repeats reuse the same file
+    pdf_file = TEMP_DIR / f"{cache_key}.pdf"
+    write_output(pdf_file, pdf_bytes)
+    return str(pdf_file)
 
 def create_error_image(error_message: str) -> str:
     """Create an image displaying an error message"""
@@ -206,30 +261,26 @@ def create_error_image(error_message: str) -> str:
     img_str = base64.b64encode(buffered.getvalue()).decode()
     return f"data:image/png;base64,{img_str}"
 
-def compile_latex_to_image(latex_content: str) -> str:
+def compile_latex_to_image(latex_content: str, session_id: Optional[str] = None, engine: Optional[str] = None) -> str:
     """
     Compiles LaTeX content to a base64-encoded PNG image for preview.
     Returns base64 data URL string.
     """
     try:
-        # First compile to PDF
-        pdf_path = compile_latex_to_pdf(latex_content)
+        # First compile to PDF (kept in memory; no output file needed)
+        pdf_bytes = compile_latex_to_bytes(latex_content, session_id, engine)
         
-        if not pdf_path or not os.path.exists(pdf_path):
+        if not pdf_bytes:
             return create_error_image("PDF generation failed")
         
-        # Convert PDF first page to image
+        # Convert PDF first page to image (served from the page raster cache
+        # when page 1 has not changed)
         try:
-            images = convert_from_path(pdf_path, first_page=1, last_page=1, dpi=150)
-            if not images:
+            preview = preview_service.render_pages(pdf_bytes, dpi=150, max_pages=1)
+            if not preview["pages"] or not preview["pages"][0]["image"]:
                 return create_error_image("PDF conversion to image failed")
             
-            # Convert to base64
-            buffered = io.BytesIO()
-            images[0].save(buffered, format="PNG")
-            img_str = base64.b64encode(buffered.getvalue()).decode()
-            
-            return f"data:image/png;base64,{img_str}"
+            return preview["pages"][0]["image"]
             
         except Exception as e:
             return create_error_image(f"Image conversion error: {str(e)}")
@@ -237,3 +288,21 @@ def compile_latex_to_image(latex_content: str) -> str:
     except Exception as e:
         return create_error_image(f"Compilation error: {str(e)}")
 
+def compile_latex_to_pages(
+    latex_content: str,
+    known_pages: List[str],
+    dpi: int = 150,
+    image_format: str = "png",
+    session_id: Optional[str] = None,
+    engine: Optional[str] = None
+) -> dict:
+    """
+    Compiles LaTeX and renders every page the client does not already have.
+    Returns the preview_service.render_pages payload.
+    """
+    return preview_service.render_pages(
+        compile_latex_to_bytes(latex_content, session_id, engine),
+        known_pages=known_pages,
+        dpi=dpi,
+        image_format=image_format
+    )
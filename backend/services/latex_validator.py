@@ -0,0 +1,238 @@
+import re
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional, Tuple
+
+from apps.backend.services.latex_index import Command, DocumentIndex, get_index
+
+# Shell escape and raw file/Lua access: never needed by a resume
+BLOCKED_COMMANDS = {
+    "ShellEscape": "\\ShellEscape runs shell commands",
+    "directlua": "\\directlua runs arbitrary Lua code",
+    "luaexec": "\\luaexec runs arbitrary Lua code",
+    "openout": "\\openout writes arbitrary files",
+    "openin": "\\openin reads arbitrary files",
+}
+# Commands that read another file by name
+FILE_COMMANDS = {"input", "include", "InputIfFileExists", "includegraphics", "includepdf", "verbatiminput", "lstinputlisting"}
+DEFINE_COMMANDS = {"def", "gdef", "edef", "xdef"}
+NEWCOMMAND_COMMANDS = {"newcommand", "renewcommand", "providecommand", "DeclareRobustCommand"}
+MAX_ISSUES = 20
+
+_DRIVE_PATH = re.compile(r"^[A-Za-z]:[\\/]")
+_MACRO_NAME = re.compile(r"\\([A-Za-z]+)")
+_MACRO_TOKEN = re.compile(r"\\(?:[A-Za-z@]+|.)")
+
+
+@dataclass
+class ValidationIssue:
+    """One reason a document cannot (or must not) be compiled"""
+    kind: str
+    message: str
+    line: int
+    column: int
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+class LatexValidationError(ValueError):
+    """Raised before compiling a document that fails validation"""
+
+    def __init__(self, issues: List[ValidationIssue]):
+        first = issues[0]
+        super().__init__(f"{first.message} (line {first.line}, column {first.column})")
+        self.issues = issues
+
+    def to_dict(self) -> dict:
+        return {"message": str(self), "errors": [issue.to_dict() for issue in self.issues]}
+
+
+def _issue(index: DocumentIndex, kind: str, message: str, offset: int) -> ValidationIssue:
+    line, column = index.position(offset)
+    return ValidationIssue(kind=kind, message=message, line=line, column=column)
+
+
+def _unsafe_path(path: str) -> bool:
+    """Absolute, home-relative, parent-relative or piped (\\input|"cmd") paths"""
+    path = path.strip().strip('"')
+    return (
+        path.startswith(("/", "\\", "~", "|"))
+        or bool(_DRIVE_PATH.match(path))
+        or ".." in path.replace("\\", "/").split("/")
+    )
+
+
+def _file_argument(latex_content: str, command: Command) -> str:
+    """The file name of \\input{file} or of the primitive form \\input file"""
+    if command.args:
+        return command.args[0]
+    rest = latex_content[command.end:command.end + 256].split(None, 1)
+    return rest[0] if rest else ""
+
+
+def _unconditional(body: str) -> bool:
+    """Bodies with a conditional may stop recursing; only those without one are followed"""
+    return "\\if" not in body and "\\else" not in body
+
+
+def _macro_cycles(macros: Dict[str, Tuple[str, int]]) -> List[List[str]]:
+    """
+    Cycles in the "body expands" graph of unconditional macros, e.g.
+    \\def\\x{\\x} or \\def\\a{\\b}\\def\\b{\\a}; each loops until TeX runs
+    out of memory or time. Each cycle is reported once, starting at the
+    macro defined first.
+    """
+    graph = {
+        name: [called for called in dict.fromkeys(_MACRO_NAME.findall(body)) if called in macros]
+        for name, (body, _) in macros.items()
+        if _unconditional(body)
+    }
+    cycles: List[List[str]] = []
+    state: Dict[str, int] = {}  # 1 = on the current path, 2 = finished
+    for root in sorted(graph, key=lambda name: macros[name][1]):
+        if root in state:
+            continue
+        path = [root]
+        stack = [iter(graph[root])]
+        state[root] = 1
+        while stack:
+            called = next(stack[-1], None)
+            if called is None:
+                state[path.pop()] = 2
+                stack.pop()
+            elif called not in graph or state.get(called) == 2:
+                continue
+            elif state.get(called) == 1:
+                cycle = path[path.index(called):]
+                first = min(range(len(cycle)), key=lambda k: macros[cycle[k]][1])
+                cycles.append(cycle[first:] + cycle[:first])
+            else:
+                state[called] = 1
+                path.append(called)
+                stack.append(iter(graph[called]))
+    return cycles
+
+
+def _skip_spaces(source: str, i: int) -> int:
+    while i < len(source) and source[i].isspace():
+        i += 1
+    return i
+
+
+def _read_group(source: str, i: int, open_char: str, close_char: str) -> Optional[Tuple[str, int]]:
+    """(content, end) of a balanced group starting at source[i], or None"""
+    if i >= len(source) or source[i] != open_char:
+        return None
+    depth = 0
+    j = i
+    while j < len(source):
+        c = source[j]
+        if c == "\\":
+            j += 2
+            continue
+        if c == open_char:
+            depth += 1
+        elif c == close_char:
+            depth -= 1
+            if depth == 0:
+                return source[i + 1:j], j + 1
+        j += 1
+    return None
+
+
+def _read_macro_name(source: str, i: int) -> Optional[Tuple[str, int]]:
+    """(name, end) of the macro being defined: \\x or {\\x}"""
+    group = _read_group(source, i, "{", "}")
+    if group:
+        name = group[0].strip()
+        end = group[1]
+    else:
+        match = _MACRO_TOKEN.match(source, i)
+        if not match:
+            return None
+        name, end = match.group(0), match.end()
+    return (name[1:], end) if name.startswith("\\") else None
+
+
+def _defined_macro(latex_content: str, command: Command) -> Optional[Tuple[str, str]]:
+    """
+    (name, body) for \\def\\x#1{...} or \\newcommand{\\x}[n][default]{...},
+    parsed from the source rather than the index so every signature form
+    finds the body group.
+    """
+    i = command.start + 1 + len(command.name) + (1 if command.starred else 0)
+    macro = _read_macro_name(latex_content, _skip_spaces(latex_content, i))
+    if macro is None:
+        return None
+    name, i = macro
+    if command.name in DEFINE_COMMANDS:
+        # Parameter text (#1#2, delimiters) runs up to the body's opening brace
+        i = latex_content.find("{", i)
+        if i < 0:
+            return None
+    else:
+        for _ in range(2):  # [n], then [default]
+            i = _skip_spaces(latex_content, i)
+            optional = _read_group(latex_content, i, "[", "]")
+            if optional is None:
+                break
+            i = optional[1]
+        i = _skip_spaces(latex_content, i)
+    body = _read_group(latex_content, i, "{", "}")
+    return (name, body[0]) if body else None
+
+
+def validate_latex(latex_content: str) -> List[ValidationIssue]:
+    """
+    Check a document before it is queued for compilation: balanced braces
+    and environments, \\begin{document}/\\end{document}, and no shell escape,
+    files outside the job directory or macros that expand to themselves.
+    Loops built from conditionals (\\loop\\iftrue\\repeat) are not detected;
+    the sandbox's CPU limit stops those. Uses the cached document index, so repeat checks are a dictionary lookup.
+    """
+    index = get_index(latex_content)
+    issues = [_issue(index, error.kind, error.message, error.offset) for error in index.errors]
+
+    if index.begin_document is None:
+        issues.append(_issue(index, "missing_begin_document", "\\begin{document} is missing", 0))
+    if index.end_document is None:
+        issues.append(_issue(index, "missing_end_document", "\\end{document} is missing", len(latex_content)))
+
+    commands = index.commands
+    macros: Dict[str, Tuple[str, int]] = {}
+    for command in commands:
+        name = command.name
+        if name == "write" and latex_content[command.end:command.end + 4].lstrip().startswith("18"):
+            issues.append(_issue(index, "shell_escape", "\\write18 runs shell commands", command.start))
+        elif BLOCKED_COMMANDS.get(name):
+            issues.append(_issue(index, "blocked_command", BLOCKED_COMMANDS[name], command.start))
+        elif name in FILE_COMMANDS:
+            path = _file_argument(latex_content, command)
+            if _unsafe_path(path):
+                issues.append(_issue(index, "unsafe_path", f"\\{name} may only read files next to the document, not '{path.strip()}'", command.start))
+        elif name in DEFINE_COMMANDS or name in NEWCOMMAND_COMMANDS:
+            macro = _defined_macro(latex_content, command)
+            if macro and macro[0].isalpha():
+                # The last definition wins, but a cycle is reported where it was first defined
+                first_offset = macros[macro[0]][1] if macro[0] in macros else command.start
+                macros[macro[0]] = (macro[1], first_offset)
+        if len(issues) >= MAX_ISSUES:
+            break
+
+    for cycle in _macro_cycles(macros):
+        if len(cycle) == 1:
+            message = f"\\{cycle[0]} expands to itself and would never finish"
+        else:
+            chain = " -> ".join(f"\\{name}" for name in cycle + cycle[:1])
+            message = f"Macros expand to each other and would never finish ({chain})"
+        issues.append(_issue(index, "recursive_macro", message, macros[cycle[0]][1]))
+
+    issues.sort(key=lambda issue: (issue.line, issue.column))
+    return issues[:MAX_ISSUES]
+
+
+def check_latex(latex_content: str) -> None:
+    """Raise LatexValidationError if the document should not be compiled"""
+    issues = validate_latex(latex_content)
+    if issues:
+        raise LatexValidationError(issues)
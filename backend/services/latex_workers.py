@@ -0,0 +1,264 @@
+import itertools
+import os
+import shutil
+import subprocess
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from apps.backend.services.compile_sandbox import compile_sandbox, CompileLimitExceeded
+from apps.backend.services.workspace import workspace
+
+load_dotenv()
+
+# Pool settings
+WORKERS_ENABLED = os.getenv("LATEX_WARM_WORKERS", "true").lower() in ("1", "true", "yes")
+WORKER_DIR = workspace.workers_dir
+MIN_IDLE_WORKERS = int(os.getenv("LATEX_WORKERS_MIN", "1"))
+MAX_WORKERS = int(os.getenv("LATEX_WORKERS_MAX", os.getenv("COMPILE_MAX_WORKERS", str(max(2, os.cpu_count() or 2)))))
+MAX_JOBS_PER_WORKER = int(os.getenv("LATEX_WORKER_MAX_JOBS", "50"))
+IDLE_TIMEOUT_SECONDS = float(os.getenv("LATEX_WORKER_IDLE_SECONDS", "300"))
+
+# (engine_path, halt_on_error)
+Profile = Tuple[str, bool]
+
+
+class LatexWorker:
+    """
+    A scratch directory plus a pre-started TeX process waiting on stdin.
+
+    TeX picks its format from the first line ("[&format] job.tex"), so the
+    format is still loaded after the pass is handed over; waiting saves only
+    the exec and kpathsea start-up. Every process serves one pass; the worker
+    spawns its replacement right after handing a pass off, so the next pass
+    or job gets that head start too.
+    """
+
+    _ids = itertools.count(1)
+
+    def __init__(self, profile: Profile, root: Path):
+        self.profile = profile
+        self.id = next(self._ids)
+        self.workdir = Path(root) / f"w{self.id}"
+        self.workdir.mkdir(parents=True, exist_ok=True)
+        self.jobs = 0
+        self.failed = False
+        self.last_used = time.monotonic()
+        self._process: Optional[subprocess.Popen] = None
+        self._spawn()
+
+    def _spawn(self) -> None:
+        engine_path, halt_on_error = self.profile
+        command = [engine_path, "-interaction=nonstopmode"]
+        if halt_on_error:
+            command.append("-halt-on-error")
+        self._process = compile_sandbox.popen(command, cwd=self.workdir, stdin=subprocess.PIPE)
+
+    def run_pass(self, jobname: str, timeout: float, format_path: Optional[str] = None) -> subprocess.CompletedProcess:
+        """Hand one pass to the waiting TeX process and wait for it to finish"""
+        process = self._process
+        self._process = None
+        if process is None or process.poll() is not None:
+            self._spawn()
+            process, self._process = self._process, None
+
+        first_line = f"&{format_path} {jobname}.tex\n" if format_path else f"{jobname}.tex\n"
+        try:
+            result = compile_sandbox.communicate(process, first_line.encode("utf-8"), timeout)
+        except (CompileLimitExceeded, OSError):
+            # Timeouts, limit signals and broken pipes leave the worker suspect
+            self.failed = True
+            raise
+        finally:
+            try:
+                self._spawn()
+            except OSError:
+                self.failed = True
+
+        # An ordinary LaTeX error (exit code 1) only leaves files behind, which
+        # reset() removes; a process killed by a signal is not trusted again
+        if result.returncode < 0:
+            self.failed = True
+        return result
+
+    def reset(self) -> None:
+        """Remove the previous job's files so the next job starts clean"""
+        for entry in self.workdir.iterdir():
+            try:
+                if entry.is_dir():
+                    shutil.rmtree(entry)
+                else:
+                    entry.unlink()
+            except OSError:
+                pass
+
+    def close(self) -> None:
+        """Stop the waiting process and delete the scratch directory"""
+        process, self._process = self._process, None
+        if process is not None and process.poll() is None:
+            compile_sandbox.kill(process)
+            try:
+                process.communicate(timeout=5)
+            except (subprocess.TimeoutExpired, OSError):
+                pass
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+
+class LatexWorkerPool:
+    """
+    Keeps warm LaTeX workers per engine profile.
+
+    The pool grows up to max_workers when every worker is busy and shrinks
+    back to min_idle once workers sit idle for idle_timeout seconds. Workers
+    are recycled after max_jobs jobs, or as soon as a pass times out, hits a
+    resource limit or dies from a signal; after a plain LaTeX error the
+    scratch directory is reset and the worker is kept.
+    """
+
+    def __init__(
+        self,
+        root: Path = WORKER_DIR,
+        min_idle: int = MIN_IDLE_WORKERS,
+        max_workers: int = MAX_WORKERS,
+        max_jobs: int = MAX_JOBS_PER_WORKER,
+        idle_timeout: float = IDLE_TIMEOUT_SECONDS,
+        enabled: bool = WORKERS_ENABLED,
+    ):
+        # Per-process root so several uvicorn workers can share WORKER_DIR
+        self.root = Path(root) / f"pid{os.getpid()}"
+        self.min_idle = min_idle
+        self.max_workers = max_workers
+        self.max_jobs = max_jobs
+        self.idle_timeout = idle_timeout
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._idle: Dict[Profile, List[LatexWorker]] = {}
+        self._busy = 0
+        self._stats = {"warm_acquires": 0, "cold_acquires": 0, "overflow": 0, "recycled": 0, "retired": 0}
+        if enabled:
+            shutil.rmtree(self.root, ignore_errors=True)
+            self.root.mkdir(parents=True, exist_ok=True)
+
+    def _total(self) -> int:
+        return self._busy + sum(len(workers) for workers in self._idle.values())
+
+    def _create(self, profile: Profile) -> Optional[LatexWorker]:
+        try:
+            return LatexWorker(profile, self.root)
+        except OSError as e:
+            print(f"Could not start LaTeX worker for {profile[0]}: {e}")
+            return None
+
+    def prewarm(self, engine_path: Optional[str], halt_on_error: bool) -> None:
+        """Start min_idle workers for a profile ahead of the first request"""
+        if not self.enabled or not engine_path:
+            return
+        profile = (engine_path, halt_on_error)
+        while True:
+            with self._lock:
+                if len(self._idle.get(profile, [])) >= self.min_idle or self._total() >= self.max_workers:
+                    return
+            worker = self._create(profile)
+            if worker is None:
+                return
+            with self._lock:
+                self._idle.setdefault(profile, []).append(worker)
+
+    def acquire(self, engine_path: str, halt_on_error: bool) -> Optional[LatexWorker]:
+        """Take an idle worker, start one if there is headroom, or return None"""
+        if not self.enabled:
+            return None
+        profile = (engine_path, halt_on_error)
+        with self._lock:
+            idle = self._idle.get(profile)
+            if idle:
+                worker = idle.pop()
+                self._busy += 1
+                self._stats["warm_acquires"] += 1
+                return worker
+            if self._total() >= self.max_workers:
+                self._stats["overflow"] += 1
+                return None
+            self._busy += 1
+            self._stats["cold_acquires"] += 1
+
+        worker = self._create(profile)
+        if worker is None:
+            with self._lock:
+                self._busy -= 1
+        return worker
+
+    def release(self, worker: LatexWorker) -> None:
+        """Return a worker after a job, recycling it if it is worn out or failed"""
+        worker.jobs += 1
+        worker.last_used = time.monotonic()
+        recycle = worker.failed or worker.jobs >= self.max_jobs
+
+        if recycle:
+            worker.close()
+            replacement = self._create(worker.profile)
+        else:
+            worker.reset()
+            replacement = worker
+
+        retired: List[LatexWorker] = []
+        with self._lock:
+            self._busy -= 1
+            if recycle:
+                self._stats["recycled"] += 1
+            if replacement is not None:
+                self._idle.setdefault(worker.profile, []).append(replacement)
+            retired = self._collect_idle()
+
+        for old in retired:
+            old.close()
+
+    def _collect_idle(self) -> List[LatexWorker]:
+        """Pick workers idle past the timeout beyond min_idle; caller must hold the lock"""
+        now = time.monotonic()
+        retired = []
+        for workers in self._idle.values():
+            workers.sort(key=lambda w: w.last_used)
+            while len(workers) > self.min_idle and now - workers[0].last_used > self.idle_timeout:
+                retired.append(workers.pop(0))
+        self._stats["retired"] += len(retired)
+        return retired
+
+    @contextmanager
+    def worker(self, engine_path: str, halt_on_error: bool) -> Iterator[Optional[LatexWorker]]:
+        """Context manager around acquire/release; yields None when no worker is available"""
+        worker = self.acquire(engine_path, halt_on_error)
+        try:
+            yield worker
+        except BaseException:
+            if worker is not None:
+                worker.failed = True
+            raise
+        finally:
+            if worker is not None:
+                self.release(worker)
+
+    def stats(self) -> Dict[str, int]:
+        """Return pool size and acquisition counters"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["busy"] = self._busy
+            stats["idle"] = sum(len(workers) for workers in self._idle.values())
+            stats["max_workers"] = self.max_workers
+        return stats
+
+    def shutdown(self) -> None:
+        """Stop every idle worker"""
+        with self._lock:
+            workers = [w for idle in self._idle.values() for w in idle]
+            self._idle.clear()
+        for worker in workers:
+            worker.close()
+
+
+# Singleton instance
+latex_workers = LatexWorkerPool()
@@ -0,0 +1,202 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple, Type
+
+from dotenv import load_dotenv
+from pydantic import BaseModel
+
+from apps.backend.services.cache_backend import shared_cache
+
+load_dotenv()
+
+# Cache settings
+LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", "3600"))
+LLM_CACHE_MAX_ITEMS = int(os.getenv("LLM_CACHE_MAX_ITEMS", "256"))
+
+
+def normalize_skills(skills: Iterable[str]) -> List[str]:
+    """Case-fold, trim and de-duplicate skills so equivalent lists share a key"""
+    return sorted({" ".join(skill.split()).lower() for skill in skills if skill and skill.strip()})
+
+
+def make_llm_key(kind: str, model: str, temperature: float, **inputs: Any) -> str:
+    """Build a cache key from the call kind, model settings and prompt inputs"""
+    payload = json.dumps(
+        {"kind": kind, "model": model, "temperature": temperature, "inputs": inputs},
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class _Flight:
+    """An upstream call shared by every caller with the same key"""
+
+    __slots__ = ("task", "waiters")
+
+    def __init__(self):
+        self.task: Optional[asyncio.Task] = None
+        self.waiters = 0
+
+
+class LLMCache:
+    """
+    TTL + LRU cache for model responses with single-flight coalescing.
+
+    Concurrent calls with the same key share one upstream request, run in its
+    own task and cancelled only once every waiter has gone. Failures are passed to every
+    waiter and are never cached. With a shared cache backend, responses are
+    also stored there as JSON (strings, or pydantic models registered with
+    register_model) so other workers can reuse them; get_or_compute does that
+    I/O on the default executor so a slow store never blocks the event loop.
+    """
+
+    def __init__(self, ttl_seconds: float = LLM_CACHE_TTL_SECONDS, max_items: int = LLM_CACHE_MAX_ITEMS):
+        self.ttl_seconds = ttl_seconds
+        self.max_items = max_items
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._inflight: Dict[str, _Flight] = {}
+        self._lock = threading.Lock()
+        self._models: Dict[str, Type[BaseModel]] = {}
+        self._stats = {"hits": 0, "shared_hits": 0, "misses": 0, "coalesced": 0, "stores": 0, "expired": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0 and self.max_items > 0
+
+    def register_model(self, model: Type[BaseModel]) -> None:
+        """Allow a pydantic response type to go through the shared backend"""
+        self._models[model.__name__] = model
+
+    def _encode(self, value: Any) -> Optional[dict]:
+        if isinstance(value, str):
+            return {"str": value}
+        if isinstance(value, BaseModel) and type(value).__name__ in self._models:
+            return {"model": type(value).__name__, "data": value.model_dump()}
+        return None
+
+    def _decode(self, payload: Any) -> Optional[Any]:
+        if not isinstance(payload, dict):
+            return None
+        if "str" in payload:
+            return payload["str"]
+        model = self._models.get(payload.get("model"))
+        return model(**payload["data"]) if model else None
+
+    def _get_shared(self, key: str) -> Optional[Any]:
+        if not shared_cache.shared or not self.enabled:
+            return None
+        value = self._decode(shared_cache.get_json(f"llm:{key}"))
+        if value is not None:
+            self._store(key, value)
+            with self._lock:
+                self._stats["shared_hits"] += 1
+        return value
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return a fresh cached value, or None"""
+        value = self._get_local(key)
+        return value if value is not None else self._get_shared(key)
+
+    def _get_local(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] < time.monotonic():
+                del self._entries[key]
+                self._stats["expired"] += 1
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                return entry[1]
+        return None
+
+    def put(self, key: str, value: Any) -> None:
+        """Store a value, evicting the least recently used entries"""
+        if not self.enabled:
+            return
+        self._store(key, value)
+        self._put_shared(key, value)
+
+    def _put_shared(self, key: str, value: Any) -> None:
+        if shared_cache.shared:
+            payload = self._encode(value)
+            if payload is not None:
+                shared_cache.set_json(f"llm:{key}", payload, self.ttl_seconds)
+
+    def _store(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            self._stats["stores"] += 1
+            while len(self._entries) > self.max_items:
+                self._entries.popitem(last=False)
+
+    async def _compute(self, key: str, flight: "_Flight", compute: Callable[[], Awaitable[Any]]) -> Any:
+        try:
+            value = await compute()
+            if self.enabled:
+                self._store(key, value)
+                if shared_cache.shared:
+                    # Waiters get the value now; the shared write finishes in the background
+                    asyncio.get_running_loop().run_in_executor(None, self._put_shared, key, value)
+            return value
+        finally:
+            if self._inflight.get(key) is flight:
+                del self._inflight[key]
+
+    async def get_or_compute(self, key: str, compute: Callable[[], Awaitable[Any]]) -> Any:
+        """Return the cached value, join an identical in-flight call, or run compute()"""
+        value = self._get_local(key)
+        if value is None and shared_cache.shared and self.enabled:
+            value = await asyncio.get_running_loop().run_in_executor(None, self._get_shared, key)
+        if value is not None:
+            return value
+
+        flight = self._inflight.get(key)
+        if flight is not None:
+            with self._lock:
+                self._stats["coalesced"] += 1
+        else:
+            with self._lock:
+                self._stats["misses"] += 1
+            # compute() runs in its own task, so cancelling the caller that
+            # started it does not cancel it for the other waiters
+            flight = _Flight()
+            flight.task = asyncio.get_running_loop().create_task(self._compute(key, flight, compute))
+            self._inflight[key] = flight
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                # Every caller went away; nobody needs the result
+                if self._inflight.get(key) is flight:
+                    del self._inflight[key]
+                flight.task.cancel()
+
+    def stats(self) -> dict:
+        """Return hit/miss/coalescing counters"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+        stats["inflight"] = len(self._inflight)
+        lookups = stats["hits"] + stats["shared_hits"] + stats["misses"] + stats["coalesced"]
+        stats["hit_rate"] = round((stats["hits"] + stats["shared_hits"] + stats["coalesced"]) / lookups, 4) if lookups else 0.0
+        return stats
+
+    def clear(self) -> None:
+        """Drop every cached response"""
+        with self._lock:
+            self._entries.clear()
+
+
+# Singleton instance
+llm_cache = LLMCache()
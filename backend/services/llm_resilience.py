@@ -0,0 +1,264 @@
+import asyncio
+import os
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Optional, Set
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Tail-latency settings
+LLM_DEADLINE_SECONDS = float(os.getenv("LLM_DEADLINE_SECONDS", "90"))
+LLM_ATTEMPT_TIMEOUT_SECONDS = float(os.getenv("LLM_ATTEMPT_TIMEOUT_SECONDS", "45"))
+# Streams fail if the model sends nothing for this long
+LLM_STREAM_IDLE_SECONDS = float(os.getenv("LLM_STREAM_IDLE_SECONDS", "30"))
+LLM_MAX_ATTEMPTS = int(os.getenv("LLM_MAX_ATTEMPTS", "3"))
+LLM_BACKOFF_BASE_SECONDS = float(os.getenv("LLM_BACKOFF_BASE_SECONDS", "0.5"))
+LLM_BACKOFF_MAX_SECONDS = float(os.getenv("LLM_BACKOFF_MAX_SECONDS", "8"))
+# Retries (and hedges) may add at most this fraction of extra upstream calls
+LLM_RETRY_BUDGET_RATIO = float(os.getenv("LLM_RETRY_BUDGET_RATIO", "0.1"))
+LLM_RETRY_BUDGET_MIN_TOKENS = float(os.getenv("LLM_RETRY_BUDGET_MIN_TOKENS", "10"))
+LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "false").lower() in ("1", "true", "yes")
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "0.95"))
+LLM_HEDGE_MIN_DELAY_SECONDS = float(os.getenv("LLM_HEDGE_MIN_DELAY_SECONDS", "2"))
+LLM_HEDGE_MIN_SAMPLES = 20
+LATENCY_WINDOW = 200
+
+# Upstream errors worth another attempt (google.api_core / grpc / httpx names)
+RETRYABLE_ERROR_NAMES = {
+    "ResourceExhausted",
+    "ServiceUnavailable",
+    "DeadlineExceeded",
+    "InternalServerError",
+    "TooManyRequests",
+    "ServerError",
+    "Aborted",
+    "ConnectError",
+    "ReadTimeout",
+    "RemoteProtocolError",
+}
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class LLMDeadlineExceeded(TimeoutError):
+    """Raised when an LLM call does not finish within its overall deadline"""
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Transient upstream failures: timeouts, connection errors, 429 and 5xx"""
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError, ConnectionError)):
+        return True
+    if type(error).__name__ in RETRYABLE_ERROR_NAMES:
+        return True
+    code = getattr(error, "code", None) or getattr(error, "status_code", None)
+    return isinstance(code, int) and code in RETRYABLE_STATUS_CODES
+
+
+class RetryBudget:
+    """
+    Token bucket that caps retries to a fraction of first attempts.
+
+    Every first attempt deposits `ratio` tokens and every retry or hedge
+    spends one, so an upstream outage cannot multiply our traffic by the
+    retry count.
+    """
+
+    def __init__(self, ratio: float = LLM_RETRY_BUDGET_RATIO, min_tokens: float = LLM_RETRY_BUDGET_MIN_TOKENS):
+        self.ratio = ratio
+        self.max_tokens = min_tokens
+        self._tokens = min_tokens
+        self._lock = threading.Lock()
+
+    def record_request(self) -> None:
+        with self._lock:
+            self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        with self._lock:
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+    @property
+    def tokens(self) -> float:
+        with self._lock:
+            return self._tokens
+
+
+class ResilientCaller:
+    """
+    Runs async LLM calls with a deadline, jittered retries and optional hedging.
+
+    call() takes a zero-argument coroutine factory so each attempt is a fresh
+    upstream request; anything awaitable works, which makes it easy to drive
+    with a stub model.
+    """
+
+    def __init__(
+        self,
+        deadline: float = LLM_DEADLINE_SECONDS,
+        attempt_timeout: float = LLM_ATTEMPT_TIMEOUT_SECONDS,
+        max_attempts: int = LLM_MAX_ATTEMPTS,
+        hedge: bool = LLM_HEDGE_ENABLED,
+        budget: Optional[RetryBudget] = None,
+    ):
+        self.deadline = deadline
+        self.attempt_timeout = attempt_timeout
+        self.max_attempts = max(1, max_attempts)
+        self.hedge = hedge
+        self.budget = budget or RetryBudget()
+        self._latencies: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self._lock = threading.Lock()
+        self._stats = {
+            "calls": 0,
+            "succeeded": 0,
+            "failed": 0,
+            "retries": 0,
+            "retries_denied": 0,
+            "hedges": 0,
+            "hedge_wins": 0,
+            "deadline_exceeded": 0,
+        }
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._stats[name] += 1
+
+    def hedge_delay(self) -> Optional[float]:
+        """Send a hedge once an attempt is slower than the recent p95 (None until enough samples)"""
+        with self._lock:
+            if len(self._latencies) < LLM_HEDGE_MIN_SAMPLES:
+                return None
+            ordered = sorted(self._latencies)
+        index = min(len(ordered) - 1, int(len(ordered) * LLM_HEDGE_PERCENTILE))
+        return max(LLM_HEDGE_MIN_DELAY_SECONDS, ordered[index])
+
+    async def _timed(self, factory: Callable[[], Awaitable[Any]], timeout: float) -> Any:
+        started = time.monotonic()
+        result = await asyncio.wait_for(factory(), timeout=timeout)
+        with self._lock:
+            self._latencies.append(time.monotonic() - started)
+        return result
+
+    async def _attempt(self, factory: Callable[[], Awaitable[Any]], timeout: float) -> Any:
+        """One attempt, hedged with a second request if the first is slow"""
+        delay = self.hedge_delay() if self.hedge else None
+        if delay is None or delay >= timeout:
+            return await self._timed(factory, timeout)
+
+        primary = asyncio.ensure_future(self._timed(factory, timeout))
+        pending: Set[asyncio.Future] = {primary}
+        try:
+            done, _ = await asyncio.wait(pending, timeout=delay)
+            if done:
+                return primary.result()
+            if not self.budget.try_spend():
+                self._count("retries_denied")
+                return await primary
+
+            self._count("hedges")
+            hedge = asyncio.ensure_future(self._timed(factory, timeout - delay))
+            pending.add(hedge)
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self._count("hedge_wins")
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def call(self, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """Run factory() until it succeeds, a non-retryable error occurs, or the deadline passes"""
+        self._count("calls")
+        self.budget.record_request()
+        deadline_at = time.monotonic() + self.deadline
+
+        for attempt in range(self.max_attempts):
+            remaining = deadline_at - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                result = await self._attempt(factory, min(self.attempt_timeout, remaining))
+                self._count("succeeded")
+                return result
+            except Exception as e:
+                retry = is_retryable(e) and attempt + 1 < self.max_attempts
+                if retry and not self.budget.try_spend():
+                    self._count("retries_denied")
+                    retry = False
+                if not retry:
+                    if isinstance(e, asyncio.TimeoutError):
+                        break
+                    self._count("failed")
+                    raise
+                print(f"LLM call failed ({type(e).__name__}: {e}); retrying")
+
+            self._count("retries")
+            # Full jitter keeps synchronized clients from retrying in lockstep
+            backoff = random.uniform(0, min(LLM_BACKOFF_MAX_SECONDS, LLM_BACKOFF_BASE_SECONDS * 2 ** attempt))
+            await asyncio.sleep(min(backoff, max(0.0, deadline_at - time.monotonic())))
+
+        self._count("deadline_exceeded")
+        self._count("failed")
+        raise LLMDeadlineExceeded(f"LLM call timed out (deadline {self.deadline:g}s, attempt timeout {self.attempt_timeout:g}s)")
+
+    async def stream(self, factory: Callable[[], AsyncIterator[Any]], idle_timeout: float = LLM_STREAM_IDLE_SECONDS) -> AsyncIterator[Any]:
+        """
+        Relay factory()'s chunks under the overall deadline, failing with
+        LLMDeadlineExceeded if it passes or no chunk arrives within
+        idle_timeout. Streams are not retried: chunks may already be out.
+        """
+        self._count("calls")
+        deadline_at = time.monotonic() + self.deadline
+        iterator = factory().__aiter__()
+        try:
+            while True:
+                remaining = deadline_at - time.monotonic()
+                wait = min(idle_timeout, remaining)
+                try:
+                    if wait <= 0:
+                        raise asyncio.TimeoutError()
+                    chunk = await asyncio.wait_for(iterator.__anext__(), timeout=wait)
+                except StopAsyncIteration:
+                    break
+                except asyncio.TimeoutError:
+                    self._count("deadline_exceeded")
+                    self._count("failed")
+                    if wait < idle_timeout:
+                        raise LLMDeadlineExceeded(f"LLM stream timed out (deadline {self.deadline:g}s)") from None
+                    raise LLMDeadlineExceeded(f"LLM stream stalled (no output for {idle_timeout:g}s)") from None
+                except Exception:
+                    self._count("failed")
+                    raise
+                yield chunk
+        finally:
+            close = getattr(iterator, "aclose", None)
+            if close is not None:
+                await close()
+        self._count("succeeded")
+
+    def stats(self) -> dict:
+        """Return retry/hedge counters and recent latency percentiles"""
+        with self._lock:
+            stats = dict(self._stats)
+            ordered = sorted(self._latencies)
+        if ordered:
+            stats["p50_seconds"] = round(ordered[len(ordered) // 2], 3)
+            stats["p95_seconds"] = round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 3)
+        stats["hedge_delay_seconds"] = self.hedge_delay() if self.hedge else None
+        stats["retry_budget_tokens"] = round(self.budget.tokens, 2)
+        return stats
+
+
+# Singleton instance
+llm_caller = ResilientCaller()
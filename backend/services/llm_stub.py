@@ -0,0 +1,80 @@
+import asyncio
+import json
+import os
+import random
+import re
+import time
+from typing import Any, AsyncIterator, List, Optional
+
+from dotenv import load_dotenv
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+load_dotenv()
+
+# Stub behaviour (GEMINI_MODEL=stub)
+STUB_LATENCY_SECONDS = float(os.getenv("LLM_STUB_LATENCY_SECONDS", "0.5"))
+STUB_SLOW_RATE = float(os.getenv("LLM_STUB_SLOW_RATE", "0.0"))
+STUB_SLOW_FACTOR = float(os.getenv("LLM_STUB_SLOW_FACTOR", "20"))
+STUB_FAILURE_RATE = float(os.getenv("LLM_STUB_FAILURE_RATE", "0.0"))
+
+# Streaming prompts ask for bare LaTeX instead of a JSON object
+RAW_LATEX_PATTERN = re.compile(r"raw LaTeX|Do not wrap it in JSON", re.IGNORECASE)
+
+STUB_DOCUMENT = "\\documentclass{article}\n\\begin{document}\n\\section*{Summary}\nStub resume.\n\\end{document}\n"
+
+
+class StubUnavailable(Exception):
+    """Simulated transient upstream failure (looks like a 503)"""
+    code = 503
+
+
+class StubChatModel(BaseChatModel):
+    """
+    Offline stand-in for Gemini with configurable latency, slow-call tail
+    and failure rate, for exercising deadlines, retries and hedging locally.
+    Replies with bare LaTeX when the prompt asks for it (the streaming
+    chains), otherwise with a JSON object every parser in gemini_service
+    accepts.
+    """
+    latency_seconds: float = STUB_LATENCY_SECONDS
+    slow_rate: float = STUB_SLOW_RATE
+    slow_factor: float = STUB_SLOW_FACTOR
+    failure_rate: float = STUB_FAILURE_RATE
+
+    @property
+    def _llm_type(self) -> str:
+        return "stub"
+
+    def _delay(self) -> float:
+        if random.random() < self.slow_rate:
+            return self.latency_seconds * self.slow_factor
+        return self.latency_seconds
+
+    def _content(self, messages: List[BaseMessage]) -> str:
+        if random.random() < self.failure_rate:
+            raise StubUnavailable("Stub model is unavailable")
+        prompt = "\n".join(str(message.content) for message in messages)
+        if RAW_LATEX_PATTERN.search(prompt):
+            return STUB_DOCUMENT
+        return json.dumps({"latex_code": STUB_DOCUMENT})
+
+    def _reply(self, messages: List[BaseMessage]) -> ChatResult:
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self._content(messages)))])
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        time.sleep(self._delay())
+        return self._reply(messages)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        await asyncio.sleep(self._delay())
+        return self._reply(messages)
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        """Spread the reply over one chunk per line, like a streaming upstream"""
+        lines = self._content(messages).splitlines(keepends=True)
+        delay = self._delay() / max(1, len(lines))
+        for line in lines:
+            await asyncio.sleep(delay)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=line))
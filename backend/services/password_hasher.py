@@ -0,0 +1,118 @@
+import asyncio
+import math
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict
+
+from dotenv import load_dotenv
+
+from apps.backend.services.auth_service import hash_password, verify_password
+
+load_dotenv()
+
+# Hashing pool settings (bcrypt releases the GIL, so threads run in parallel)
+HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+HASH_MAX_QUEUE = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", "64"))
+TIMING_WINDOW = 200
+
+
+class HashQueueFull(Exception):
+    """Raised when every hashing worker is busy and the wait queue is full"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Too many logins in progress, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt on a small dedicated thread pool.
+
+    A bcrypt call takes a few hundred milliseconds at the default work factor,
+    so running it on the event loop (or on the shared default executor)
+    stalls every other request during a login burst. Here at most
+    ``max_workers`` hashes run at once and at most ``max_queue`` wait; beyond
+    that callers get HashQueueFull and can answer 503 with Retry-After.
+    """
+
+    def __init__(self, max_workers: int = HASH_WORKERS, max_queue: int = HASH_MAX_QUEUE):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="password-hash")
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._queue_waits: Deque[float] = deque(maxlen=TIMING_WINDOW)
+        self._run_times: Deque[float] = deque(maxlen=TIMING_WINDOW)
+        self._stats = {"submitted": 0, "completed": 0, "failed": 0, "rejected": 0}
+
+    def _retry_after(self) -> int:
+        average = sum(self._run_times) / len(self._run_times) if self._run_times else 0.3
+        waves = max(1, self._in_flight - self.max_workers + 1) / self.max_workers
+        return max(1, math.ceil(average * waves))
+
+    def _timed(self, func: Callable[..., Any], args: tuple, submitted: float) -> Any:
+        started = time.monotonic()
+        with self._lock:
+            self._queue_waits.append(started - submitted)
+        result = func(*args)
+        # Only successful hashes feed the run-time percentiles and Retry-After
+        finished = time.monotonic()
+        with self._lock:
+            self._run_times.append(finished - started)
+        return result
+
+    async def _run(self, func: Callable[..., Any], *args) -> Any:
+        with self._lock:
+            if self._in_flight >= self.max_workers + self.max_queue:
+                self._stats["rejected"] += 1
+                raise HashQueueFull(self._retry_after())
+            self._in_flight += 1
+            self._stats["submitted"] += 1
+        try:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(self._pool, self._timed, func, args, time.monotonic())
+        except Exception:
+            with self._lock:
+                self._stats["failed"] += 1
+            raise
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+        with self._lock:
+            self._stats["completed"] += 1
+        return result
+
+    async def hash(self, password: str) -> str:
+        """hash_password off the event loop"""
+        return await self._run(hash_password, password)
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        """verify_password off the event loop"""
+        return await self._run(verify_password, password, hashed_password)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return queue depth, counters and queue-wait/run-time percentiles"""
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._stats)
+            stats["in_flight"] = self._in_flight
+            stats["queued"] = max(0, self._in_flight - self.max_workers)
+            stats["max_workers"] = self.max_workers
+            stats["max_queue"] = self.max_queue
+            waits = sorted(self._queue_waits)
+            runs = sorted(self._run_times)
+        for name, values in (("queue_wait", waits), ("hash", runs)):
+            if values:
+                stats[f"{name}_p50_seconds"] = round(values[len(values) // 2], 3)
+                stats[f"{name}_p95_seconds"] = round(values[min(len(values) - 1, int(len(values) * 0.95))], 3)
+                stats[f"{name}_max_seconds"] = round(values[-1], 3)
+        return stats
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+# Singleton instance
+password_hasher = PasswordHasher()
@@ -0,0 +1,246 @@
+import hashlib
+import re
+import zlib
+from typing import Dict, List, Optional, Set
+
+# Just enough of a PDF reader to fingerprint each page's drawing operators.
+# pdfTeX writes deterministic, compressed content streams, so a page whose
+# stream bytes, MediaBox and resources (fonts, font files, images) are
+# unchanged renders to the same raster.
+
+OBJ_PATTERN = re.compile(rb"(\d+)\s+(\d+)\s+obj\b")
+REF_PATTERN = re.compile(rb"(\d+)\s+\d+\s+R")
+LENGTH_PATTERN = re.compile(rb"/Length\s+(\d+)(\s+\d+\s+R)?")
+STREAM_PATTERN = re.compile(rb"stream\r?\n")
+TYPE_PATTERN = re.compile(rb"/Type\s*/(\w+)")
+KIDS_PATTERN = re.compile(rb"/Kids\s*\[([^\]]*)\]")
+CONTENTS_REF_PATTERN = re.compile(rb"/Contents\s+(\d+)\s+\d+\s+R")
+CONTENTS_ARRAY_PATTERN = re.compile(rb"/Contents\s*\[([^\]]*)\]")
+MEDIABOX_PATTERN = re.compile(rb"/MediaBox\s*\[([^\]]*)\]")
+RESOURCES_PATTERN = re.compile(rb"/Resources\s*")
+PARENT_PATTERN = re.compile(rb"/Parent\s+(\d+)\s+\d+\s+R")
+OBJSTM_HEADER_PATTERN = re.compile(rb"/N\s+(\d+)")
+OBJSTM_FIRST_PATTERN = re.compile(rb"/First\s+(\d+)")
+
+
+class _PdfObject:
+    __slots__ = ("body", "stream")
+
+    def __init__(self, body: bytes, stream: Optional[bytes] = None):
+        self.body = body
+        self.stream = stream
+
+
+def _parse_objects(pdf: bytes) -> Dict[int, _PdfObject]:
+    """Collect top-level objects; later definitions win, as with incremental updates"""
+    objects: Dict[int, _PdfObject] = {}
+    position = 0
+    while True:
+        match = OBJ_PATTERN.search(pdf, position)
+        if not match:
+            break
+        number = int(match.group(1))
+        start = match.end()
+        end = pdf.find(b"endobj", start)
+        if end < 0:
+            break
+
+        stream_match = STREAM_PATTERN.search(pdf, start, end)
+        stream = None
+        body_end = end
+        if stream_match and pdf.rfind(b">>", start, stream_match.start()) >= 0:
+            body_end = stream_match.start()
+            data_start = stream_match.end()
+            length = LENGTH_PATTERN.search(pdf, start, body_end)
+            if length and not length.group(2):
+                data_end = data_start + int(length.group(1))
+            else:
+                data_end = pdf.find(b"endstream", data_start)
+            if data_end < 0:
+                break
+            stream = pdf[data_start:data_end]
+            end = pdf.find(b"endobj", data_end)
+            if end < 0:
+                break
+
+        objects[number] = _PdfObject(pdf[start:body_end], stream)
+        position = end + len(b"endobj")
+    return objects
+
+
+def _expand_object_streams(objects: Dict[int, _PdfObject]) -> None:
+    """Unpack compressed object streams (PDF 1.5) into the object table"""
+    for obj in list(objects.values()):
+        if _object_type(obj) != b"ObjStm" or obj.stream is None:
+            continue
+        count = OBJSTM_HEADER_PATTERN.search(obj.body)
+        first = OBJSTM_FIRST_PATTERN.search(obj.body)
+        if not count or not first:
+            continue
+        try:
+            data = zlib.decompress(obj.stream)
+        except zlib.error:
+            continue
+        first_offset = int(first.group(1))
+        header = data[:first_offset].split()
+        pairs = [(int(header[i]), int(header[i + 1])) for i in range(0, min(len(header), 2 * int(count.group(1))) - 1, 2)]
+        for index, (number, offset) in enumerate(pairs):
+            start = first_offset + offset
+            end = first_offset + pairs[index + 1][1] if index + 1 < len(pairs) else len(data)
+            # Objects inside streams are never streams themselves
+            objects.setdefault(number, _PdfObject(data[start:end]))
+
+
+def _object_type(obj: _PdfObject) -> Optional[bytes]:
+    match = TYPE_PATTERN.search(obj.body)
+    return match.group(1) if match else None
+
+
+def _page_order(objects: Dict[int, _PdfObject]) -> List[int]:
+    """Walk the page tree from its root and return page object numbers in order"""
+    pages_nodes = {number for number, obj in objects.items() if _object_type(obj) == b"Pages"}
+    kids_of_any: Set[int] = set()
+    for number in pages_nodes:
+        kids = KIDS_PATTERN.search(objects[number].body)
+        if kids:
+            kids_of_any.update(int(ref) for ref in REF_PATTERN.findall(kids.group(1)))
+    roots = [number for number in pages_nodes if number not in kids_of_any]
+    if len(roots) != 1:
+        return []
+
+    order: List[int] = []
+    stack = [roots[0]]
+    seen: Set[int] = set()
+    while stack:
+        number = stack.pop()
+        if number in seen or number not in objects:
+            continue
+        seen.add(number)
+        body = objects[number].body
+        if _object_type(objects[number]) == b"Pages":
+            kids = KIDS_PATTERN.search(body)
+            if kids:
+                stack.extend(reversed([int(ref) for ref in REF_PATTERN.findall(kids.group(1))]))
+        else:
+            order.append(number)
+    return order
+
+
+def _resources(objects: Dict[int, _PdfObject], number: int) -> Optional[bytes]:
+    """
+    A page's /Resources value (an inline dictionary or a reference), inherited
+    from /Parent if absent; empty when no node has one, None if unreadable.
+    """
+    seen: Set[int] = set()
+    while number in objects and number not in seen:
+        seen.add(number)
+        body = objects[number].body
+        match = RESOURCES_PATTERN.search(body)
+        if match:
+            start = match.end()
+            if body.startswith(b"<<", start):
+                depth = 0
+                i = start
+                while i < len(body) - 1:
+                    pair = body[i:i + 2]
+                    if pair == b"<<":
+                        depth += 1
+                        i += 2
+                        continue
+                    if pair == b">>":
+                        depth -= 1
+                        i += 2
+                        if depth == 0:
+                            return body[start:i]
+                        continue
+                    i += 1
+                return None
+            ref = REF_PATTERN.match(body, start)
+            return ref.group(0) if ref else None
+        parent = PARENT_PATTERN.search(body)
+        if not parent:
+            return b""
+        number = int(parent.group(1))
+    return None
+
+
+def _hash_resources(objects: Dict[int, _PdfObject], resources: bytes, digest) -> bool:
+    """
+    Feed every object reachable from a resource dictionary into digest:
+    fonts with their descriptors and embedded FontFile streams, images and
+    form XObjects with their own resources. False if a reference dangles.
+    """
+    digest.update(resources)
+    stack = [int(ref) for ref in reversed(REF_PATTERN.findall(resources))]
+    seen: Set[int] = set()
+    while stack:
+        number = stack.pop()
+        if number in seen:
+            continue
+        if number not in objects:
+            return False
+        seen.add(number)
+        obj = objects[number]
+        if _object_type(obj) in (b"Page", b"Pages"):
+            continue
+        digest.update(b"\0%d\0" % number)
+        digest.update(obj.body)
+        if obj.stream is not None:
+            digest.update(obj.stream)
+        stack.extend(int(ref) for ref in reversed(REF_PATTERN.findall(obj.body)))
+    return True
+
+
+def page_digests(pdf: bytes) -> Optional[List[str]]:
+    """
+    Return one content digest per page, in page order.
+
+    Returns None when the file uses structures this reader does not follow;
+    callers should then treat every page as changed.
+    """
+    try:
+        objects = _parse_objects(pdf)
+        _expand_object_streams(objects)
+        order = _page_order(objects)
+    except (ValueError, IndexError):
+        return None
+    if not order:
+        return None
+
+    digests = []
+    resource_digests: Dict[bytes, bytes] = {}
+    for number in order:
+        body = objects[number].body
+        digest = hashlib.sha256()
+        mediabox = MEDIABOX_PATTERN.search(body)
+        if mediabox:
+            digest.update(b" ".join(mediabox.group(1).split()))
+        digest.update(b"\0")
+
+        resources = _resources(objects, number)
+        if resources is None:
+            return None
+        # Resource digests are shared by the pages that use the same dictionary
+        resource_digest = resource_digests.get(resources)
+        if resource_digest is None:
+            hashed = hashlib.sha256()
+            if not _hash_resources(objects, resources, hashed):
+                return None
+            resource_digest = resource_digests[resources] = hashed.digest()
+        digest.update(resource_digest)
+        digest.update(b"\0")
+
+        single = CONTENTS_REF_PATTERN.search(body)
+        if single:
+            refs = [int(single.group(1))]
+        else:
+            array = CONTENTS_ARRAY_PATTERN.search(body)
+            refs = [int(ref) for ref in REF_PATTERN.findall(array.group(1))] if array else []
+        for ref in refs:
+            content = objects.get(ref)
+            if content is None or content.stream is None:
+                return None
+            digest.update(content.stream)
+            digest.update(b"\0")
+        digests.append(digest.hexdigest()[:32])
+    return digests
@@ -1,151 +1,152 @@
-import subprocess
 import os
-import tempfile
-import shutil
+import uuid
 import base64
 from pathlib import Path
 from typing import Optional, Tuple
 
+from apps.backend.services.compile_cache import compile_cache, make_cache_key
+from apps.backend.services.compile_sandbox import CompileLimitExceeded
+from apps.backend.services.latex_driver import compile_document, MAX_PASSES
+from apps.backend.services.toolchain import toolchain, Tool, EngineUnavailable
+from apps.backend.services.workspace import workspace
+
 class PDFService:
     """Service for compiling LaTeX to PDF"""
     
     def __init__(self):
-        self.temp_dir = Path("temp_latex")
-        self.temp_dir.mkdir(exist_ok=True)
-        self.pdflatex_path = self._find_pdflatex()
-    
-    def _find_pdflatex(self) -> Optional[str]:
-        """Find pdflatex executable in common installation paths"""
-        # Try common MiKTeX installation paths
-        possible_paths = [
-            # User-specific installation
-            Path(os.path.expanduser("~")) / "AppData" / "Local" / "Programs" / "MiKTeX" / "miktex" / "bin" / "x64" / "pdflatex.exe",
-            # System-wide installation
-            Path("C:/Program Files/MiKTeX/miktex/bin/x64/pdflatex.exe"),
-            Path("C:/miktex/miktex/bin/x64/pdflatex.exe"),
-            # Check if it's in PATH
-            "pdflatex"
-        ]
-        
-        for path in possible_paths:
-            if path == "pdflatex":
-                # Check if it's in PATH
-                try:
-                    result = subprocess.run(
-                        ['pdflatex', '--version'],
-                        capture_output=True,
-                        timeout=5
-                    )
-                    if result.returncode == 0:
-                        return "pdflatex"
-                except:
-                    continue
-            else:
-                if Path(path).exists():
-                    return str(path)
-        
-        return None
+        self.temp_dir = workspace.outputs_dir
 
+    def _resolve_engine(self, latex_content: str, engine: Optional[str]) -> Tuple[Optional[Tool], Optional[str]]:
+        """Pick the engine for a document; returns (tool, error)"""
+        try:
+            return toolchain.resolve_engine(latex_content, engine), None
+        except EngineUnavailable as e:
+            return None, f"{e}. Please install a LaTeX distribution (e.g. MiKTeX or TeX Live)."
+
+    def cache_key(self, latex_content: str, engine_name: str = "pdflatex") -> str:
+        """Compile cache key for an engine and this service's options"""
+        return make_cache_key(latex_content, engine_name, ("halt-on-error", f"max-passes={MAX_PASSES}"))
     
-    def compile_latex_to_pdf(self, latex_content: str, output_name: str = "resume") -> Tuple[bool, Optional[str], Optional[str]]:
+    def compile_latex_to_pdf(self, latex_content: str, output_name: str = "resume", session_id: Optional[str] = None, engine: Optional[str] = None) -> Tuple[bool, Optional[str], Optional[str]]:
         """
         Compile LaTeX content to PDF.
+
+        session_id keeps the document's .aux between compiles so edits to
+        documents with cross-references usually converge in one pass.
+        engine overrides the engine picked from the document.
         
         Returns:
             Tuple of (success: bool, pdf_path: Optional[str], error: Optional[str])
         """
-        # Create a unique temporary directory for this compilation
-        temp_compile_dir = tempfile.mkdtemp(dir=self.temp_dir)
+        tool, error = self._resolve_engine(latex_content, engine)
+        if not tool:
+            return False, None, error
+
+        cache_key = self.cache_key(latex_content, tool.name)
+        cached_path = compile_cache.materialize(cache_key)
+        if cached_path:
+            return True, cached_path, None
+
+        success, pdf_bytes, error = self._compile(latex_content, tool, output_name, cache_key, session_id)
+        if not success:
+            return False, None, error
+
+        pdf_path = compile_cache.path_for(cache_key)
+        if not pdf_path:
+            # Disk spill failed; keep a copy in the main temp directory
+            pdf_path = os.path.join(self.temp_dir, f"{output_name}_{uuid.uuid4().hex}.pdf")
+            with open(pdf_path, 'wb') as f:
+                f.write(pdf_bytes)
+        return True, pdf_path, None
+
+    def compile_to_artifact(self, latex_content: str, session_id: Optional[str] = None, engine: Optional[str] = None) -> Tuple[bool, Optional[str], Optional[str]]:
+        """
+        Compile LaTeX into the compile cache without reading the PDF back.
         
+        Returns:
+            Tuple of (success: bool, artifact_id: Optional[str], error: Optional[str])
+        """
+        tool, error = self._resolve_engine(latex_content, engine)
+        if not tool:
+            return False, None, error
+
+        cache_key = self.cache_key(latex_content, tool.name)
+        if compile_cache.materialize(cache_key):
+            return True, cache_key, None
+
+        success, _, error = self._compile(latex_content, tool, "resume", cache_key, session_id)
+        if not success:
+            return False, None, error
+        return True, cache_key, None
+
+    def _compile(self, latex_content: str, tool: Tool, output_name: str, cache_key: str, session_id: Optional[str] = None) -> Tuple[bool, Optional[bytes], Optional[str]]:
+        """Run the engine on a cache miss and store the result"""
         try:
-            # Write LaTeX content to file
-            tex_file = os.path.join(temp_compile_dir, f"{output_name}.tex")
-            with open(tex_file, 'w', encoding='utf-8') as f:
-                f.write(latex_content)
+            # Runs on a warm worker, reuses a precompiled preamble format when
+            # one is ready and reruns the engine only while references settle
+            run = compile_document(
+                latex_content,
+                tool,
+                jobname=output_name,
+                timeout=30,
+                session_id=session_id
+            )
             
-            # Try to compile with pdflatex
-            try:
-                if not self.pdflatex_path:
-                    return False, None, "pdflatex not found. Please install MiKTeX or add it to your PATH."
-                
-                # Run pdflatex twice for proper formatting (references, etc.)
-                for _ in range(2):
-                    result = subprocess.run(
-                        [self.pdflatex_path, '-interaction=nonstopmode', '-halt-on-error', f'{output_name}.tex'],
-                        cwd=temp_compile_dir,
-                        capture_output=True,
-                        text=True,
-                        timeout=30
-                    )
-                
-                pdf_file = os.path.join(temp_compile_dir, f"{output_name}.pdf")
-                
-                if os.path.exists(pdf_file):
-                    # Move PDF to main temp directory
-                    final_pdf_path = os.path.join(self.temp_dir, f"{output_name}_{os.path.basename(temp_compile_dir)}.pdf")
-                    shutil.copy(pdf_file, final_pdf_path)
-                    return True, final_pdf_path, None
-                else:
-                    error_msg = result.stderr if result.stderr else "PDF compilation failed"
-                    return False, None, error_msg
-                    
-            except FileNotFoundError:
-                return False, None, "pdflatex not found. Please install a LaTeX distribution."
-            except subprocess.TimeoutExpired:
-                return False, None, "Compilation timeout - LaTeX code may have errors"
-            except Exception as e:
-                return False, None, f"Compilation error: {str(e)}"
+            if run.returncode == 0 and run.pdf:
+                compile_cache.put(cache_key, run.pdf)
+                return True, run.pdf, None
+            else:
+                error_msg = run.error_summary() or "PDF compilation failed"
+                return False, None, error_msg
                 
-        finally:
-            # Clean up temporary compilation directory
-            try:
-                shutil.rmtree(temp_compile_dir)
-            except:
-                pass
+        except FileNotFoundError:
+            return False, None, f"{tool.name} not found. Please install a LaTeX distribution."
+        except CompileLimitExceeded as e:
+            return False, None, f"Compilation stopped ({e.reason}): {e}"
+        except Exception as e:
+            return False, None, f"Compilation error: {str(e)}"
     
     def pdf_to_base64(self, pdf_path: str) -> Optional[str]:
         """Convert PDF file to base64 data URL"""
         try:
             with open(pdf_path, 'rb') as f:
-                pdf_bytes = f.read()
-                base64_encoded = base64.b64encode(pdf_bytes).decode('utf-8')
-                return f"data:application/pdf;base64,{base64_encoded}"
+                return self.bytes_to_base64(f.read())
         except Exception as e:
             print(f"Error encoding PDF to base64: {e}")
             return None
+
+    def bytes_to_base64(self, pdf_bytes: bytes) -> str:
+        """Convert PDF bytes to base64 data URL"""
+        base64_encoded = base64.b64encode(pdf_bytes).decode('utf-8')
+        return f"data:application/pdf;base64,{base64_encoded}"
     
-    def compile_and_encode(self, latex_content: str) -> Tuple[bool, Optional[str], Optional[str]]:
+    def compile_and_encode(self, latex_content: str, session_id: Optional[str] = None, engine: Optional[str] = None) -> Tuple[bool, Optional[str], Optional[str]]:
         """
         Compile LaTeX and return base64-encoded PDF.
         
         Returns:
             Tuple of (success: bool, base64_pdf: Optional[str], error: Optional[str])
         """
-        success, pdf_path, error = self.compile_latex_to_pdf(latex_content)
+        tool, error = self._resolve_engine(latex_content, engine)
+        if not tool:
+            return False, None, error
+
+        # Repeated sources skip the engine and the disk round-trip entirely
+        cache_key = self.cache_key(latex_content, tool.name)
+        cached_pdf = compile_cache.get(cache_key)
+        if cached_pdf is not None:
+            return True, self.bytes_to_base64(cached_pdf), None
+
+        success, pdf_bytes, error = self._compile(latex_content, tool, "resume", cache_key, session_id)
         
         if not success:
             return False, None, error
         
-        base64_pdf = self.pdf_to_base64(pdf_path)
-        
-        if base64_pdf:
-            return True, base64_pdf, None
-        else:
-            return False, None, "Failed to encode PDF"
+        return True, self.bytes_to_base64(pdf_bytes), None
     
     def cleanup_old_files(self, max_age_hours: int = 24):
-        """Remove PDF files older than max_age_hours"""
-        import time
-        current_time = time.time()
-        
-        for file_path in self.temp_dir.glob("*.pdf"):
-            if os.path.isfile(file_path):
-                file_age = current_time - os.path.getmtime(file_path)
-                if file_age > (max_age_hours * 3600):
-                    try:
-                        os.remove(file_path)
-                    except:
-                        pass
+        """Remove PDF files older than max_age_hours (the workspace janitor also does this)"""
+        return workspace.remove_older_than("outputs", max_age_hours * 3600)
 
 # Singleton instance
 pdf_service = PDFService()
@@ -0,0 +1,254 @@
+import hashlib
+import os
+import re
+import shutil
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from collections import OrderedDict
+from typing import Dict, Optional, Set, Tuple
+
+from dotenv import load_dotenv
+
+from apps.backend.services.compile_sandbox import compile_sandbox, CompileLimitExceeded
+from apps.backend.services.workspace import workspace
+
+load_dotenv()
+
+# Format cache settings
+FORMAT_DIR = workspace.formats_dir
+FORMATS_ENABLED = os.getenv("LATEX_PRECOMPILED_PREAMBLE", "true").lower() in ("1", "true", "yes")
+DUMP_TIMEOUT_SECONDS = 60
+
+# mylatexformat convention: everything above this marker goes into the format
+END_OF_DUMP_PATTERN = re.compile(r"^%\s*endofdump\s*$", re.MULTILINE)
+
+# Lines that load code and are safe to freeze into a format
+PACKAGE_LINE_PATTERN = re.compile(
+    r"^[ \t]*\\(documentclass|usepackage|RequirePackage|moderncvstyle|moderncvcolor|usetikzlibrary)\b.*$",
+    re.MULTILINE,
+)
+
+BEGIN_DOCUMENT_PATTERN = re.compile(r"^[^%\n]*\\begin\{document\}", re.MULTILINE)
+
+# Log messages that point at the format or the split rather than the document
+FORMAT_ERROR_PATTERN = re.compile(
+    r"format file|was written by|Can be used only in preamble|Option clash|Two \\documentclass",
+    re.IGNORECASE,
+)
+BUILT_BODIES_MAX_ITEMS = 1024
+
+
+@dataclass
+class SplitDocument:
+    """A document split into its dumpable package prefix and the rest"""
+    static_preamble: str
+    remainder: str
+
+
+def _balanced(line: str) -> bool:
+    """True if a line closes every brace and bracket it opens (ignoring a trailing comment)"""
+    code = re.split(r"(?<!\\)%", line, maxsplit=1)[0]
+    return code.count("{") == code.count("}") and code.count("[") == code.count("]")
+
+
+def split_document(latex_content: str) -> Optional[SplitDocument]:
+    """
+    Split a document after the package lines at the top of its preamble.
+
+    The static part is \\documentclass and the package lines directly
+    below it (blank and comment lines may sit between them), or everything
+    above an explicit %endofdump marker. It ends at the first other line, so
+    \\newcommand definitions and personal data such as \\firstname or
+    \\title stay in the remainder even when more \\usepackage lines follow,
+    and documents built from the same template share one format.
+    """
+    begin = BEGIN_DOCUMENT_PATTERN.search(latex_content)
+    if not begin:
+        return None
+    preamble_end = begin.start()
+
+    marker = END_OF_DUMP_PATTERN.search(latex_content, 0, preamble_end)
+    if marker:
+        split_at = marker.end()
+    else:
+        split_at = None
+        offset = 0
+        for line in latex_content[:preamble_end].splitlines(keepends=True):
+            stripped = line.strip()
+            if stripped and not stripped.startswith("%"):
+                if not PACKAGE_LINE_PATTERN.match(line) or not _balanced(line):
+                    break
+                split_at = offset + len(line.rstrip("\r\n"))
+            offset += len(line)
+        if split_at is None:
+            return None
+
+    static_preamble = latex_content[:split_at]
+    if "\\documentclass" not in static_preamble:
+        return None
+    return SplitDocument(static_preamble=static_preamble, remainder=latex_content[split_at:])
+
+
+def _engine_fingerprint(engine_path: str) -> str:
+    """Identify an engine binary so upgrades invalidate old formats"""
+    resolved = shutil.which(engine_path) or engine_path
+    try:
+        stat = os.stat(resolved)
+        return f"{resolved}:{stat.st_size}:{int(stat.st_mtime)}"
+    except OSError:
+        return resolved
+
+
+@dataclass
+class PreparedSource:
+    """Source to compile against a precompiled format"""
+    format_name: str
+    format_path: str
+    source: str
+    line_offset: int = 0  # lines of the document that live in the format
+
+    @property
+    def body_digest(self) -> str:
+        return hashlib.sha256(self.source.encode("utf-8")).hexdigest()
+
+
+class PreambleFormatCache:
+    """Builds and reuses .fmt files for each distinct static preamble"""
+
+    def __init__(self, format_dir: Path = FORMAT_DIR, enabled: bool = FORMATS_ENABLED):
+        self.format_dir = Path(format_dir).resolve()
+        self.format_dir.mkdir(parents=True, exist_ok=True)
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._building: Set[str] = set()
+        self._broken: Set[str] = set()
+        # Formats with at least one successful compile, and the bodies that built against them
+        self._proven: Set[str] = set()
+        self._built_bodies: "OrderedDict[Tuple[str, str], None]" = OrderedDict()
+        self._stats = {"hits": 0, "builds": 0, "build_failures": 0, "fallbacks": 0}
+
+    def _format_name(self, engine_path: str, static_preamble: str) -> str:
+        digest = hashlib.sha256()
+        digest.update(_engine_fingerprint(engine_path).encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(static_preamble.encode("utf-8"))
+        return f"pre-{digest.hexdigest()[:32]}"
+
+    def prepare(self, latex_content: str, engine_path: str) -> Optional[PreparedSource]:
+        """
+        Return the source to compile against a ready format, or None.
+
+        A missing format is dumped in the background, so the first compile of
+        a new preamble runs normally and later compiles pick the format up.
+        """
+        if not self.enabled:
+            return None
+        split = split_document(latex_content)
+        if not split:
+            return None
+
+        name = self._format_name(engine_path, split.static_preamble)
+        format_file = self.format_dir / f"{name}.fmt"
+
+        with self._lock:
+            if name in self._broken:
+                return None
+            if format_file.exists():
+                self._stats["hits"] += 1
+                return PreparedSource(
+                    format_name=name,
+                    format_path=str(self.format_dir / name),
+                    source=split.remainder,
+                    line_offset=split.static_preamble.count("\n"),
+                )
+            if name in self._building:
+                return None
+            self._building.add(name)
+
+        threading.Thread(
+            target=self._dump_format,
+            args=(name, engine_path, split.static_preamble),
+            name=f"fmt-{name[:12]}",
+            daemon=True,
+        ).start()
+        return None
+
+    def _dump_format(self, name: str, engine_path: str, static_preamble: str) -> None:
+        """Run the engine in ini mode to dump a format for the static preamble"""
+        source_file = self.format_dir / f"{name}.tex"
+        try:
+            source_file.write_text(static_preamble + "\n\\dump\n", encoding="utf-8")
+            result = compile_sandbox.run(
+                [engine_path, "-ini", "-interaction=nonstopmode", "-halt-on-error",
+                 f"-jobname={name}", f"&{Path(engine_path).stem}", f"{name}.tex"],
+                cwd=self.format_dir,
+                timeout=DUMP_TIMEOUT_SECONDS,
+            )
+            built = result.returncode == 0 and (self.format_dir / f"{name}.fmt").exists()
+        except (OSError, CompileLimitExceeded) as e:
+            print(f"Format dump failed for {name}: {e}")
+            built = False
+
+        with self._lock:
+            self._building.discard(name)
+            if built:
+                self._stats["builds"] += 1
+            else:
+                self._stats["build_failures"] += 1
+                self._broken.add(name)
+
+        for ext in ("tex", "log"):
+            try:
+                (self.format_dir / f"{name}.{ext}").unlink()
+            except OSError:
+                pass
+
+    def record_success(self, prepared: PreparedSource) -> None:
+        """Remember that a body built against a format"""
+        key = (prepared.format_name, prepared.body_digest)
+        with self._lock:
+            self._proven.add(prepared.format_name)
+            self._built_bodies[key] = None
+            self._built_bodies.move_to_end(key)
+            while len(self._built_bodies) > BUILT_BODIES_MAX_ITEMS:
+                self._built_bodies.popitem(last=False)
+
+    def needs_fallback(self, prepared: PreparedSource, log: str) -> bool:
+        """
+        Whether a failed compile against a format should be retried in full.
+
+        Most failures are errors in the document itself, which the full
+        compile would repeat. Only retry when the log points at the format,
+        when the format has never built anything, or when this same body
+        built against it before.
+        """
+        if FORMAT_ERROR_PATTERN.search(log):
+            return True
+        with self._lock:
+            if prepared.format_name not in self._proven:
+                return True
+            return (prepared.format_name, prepared.body_digest) in self._built_bodies
+
+    def mark_broken(self, format_name: str) -> None:
+        """Stop using a format after a compile against it failed"""
+        with self._lock:
+            self._broken.add(format_name)
+            self._proven.discard(format_name)
+            self._stats["fallbacks"] += 1
+        try:
+            (self.format_dir / f"{format_name}.fmt").unlink()
+        except OSError:
+            pass
+
+    def stats(self) -> Dict[str, int]:
+        """Return format cache counters"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["broken"] = len(self._broken)
+            stats["building"] = len(self._building)
+        return stats
+
+
+# Singleton instance
+preamble_formats = PreambleFormatCache()
@@ -0,0 +1,190 @@
+import base64
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from dotenv import load_dotenv
+from pdf2image import convert_from_bytes, pdfinfo_from_bytes
+
+from apps.backend.services.cache_backend import shared_cache
+from apps.backend.services.pdf_pages import page_digests
+from apps.backend.services.toolchain import toolchain
+
+load_dotenv()
+
+# Raster cache settings
+RASTER_CACHE_BYTES = int(os.getenv("PREVIEW_CACHE_BYTES", str(64 * 1024 * 1024)))
+MIN_DPI = 36
+MAX_DPI = 300
+
+IMAGE_FORMATS = {
+    "png": ("PNG", "image/png", {"optimize": False}),
+    "webp": ("WEBP", "image/webp", {"quality": 80, "method": 0}),
+    "jpeg": ("JPEG", "image/jpeg", {"quality": 80}),
+}
+
+
+class PreviewService:
+    """
+    Renders PDF pages to images, one cached raster per page.
+
+    Pages are identified by a digest of their content stream, so an edit
+    that only touches page 2 re-rasterizes page 2 alone, and a client that
+    already holds a page's digest gets no image for it at all.
+    """
+
+    def __init__(self, max_bytes: int = RASTER_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._rasters: "OrderedDict[Tuple[str, int, str], bytes]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "shared_hits": 0, "misses": 0, "rendered_pages": 0, "skipped_known": 0}
+
+    def _shared_key(self, key: Tuple[str, int, str]) -> str:
+        digest, dpi, image_format = key
+        return f"raster:{digest}:{dpi}:{image_format}"
+
+    def _get(self, key: Tuple[str, int, str]) -> Optional[bytes]:
+        with self._lock:
+            data = self._rasters.get(key)
+            if data is not None:
+                self._rasters.move_to_end(key)
+                self._stats["hits"] += 1
+                return data
+
+        # Another worker may already have rendered this page
+        data = shared_cache.get(self._shared_key(key)) if shared_cache.shared else None
+        with self._lock:
+            self._stats["shared_hits" if data is not None else "misses"] += 1
+        if data is not None:
+            self._put(key, data, share=False)
+        return data
+
+    def _put(self, key: Tuple[str, int, str], data: bytes, share: bool = True) -> None:
+        if share and shared_cache.shared:
+            shared_cache.set(self._shared_key(key), data)
+        with self._lock:
+            previous = self._rasters.pop(key, None)
+            if previous is not None:
+                self._bytes -= len(previous)
+            self._rasters[key] = data
+            self._bytes += len(data)
+            while self._rasters and self._bytes > self.max_bytes:
+                _, evicted = self._rasters.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def _poppler_path(self) -> Optional[str]:
+        pdftoppm = toolchain.rasterizer("pdftoppm")
+        return os.path.dirname(pdftoppm.path) if pdftoppm else None
+
+    def _digests(self, pdf_bytes: bytes) -> List[str]:
+        """Per-page digests, falling back to whole-file digests when the PDF can't be read"""
+        digests = page_digests(pdf_bytes)
+        if digests is not None:
+            return digests
+        info = pdfinfo_from_bytes(pdf_bytes, poppler_path=self._poppler_path())
+        file_digest = hashlib.sha256(pdf_bytes).hexdigest()
+        return [f"{file_digest[:24]}{index:08d}" for index in range(int(info.get("Pages", 1)))]
+
+    def _rasterize(self, pdf_bytes: bytes, pages: Sequence[int], dpi: int, image_format: str) -> Dict[int, bytes]:
+        """Rasterize the given 1-based pages, one pdftoppm run per contiguous range"""
+        pil_format, _, save_options = IMAGE_FORMATS[image_format]
+        poppler_path = self._poppler_path()
+        rendered: Dict[int, bytes] = {}
+
+        ranges: List[List[int]] = []
+        for page in sorted(pages):
+            if ranges and page == ranges[-1][1] + 1:
+                ranges[-1][1] = page
+            else:
+                ranges.append([page, page])
+
+        for first, last in ranges:
+            images = convert_from_bytes(
+                pdf_bytes, dpi=dpi, first_page=first, last_page=last, poppler_path=poppler_path
+            )
+            for offset, image in enumerate(images):
+                if pil_format == "JPEG" and image.mode != "RGB":
+                    image = image.convert("RGB")
+                buffered = io.BytesIO()
+                image.save(buffered, format=pil_format, **save_options)
+                rendered[first + offset] = buffered.getvalue()
+
+        with self._lock:
+            self._stats["rendered_pages"] += len(rendered)
+        return rendered
+
+    def render_pages(
+        self,
+        pdf_bytes: bytes,
+        known_pages: Sequence[str] = (),
+        dpi: int = 150,
+        image_format: str = "png",
+        max_pages: Optional[int] = None,
+    ) -> dict:
+        """
+        Render every page that the client does not already have.
+
+        Returns {"version", "page_count", "pages": [{"index", "digest",
+        "changed", "image"}]}; "image" is a data URL, or None for pages whose
+        digest is in known_pages.
+        """
+        image_format = image_format.lower()
+        if image_format not in IMAGE_FORMATS:
+            raise ValueError(f"Unsupported image format '{image_format}'")
+        dpi = max(MIN_DPI, min(MAX_DPI, int(dpi)))
+        mime = IMAGE_FORMATS[image_format][1]
+
+        digests = self._digests(pdf_bytes)
+        if max_pages is not None:
+            digests = digests[:max_pages]
+        known = set(known_pages)
+
+        images: Dict[int, bytes] = {}
+        missing: List[int] = []
+        for index, digest in enumerate(digests, start=1):
+            if digest in known:
+                continue
+            cached = self._get((digest, dpi, image_format))
+            if cached is not None:
+                images[index] = cached
+            else:
+                missing.append(index)
+
+        if missing:
+            rendered = self._rasterize(pdf_bytes, missing, dpi, image_format)
+            for index, data in rendered.items():
+                self._put((digests[index - 1], dpi, image_format), data)
+                images[index] = data
+
+        pages = []
+        for index, digest in enumerate(digests, start=1):
+            changed = digest not in known
+            data = images.get(index)
+            pages.append({
+                "index": index,
+                "digest": digest,
+                "changed": changed,
+                "image": f"data:{mime};base64,{base64.b64encode(data).decode()}" if changed and data else None,
+            })
+
+        with self._lock:
+            self._stats["skipped_known"] += len(digests) - sum(1 for page in pages if page["changed"])
+
+        version = hashlib.sha256("".join(digests).encode("utf-8")).hexdigest()[:32]
+        return {"version": version, "page_count": len(digests), "pages": pages}
+
+    def stats(self) -> Dict[str, int]:
+        """Return raster cache counters"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["cached_rasters"] = len(self._rasters)
+            stats["cached_bytes"] = self._bytes
+        return stats
+
+
+# Singleton instance
+preview_service = PreviewService()
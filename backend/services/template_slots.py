@@ -0,0 +1,169 @@
+import os
+import re
+from typing import Any, Dict, List
+
+from pydantic import BaseModel, Field
+
+# Slot markup used by templates/<name>.slots.tex:
+#   <<name>>                  escaped value (lists of strings are joined with ", ")
+#   <<#list>> ... <</list>>   repeat the block for each item; <<.>> is the item itself
+#   <<?name>> ... <</name>>   keep the block only if the value is non-empty
+SLOT_TOKEN_PATTERN = re.compile(r"<<([#?/]?)([A-Za-z_][\w]*|\.)>>")
+
+LATEX_ESCAPES = {
+    "\\": r"\textbackslash{}",
+    "&": r"\&",
+    "%": r"\%",
+    "$": r"\$",
+    "#": r"\#",
+    "_": r"\_",
+    "{": r"\{",
+    "}": r"\}",
+    "~": r"\textasciitilde{}",
+    "^": r"\textasciicircum{}",
+}
+LATEX_SPECIAL_PATTERN = re.compile(r"[\\&%$#_{}~^]")
+
+
+class ExperienceEntry(BaseModel):
+    title: str = Field(description="Job title")
+    company: str = Field(description="Employer name")
+    location: str = Field(default="", description="City or 'Remote'")
+    start: str = Field(default="", description="Start date, e.g. 'Jan 2020'")
+    end: str = Field(default="", description="End date or 'Present'")
+    description: str = Field(default="", description="One-sentence summary of the role")
+    highlights: List[str] = Field(default_factory=list, description="Achievement bullet points, plain text")
+
+
+class EducationEntry(BaseModel):
+    degree: str = Field(description="Degree and field of study")
+    institution: str = Field(description="School or university")
+    location: str = Field(default="")
+    start: str = Field(default="")
+    end: str = Field(default="")
+    description: str = Field(default="")
+
+
+class SkillGroup(BaseModel):
+    category: str = Field(description="Skill category, e.g. 'Languages'")
+    items: List[str] = Field(description="Skills in this category")
+
+
+class ResumeSlots(BaseModel):
+    """Typed content for a template's slots; plain text, never LaTeX"""
+    first_name: str = Field(default="")
+    last_name: str = Field(default="")
+    title: str = Field(default="", description="Headline, usually the target role")
+    email: str = Field(default="")
+    phone: str = Field(default="")
+    location: str = Field(default="")
+    summary: str = Field(default="", description="Professional summary, 2-4 sentences")
+    experience: List[ExperienceEntry] = Field(default_factory=list)
+    education: List[EducationEntry] = Field(default_factory=list)
+    skills: List[SkillGroup] = Field(default_factory=list)
+
+
+def latex_escape(text: str) -> str:
+    """Escape LaTeX special characters in plain text"""
+    return LATEX_SPECIAL_PATTERN.sub(lambda match: LATEX_ESCAPES[match.group(0)], text)
+
+
+def slot_names(template: str) -> List[str]:
+    """Top-level slots a template uses, in order of first appearance"""
+    names: List[str] = []
+    depth = 0
+    for match in SLOT_TOKEN_PATTERN.finditer(template):
+        kind, name = match.groups()
+        if kind == "/":
+            depth -= 1
+            continue
+        if depth == 0 and name != "." and name not in names:
+            names.append(name)
+        if kind in ("#", "?"):
+            depth += 1
+    return names
+
+
+def _lookup(scopes: List[Any], name: str) -> Any:
+    if name == ".":
+        return scopes[-1]
+    for scope in reversed(scopes):
+        if isinstance(scope, dict) and name in scope:
+            return scope[name]
+    return None
+
+
+def _find_close(template: str, name: str, start: int) -> re.Match:
+    """Find the <</name>> that closes a block opened just before start"""
+    depth = 1
+    for match in SLOT_TOKEN_PATTERN.finditer(template, start):
+        kind, token_name = match.groups()
+        if token_name != name:
+            continue
+        if kind in ("#", "?"):
+            depth += 1
+        elif kind == "/":
+            depth -= 1
+            if depth == 0:
+                return match
+    raise ValueError(f"Unclosed slot block '{name}'")
+
+
+def _render(template: str, scopes: List[Any]) -> str:
+    out = []
+    position = 0
+    while True:
+        match = SLOT_TOKEN_PATTERN.search(template, position)
+        if not match:
+            out.append(template[position:])
+            return "".join(out)
+        out.append(template[position:match.start()])
+        kind, name = match.groups()
+        value = _lookup(scopes, name)
+
+        if kind in ("#", "?"):
+            close = _find_close(template, name, match.end())
+            block = template[match.end():close.start()]
+            if kind == "#":
+                for item in value or []:
+                    out.append(_render(block, scopes + [item]))
+            elif value:
+                out.append(_render(block, scopes))
+            position = close.end()
+        elif kind == "/":
+            raise ValueError(f"Unexpected closing slot '{name}'")
+        else:
+            if isinstance(value, list):
+                value = ", ".join(str(item) for item in value)
+            out.append(latex_escape(str(value)) if value is not None else "")
+            position = match.end()
+
+
+def render_slots(template: str, slots: ResumeSlots) -> str:
+    """Render a slot template with escaped values"""
+    return _render(template, [slots.model_dump() if hasattr(slots, "model_dump") else slots.dict()])
+
+
+def describe_slots(names: List[str]) -> str:
+    """One line per slot, for the prompt"""
+    fields = getattr(ResumeSlots, "model_fields", None) or ResumeSlots.__fields__
+    lines = []
+    for name in names:
+        field = fields.get(name)
+        if field is None:
+            continue
+        info = getattr(field, "field_info", field)
+        description = getattr(info, "description", None) or name.replace("_", " ")
+        lines.append(f"- {name}: {description}")
+    return "\n".join(lines)
+
+
+def load_slot_templates(template_dir: str, names: List[str]) -> Dict[str, str]:
+    """Read templates/<name>.slots.tex for each template that has one"""
+    templates: Dict[str, str] = {}
+    for name in names:
+        path = os.path.join(template_dir, f"{name}.slots.tex")
+        if os.path.isfile(path):
+            with open(path, "r", encoding="utf-8") as f:
+                templates[name] = f.read()
+    return templates
@@ -0,0 +1,172 @@
+import os
+import re
+import shutil
+import subprocess
+import threading
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Preferred engine when neither the request nor the document picks one
+DEFAULT_ENGINE = os.getenv("LATEX_DEFAULT_ENGINE", "pdflatex")
+
+# Fastest first; used when a document does not ask for a specific engine
+ENGINE_SPEED_ORDER = ("pdflatex", "xelatex", "lualatex", "tectonic")
+UNICODE_ENGINES = ("xelatex", "lualatex", "tectonic")
+RASTERIZERS = ("pdftoppm",)
+
+# Engine capabilities that the compile pipeline depends on
+ENGINE_CAPABILITIES = {
+    "pdflatex": {"supports_formats": True, "supports_warm_workers": True, "manages_passes": False},
+    "xelatex": {"supports_formats": False, "supports_warm_workers": True, "manages_passes": False},
+    "lualatex": {"supports_formats": False, "supports_warm_workers": True, "manages_passes": False},
+    "tectonic": {"supports_formats": False, "supports_warm_workers": False, "manages_passes": True},
+}
+
+# "% !TEX program = xelatex" (TeXShop / TeXstudio / VS Code convention)
+MAGIC_PROGRAM_PATTERN = re.compile(r"^%\s*!\s*TEX\s+(?:TS-)?program\s*=\s*(\w+)", re.IGNORECASE | re.MULTILINE)
+
+# Packages that only build under a Unicode engine
+UNICODE_PACKAGE_PATTERN = re.compile(r"\\usepackage(\[[^\]]*\])?\{[^}]*\b(fontspec|unicode-math|polyglossia)\b")
+
+
+class EngineUnavailable(ValueError):
+    """Raised when a requested engine is unknown or not installed"""
+
+
+@dataclass
+class Tool:
+    """A detected executable and what it can do"""
+    name: str
+    kind: str  # 'engine' or 'rasterizer'
+    path: str
+    version: Optional[str] = None
+    supports_formats: bool = False
+    supports_warm_workers: bool = False
+    manages_passes: bool = False
+
+
+def _candidate_paths(name: str) -> List[str]:
+    """PATH lookup plus the usual MiKTeX install locations on Windows"""
+    candidates = []
+    found = shutil.which(name)
+    if found:
+        candidates.append(found)
+    if os.name == "nt":
+        exe = f"{name}.exe"
+        candidates.extend([
+            str(Path(os.path.expanduser("~")) / "AppData" / "Local" / "Programs" / "MiKTeX" / "miktex" / "bin" / "x64" / exe),
+            str(Path("C:/Program Files/MiKTeX/miktex/bin/x64") / exe),
+            str(Path("C:/miktex/miktex/bin/x64") / exe),
+        ])
+    return candidates
+
+
+def _probe_version(path: str, flag: str) -> Optional[str]:
+    """Run the tool once and keep the first line of its version banner"""
+    try:
+        result = subprocess.run([path, flag], capture_output=True, timeout=5)
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    if result.returncode != 0:
+        return None
+    output = (result.stdout or result.stderr).decode("utf-8", errors="replace").strip()
+    return output.splitlines()[0] if output else ""
+
+
+class ToolchainRegistry:
+    """
+    Detects TeX engines and rasterizers once and caches the result.
+
+    Replaces per-request `pdflatex --version` probes; call detect() at
+    startup, or let the first lookup trigger it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tools: Optional[Dict[str, Tool]] = None
+
+    def detect(self, force: bool = False) -> Dict[str, Tool]:
+        """Probe every known tool (once, unless force is set)"""
+        with self._lock:
+            if self._tools is not None and not force:
+                return self._tools
+
+            tools: Dict[str, Tool] = {}
+            for name in ENGINE_SPEED_ORDER:
+                for path in _candidate_paths(name):
+                    if not os.path.exists(path):
+                        continue
+                    version = _probe_version(path, "--version")
+                    if version is None:
+                        continue
+                    tools[name] = Tool(name=name, kind="engine", path=path, version=version, **ENGINE_CAPABILITIES[name])
+                    break
+
+            for name in RASTERIZERS:
+                for path in _candidate_paths(name):
+                    if not os.path.exists(path):
+                        continue
+                    version = _probe_version(path, "-v")
+                    if version is None:
+                        continue
+                    tools[name] = Tool(name=name, kind="rasterizer", path=path, version=version)
+                    break
+
+            self._tools = tools
+            return tools
+
+    def engines(self) -> List[Tool]:
+        """Installed engines, fastest first"""
+        tools = self.detect()
+        return [tools[name] for name in ENGINE_SPEED_ORDER if name in tools]
+
+    def engine(self, name: Optional[str] = None) -> Tool:
+        """Return an installed engine by name (or the default one)"""
+        tools = self.detect()
+        name = (name or DEFAULT_ENGINE).lower()
+        if name not in ENGINE_CAPABILITIES:
+            raise EngineUnavailable(f"Unknown LaTeX engine '{name}'")
+        tool = tools.get(name)
+        if tool is None:
+            raise EngineUnavailable(f"LaTeX engine '{name}' is not installed")
+        return tool
+
+    def resolve_engine(self, latex_content: str, requested: Optional[str] = None) -> Tool:
+        """
+        Pick the engine for a document.
+
+        An explicit request wins, then a "% !TEX program = ..." line in the
+        document (which is how templates choose), then the fastest installed
+        engine that can build the document.
+        """
+        if requested:
+            return self.engine(requested)
+
+        magic = MAGIC_PROGRAM_PATTERN.search(latex_content[:2048])
+        if magic:
+            return self.engine(magic.group(1))
+
+        candidates = UNICODE_ENGINES if UNICODE_PACKAGE_PATTERN.search(latex_content) else ENGINE_SPEED_ORDER
+        preferred = [DEFAULT_ENGINE] if DEFAULT_ENGINE in candidates else []
+        tools = self.detect()
+        for name in preferred + list(candidates):
+            if name in tools:
+                return tools[name]
+        raise EngineUnavailable("No LaTeX engine that can build this document is installed")
+
+    def rasterizer(self, name: str = "pdftoppm") -> Optional[Tool]:
+        """Return an installed rasterizer, if any"""
+        return self.detect().get(name)
+
+    def describe(self) -> List[dict]:
+        """Serializable view of every detected tool"""
+        return [asdict(tool) for tool in self.detect().values()]
+
+
+# Singleton instance
+toolchain = ToolchainRegistry()
@@ -0,0 +1,270 @@
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Workspace settings
+WORKSPACE_DIR = Path(os.getenv("LATEX_WORKSPACE_DIR", "temp_latex"))
+SCRATCH_IN_MEMORY = os.getenv("LATEX_SCRATCH_IN_MEMORY", "false").lower() in ("1", "true", "yes")
+MEMORY_SCRATCH_DIR = Path(os.getenv("LATEX_MEMORY_SCRATCH_DIR", "/dev/shm"))
+MAX_BYTES = int(os.getenv("LATEX_WORKSPACE_MAX_BYTES", str(2 * 1024 * 1024 * 1024)))
+MAX_FILES = int(os.getenv("LATEX_WORKSPACE_MAX_FILES", "50000"))
+OUTPUT_MAX_AGE_SECONDS = float(os.getenv("LATEX_OUTPUT_MAX_AGE_SECONDS", str(24 * 3600)))
+SESSION_MAX_AGE_SECONDS = float(os.getenv("LATEX_SESSION_MAX_AGE_SECONDS", str(7 * 24 * 3600)))
+SCRATCH_MAX_AGE_SECONDS = float(os.getenv("LATEX_SCRATCH_MAX_AGE_SECONDS", "3600"))
+JANITOR_INTERVAL_SECONDS = float(os.getenv("LATEX_JANITOR_INTERVAL_SECONDS", "60"))
+
+# Areas whose entries the quota may evict, least recently used first.
+# Formats and live worker directories are never evicted.
+EVICTABLE_AREAS = ("outputs", "sessions", "cache")
+
+
+def _tree_usage(path: Path) -> Tuple[int, int, float]:
+    """Return (bytes, files, newest mtime) for a file or directory tree"""
+    try:
+        stat = path.stat()
+    except OSError:
+        return 0, 0, 0.0
+    if not path.is_dir():
+        return stat.st_size, 1, stat.st_mtime
+
+    total_bytes, total_files, newest = 0, 0, stat.st_mtime
+    for dirpath, _, filenames in os.walk(path):
+        for filename in filenames:
+            try:
+                file_stat = os.stat(os.path.join(dirpath, filename))
+            except OSError:
+                continue
+            total_bytes += file_stat.st_size
+            total_files += 1
+            newest = max(newest, file_stat.st_mtime)
+    return total_bytes, total_files, newest
+
+
+def _remove(path: Path) -> None:
+    try:
+        if path.is_dir():
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            path.unlink()
+    except OSError:
+        pass
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+
+class Workspace:
+    """
+    Owns every directory the compile pipeline writes to.
+
+    Layout under the workspace root:
+        outputs/   PDFs served by /download
+        cache/     compile cache disk spill
+        sessions/  per-document .aux files
+        formats/   precompiled preamble formats
+    Scratch space (throwaway compile dirs and warm worker dirs) lives under
+    scratch/, or on a RAM-backed directory such as /dev/shm when
+    LATEX_SCRATCH_IN_MEMORY is set.
+
+    A background janitor removes expired outputs, sessions and orphaned
+    scratch directories, then evicts least-recently-used entries until the
+    byte and file-count quotas are met.
+    """
+
+    def __init__(
+        self,
+        root: Path = WORKSPACE_DIR,
+        scratch_in_memory: bool = SCRATCH_IN_MEMORY,
+        max_bytes: int = MAX_BYTES,
+        max_files: int = MAX_FILES,
+    ):
+        self.root = Path(root).resolve()
+        self.max_bytes = max_bytes
+        self.max_files = max_files
+
+        if scratch_in_memory and MEMORY_SCRATCH_DIR.is_dir() and os.access(MEMORY_SCRATCH_DIR, os.W_OK):
+            self.scratch_root = MEMORY_SCRATCH_DIR / f"latex-scratch-{self.root.name}"
+            self.scratch_in_memory = True
+        else:
+            if scratch_in_memory:
+                print(f"{MEMORY_SCRATCH_DIR} is not writable; using on-disk scratch space")
+            self.scratch_root = self.root / "scratch"
+            self.scratch_in_memory = False
+
+        # Per-area overrides predate the workspace and are still honoured
+        self.areas: Dict[str, Path] = {
+            "outputs": self.root / "outputs",
+            "cache": Path(os.getenv("COMPILE_CACHE_DIR", self.root / "cache")).resolve(),
+            "sessions": Path(os.getenv("LATEX_SESSION_DIR", self.root / "sessions")).resolve(),
+            "formats": Path(os.getenv("LATEX_FORMAT_DIR", self.root / "formats")).resolve(),
+            "scratch": Path(os.getenv("LATEX_SCRATCH_DIR", self.scratch_root)).resolve(),
+        }
+        self.workers_dir = Path(os.getenv("LATEX_WORKER_DIR", self.scratch_root / "workers")).resolve()
+        for path in self.areas.values():
+            path.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._janitor: Optional[threading.Thread] = None
+        self._last_usage: Dict[str, Dict[str, int]] = {}
+        self._stats = {"sweeps": 0, "expired": 0, "evicted": 0, "orphans_removed": 0, "last_sweep": 0.0}
+
+    @property
+    def outputs_dir(self) -> Path:
+        return self.areas["outputs"]
+
+    @property
+    def cache_dir(self) -> Path:
+        return self.areas["cache"]
+
+    @property
+    def sessions_dir(self) -> Path:
+        return self.areas["sessions"]
+
+    @property
+    def formats_dir(self) -> Path:
+        return self.areas["formats"]
+
+    @property
+    def scratch_dir(self) -> Path:
+        return self.areas["scratch"]
+
+    def remove_older_than(self, area: str, max_age_seconds: float, now: Optional[float] = None) -> int:
+        """Delete entries of an area whose newest file is older than max_age_seconds"""
+        now = now or time.time()
+        removed = 0
+        try:
+            entries = list(self.areas[area].iterdir())
+        except OSError:
+            return 0
+        for entry in entries:
+            if entry == self.workers_dir:
+                continue
+            _, _, newest = _tree_usage(entry)
+            if now - newest > max_age_seconds:
+                _remove(entry)
+                removed += 1
+        return removed
+
+    def _remove_orphaned_workers(self) -> int:
+        """Delete worker directories left behind by processes that have exited"""
+        removed = 0
+        try:
+            entries = list(self.workers_dir.iterdir())
+        except OSError:
+            return 0
+        for entry in entries:
+            if entry.name.startswith("pid") and entry.name[3:].isdigit() and not _pid_alive(int(entry.name[3:])):
+                _remove(entry)
+                removed += 1
+        return removed
+
+    def enforce_quota(self) -> int:
+        """Evict least-recently-used entries until the byte and file quotas hold"""
+        entries: List[Tuple[float, int, int, str, Path]] = []
+        total_bytes, total_files = 0, 0
+        usage: Dict[str, Dict[str, int]] = {}
+
+        for area, path in self.areas.items():
+            area_bytes, area_files = 0, 0
+            try:
+                children = list(path.iterdir())
+            except OSError:
+                children = []
+            for child in children:
+                size, files, newest = _tree_usage(child)
+                area_bytes += size
+                area_files += files
+                if area in EVICTABLE_AREAS:
+                    entries.append((newest, size, files, area, child))
+            usage[area] = {"bytes": area_bytes, "files": area_files}
+            total_bytes += area_bytes
+            total_files += area_files
+
+        evicted = 0
+        if total_bytes > self.max_bytes or total_files > self.max_files:
+            entries.sort(key=lambda entry: entry[0])
+            for _, size, files, area, path in entries:
+                if total_bytes <= self.max_bytes and total_files <= self.max_files:
+                    break
+                _remove(path)
+                total_bytes -= size
+                total_files -= files
+                usage[area]["bytes"] -= size
+                usage[area]["files"] -= files
+                evicted += 1
+
+        with self._lock:
+            self._last_usage = usage
+            self._stats["evicted"] += evicted
+        return evicted
+
+    def sweep(self) -> None:
+        """One janitor pass: expire old entries, drop orphans, then enforce quotas"""
+        now = time.time()
+        expired = self.remove_older_than("outputs", OUTPUT_MAX_AGE_SECONDS, now)
+        expired += self.remove_older_than("sessions", SESSION_MAX_AGE_SECONDS, now)
+        orphans = self.remove_older_than("scratch", SCRATCH_MAX_AGE_SECONDS, now)
+        orphans += self._remove_orphaned_workers()
+        self.enforce_quota()
+        with self._lock:
+            self._stats["sweeps"] += 1
+            self._stats["expired"] += expired
+            self._stats["orphans_removed"] += orphans
+            self._stats["last_sweep"] = now
+
+    def _run_janitor(self, interval: float) -> None:
+        while not self._stop.is_set():
+            try:
+                self.sweep()
+            except Exception as e:
+                print(f"Workspace janitor error: {e}")
+            self._stop.wait(interval)
+
+    def start_janitor(self, interval: float = JANITOR_INTERVAL_SECONDS) -> None:
+        """Start the background janitor thread (idempotent)"""
+        if self._janitor and self._janitor.is_alive():
+            return
+        self._stop.clear()
+        self._janitor = threading.Thread(target=self._run_janitor, args=(interval,), name="workspace-janitor", daemon=True)
+        self._janitor.start()
+
+    def stop_janitor(self) -> None:
+        """Stop the janitor thread"""
+        self._stop.set()
+
+    def stats(self) -> dict:
+        """Disk usage per area (as of the last sweep) and janitor counters"""
+        with self._lock:
+            usage = {area: dict(values) for area, values in self._last_usage.items()}
+            stats = dict(self._stats)
+        return {
+            "root": str(self.root),
+            "scratch_dir": str(self.scratch_dir),
+            "workers_dir": str(self.workers_dir),
+            "scratch_in_memory": self.scratch_in_memory,
+            "max_bytes": self.max_bytes,
+            "max_files": self.max_files,
+            "used_bytes": sum(values["bytes"] for values in usage.values()),
+            "used_files": sum(values["files"] for values in usage.values()),
+            "areas": usage,
+            **stats,
+        }
+
+
+# Singleton instance
+workspace = Workspace()
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Same layout as run.py: the backend is imported as apps.backend
+sys.path.insert(0, str(Path(__file__).parent.parent.parent.parent))
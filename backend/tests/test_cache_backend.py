@@ -0,0 +1,24 @@
+import socket
+
+from apps.backend.services.cache_backend import RedisBackend
+
+
+def _closed_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_unreachable_server_is_not_redialled_until_retry_after():
+    backend = RedisBackend(f"redis://127.0.0.1:{_closed_port()}/0", timeout=0.2, retry_after=60)
+    assert backend.get("a") is None
+    backend.set("b", b"value")
+    assert backend.get("c") is None
+    stats = backend.stats()
+    assert stats["errors"] == 1
+    assert stats["skipped"] == 2
+    assert stats["available"] is False
+
+    backend._unavailable_until = 0.0
+    assert backend.get("d") is None
+    assert backend.stats()["errors"] == 2
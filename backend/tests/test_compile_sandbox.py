@@ -0,0 +1,31 @@
+import os
+import signal
+from types import SimpleNamespace
+
+import pytest
+
+from apps.backend.services import compile_sandbox
+from apps.backend.services.compile_sandbox import CompileLimitExceeded, CompileSandbox
+
+pytestmark = pytest.mark.skipif(os.name != "posix", reason="signals and rlimits are POSIX-only")
+
+
+def usage(cpu_seconds: float) -> SimpleNamespace:
+    return SimpleNamespace(ru_utime=cpu_seconds, ru_stime=0.0)
+
+
+def test_sigkill_is_cpu_limit_only_when_cpu_time_reached_it(monkeypatch):
+    monkeypatch.setattr(compile_sandbox, "CPU_SECONDS", 20)
+    sandbox = CompileSandbox()
+    assert sandbox.classify(-signal.SIGKILL, usage(21.0)) == "cpu_limit"
+    assert sandbox.classify(-signal.SIGKILL, usage(0.5)) == "killed"
+    assert sandbox.classify(-signal.SIGKILL) == "killed"
+    assert sandbox.classify(-signal.SIGXCPU) == "cpu_limit"
+
+
+def test_external_sigkill_is_not_reported_as_cpu_limit():
+    sandbox = CompileSandbox()
+    with pytest.raises(CompileLimitExceeded) as raised:
+        sandbox.run(["sh", "-c", "kill -9 $$"], cwd=".", timeout=10)
+    assert raised.value.reason == "killed"
+    assert sandbox.stats()["cpu_limit"] == 0
@@ -0,0 +1,41 @@
+from apps.backend.services.latex_index import build_index
+
+
+def test_bracket_after_plain_command_is_text():
+    source = "\\documentclass{article}\n\\begin{document}\n$\\left[0,1\\right)$\n\\section{Skills}\nPython\n\\end{document}\n"
+    index = build_index(source)
+    assert index.errors == []
+    assert index.end_document is not None
+    assert [section.title for section in index.sections] == ["Skills"]
+
+
+def test_optional_group_stops_at_end_and_unbalanced_brace():
+    index = build_index("\\begin{document}\\item[ \\end{document}")
+    assert index.end_document is not None
+    index = build_index("{\\section[a}b]{Title}")
+    assert [command.optional for command in index.find_commands("section")] == [[]]
+
+
+def test_optional_groups_keep_their_position():
+    index = build_index("\\newcommand{\\foo}[2][x]{#1#2}\n\\begin{tabular}[t]{ll}\\end{tabular}")
+    newcommand = index.find_commands("newcommand")[0]
+    assert newcommand.optional == [(1, "2"), (1, "x")]
+    assert newcommand.args == ["\\foo", "#1#2"]
+    begin = index.find_commands("begin")[0]
+    assert begin.optional == [(1, "t")]
+    assert begin.args == ["tabular", "ll"]
+
+
+def test_multiline_package_options():
+    index = build_index("\\documentclass[\n  11pt,\n  a4paper\n]{article}")
+    command = index.find_commands("documentclass")[0]
+    assert command.args == ["article"]
+    assert command.optional[0][1].split() == ["11pt,", "a4paper"]
+
+
+def test_sections_in_preamble_macros_are_ignored():
+    source = (
+        "\\documentclass{article}\n\\newcommand{\\resSection}[1]{\\section{#1}}\n"
+        "\\begin{document}\n\\resSection{Experience}\n\\section{Education}\nBSc\n\\end{document}\n"
+    )
+    assert [section.title for section in build_index(source).sections] == ["Education"]
@@ -0,0 +1,41 @@
+from apps.backend.services.latex_validator import validate_latex
+
+DOCUMENT = """\\documentclass{article}
+%s
+\\begin{document}
+%s
+\\end{document}
+"""
+
+
+def kinds(preamble: str, body: str = "") -> list:
+    return [issue.kind for issue in validate_latex(DOCUMENT % (preamble, body))]
+
+
+def test_newcommand_with_arguments_is_accepted():
+    preamble = "\\newcommand{\\resumeItem}[1]{\\item\\small{#1 \\vspace{-2pt}}}"
+    assert kinds(preamble, "\\resumeItem{Built things}") == []
+
+
+def test_newcommand_with_default_argument_is_accepted():
+    assert kinds("\\newcommand{\\foo}[2][x]{#1 and #2}", "\\foo{y}") == []
+    assert kinds("\\renewcommand\\foo [2] [x] {#1 and #2}") == []
+
+
+def test_recursive_newcommand_with_arguments_is_rejected():
+    assert kinds("\\newcommand{\\foo}[1]{\\foo{#1}}") == ["recursive_macro"]
+    assert kinds("\\newcommand{\\foo}[2][x]{#2\\foo{#1}}") == ["recursive_macro"]
+
+
+def test_def_with_parameters():
+    assert kinds("\\def\\x#1{\\x{#1}}") == ["recursive_macro"]
+    assert kinds("\\def\\x#1{[#1]}") == []
+
+
+def test_mutually_recursive_macros_are_rejected():
+    assert kinds("\\def\\a{\\b}\\def\\b{\\a}") == ["recursive_macro"]
+
+
+def test_percent_in_urls_is_not_a_comment():
+    body = "\\href{http://a.com/~x%20y}{z} \\url{a_b%c}"
+    assert kinds("\\usepackage{hyperref}", body) == []
@@ -0,0 +1,137 @@
+import asyncio
+
+import pytest
+
+from apps.backend.services import llm_resilience
+from apps.backend.services.llm_resilience import ResilientCaller, RetryBudget
+from apps.backend.services.llm_stub import StubChatModel, StubUnavailable
+
+PROMPT = "Return ONLY the raw LaTeX source."
+
+
+def stub(latency: float = 0.0, failure_rate: float = 0.0) -> StubChatModel:
+    return StubChatModel(latency_seconds=latency, failure_rate=failure_rate)
+
+
+def sequence(*models: StubChatModel):
+    """Factory that sends each attempt to the next model (the last one repeats)"""
+    calls = []
+
+    def factory():
+        model = models[min(len(calls), len(models) - 1)]
+        calls.append(model)
+        return model.ainvoke(PROMPT)
+
+    return factory, calls
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(llm_resilience, "LLM_BACKOFF_BASE_SECONDS", 0.0)
+
+
+def test_retries_after_unavailable():
+    caller = ResilientCaller(max_attempts=3)
+    factory, calls = sequence(stub(failure_rate=1.0), stub())
+
+    result = asyncio.run(caller.call(factory))
+
+    assert result.content.startswith("\\documentclass")
+    assert len(calls) == 2
+    assert caller.stats()["retries"] == 1
+
+
+def test_retries_after_attempt_timeout():
+    caller = ResilientCaller(attempt_timeout=0.05, max_attempts=3)
+    factory, calls = sequence(stub(latency=1.0), stub())
+
+    asyncio.run(caller.call(factory))
+
+    assert len(calls) == 2
+    assert caller.stats()["succeeded"] == 1
+
+
+def test_non_retryable_error_is_raised():
+    caller = ResilientCaller(max_attempts=3)
+
+    async def broken():
+        raise ValueError("bad prompt")
+
+    with pytest.raises(ValueError):
+        asyncio.run(caller.call(broken))
+    assert caller.stats()["retries"] == 0
+
+
+def test_exhausted_budget_stops_retries():
+    caller = ResilientCaller(max_attempts=3, budget=RetryBudget(ratio=0.0, min_tokens=0.0))
+    factory, calls = sequence(stub(failure_rate=1.0), stub())
+
+    with pytest.raises(StubUnavailable):
+        asyncio.run(caller.call(factory))
+    assert len(calls) == 1
+    assert caller.stats()["retries_denied"] == 1
+
+
+def test_deadline_exceeded():
+    caller = ResilientCaller(deadline=0.1, attempt_timeout=0.05, max_attempts=5)
+    factory, _ = sequence(stub(latency=1.0))
+
+    with pytest.raises(llm_resilience.LLMDeadlineExceeded):
+        asyncio.run(caller.call(factory))
+    assert caller.stats()["deadline_exceeded"] == 1
+
+
+def test_hedge_wins_over_slow_attempt(monkeypatch):
+    monkeypatch.setattr(llm_resilience, "LLM_HEDGE_MIN_DELAY_SECONDS", 0.02)
+    caller = ResilientCaller(attempt_timeout=5, hedge=True)
+    caller._latencies.extend([0.01] * llm_resilience.LLM_HEDGE_MIN_SAMPLES)
+    factory, calls = sequence(stub(latency=2.0), stub())
+
+    asyncio.run(caller.call(factory))
+
+    stats = caller.stats()
+    assert len(calls) == 2
+    assert stats["hedges"] == 1
+    assert stats["hedge_wins"] == 1
+    assert stats["retries"] == 0
+
+
+async def _drain(stream) -> list:
+    return [chunk async for chunk in stream]
+
+
+def test_stream_relays_chunks():
+    caller = ResilientCaller()
+    chunks = asyncio.run(_drain(caller.stream(lambda: stub().astream(PROMPT))))
+    assert "".join(chunk.content for chunk in chunks).startswith("\\documentclass")
+    assert caller.stats()["succeeded"] == 1
+
+
+def test_stream_fails_when_model_stalls():
+    async def stalled():
+        yield "\\documentclass"
+        await asyncio.sleep(10)
+        yield "never"
+
+    caller = ResilientCaller(deadline=5)
+    received = []
+
+    async def run():
+        async for chunk in caller.stream(stalled, idle_timeout=0.05):
+            received.append(chunk)
+
+    with pytest.raises(llm_resilience.LLMDeadlineExceeded, match="stalled"):
+        asyncio.run(run())
+    assert received == ["\\documentclass"]
+
+
+def test_stream_fails_at_overall_deadline():
+    async def trickle():
+        while True:
+            await asyncio.sleep(0.02)
+            yield "x"
+
+    caller = ResilientCaller(deadline=0.1)
+    with pytest.raises(llm_resilience.LLMDeadlineExceeded, match="deadline"):
+        asyncio.run(_drain(caller.stream(trickle, idle_timeout=1)))
+    assert caller.stats()["deadline_exceeded"] == 1
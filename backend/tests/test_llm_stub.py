@@ -0,0 +1,19 @@
+import asyncio
+import json
+
+from apps.backend.services.llm_stub import StubChatModel, STUB_DOCUMENT
+
+
+def test_json_reply_for_structured_prompts():
+    reply = asyncio.run(StubChatModel(latency_seconds=0).ainvoke("Answer with a JSON object"))
+    assert json.loads(reply.content) == {"latex_code": STUB_DOCUMENT}
+
+
+def test_bare_latex_stream_for_streaming_prompts():
+    async def collect():
+        model = StubChatModel(latency_seconds=0)
+        return [chunk.content async for chunk in model.astream("Return ONLY the raw LaTeX source.")]
+
+    chunks = asyncio.run(collect())
+    assert len(chunks) > 1
+    assert "".join(chunks) == STUB_DOCUMENT
@@ -0,0 +1,32 @@
+from apps.backend.services.pdf_pages import page_digests
+
+
+def _pdf(font_file: bytes, image: bytes) -> bytes:
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R 4 0 R] /Count 2 /Resources 6 0 R >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents 5 0 R >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents 5 0 R /Resources << /XObject << /Im1 9 0 R >> >> >>",
+        b"<< /Length 4 >>\nstream\nBT\nET\nendstream",
+        b"<< /Font << /F1 7 0 R >> >>",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /CMR10 /FontDescriptor 8 0 R >>",
+        b"<< /Type /FontDescriptor /FontName /CMR10 /FontFile 10 0 R >>",
+        b"<< /Type /XObject /Subtype /Image /Length %d >>\nstream\n%s\nendstream" % (len(image), image),
+        b"<< /Length %d >>\nstream\n%s\nendstream" % (len(font_file), font_file),
+    ]
+    return b"%PDF-1.4\n" + b"".join(b"%d 0 obj\n%s\nendobj\n" % (n, body) for n, body in enumerate(objects, 1))
+
+
+def test_embedded_font_and_image_data_change_digests():
+    base = page_digests(_pdf(b"glyphs", b"red"))
+    assert base is not None and len(base) == 2
+    font = page_digests(_pdf(b"GLYPHS", b"red"))
+    assert font[0] != base[0]
+    image = page_digests(_pdf(b"glyphs", b"blue"))
+    assert image[0] == base[0] and image[1] != base[1]
+    assert page_digests(_pdf(b"glyphs", b"red")) == base
+
+
+def test_dangling_resource_reference_is_unknown():
+    pdf = _pdf(b"glyphs", b"red").replace(b"/FontFile 10 0 R", b"/FontFile 11 0 R")
+    assert page_digests(pdf) is None
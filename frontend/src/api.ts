@@ -1,7 +1,9 @@
 import axios from 'axios';
 
+const API_ORIGIN = 'http://localhost:8000';
+
 const api = axios.create({
-    baseURL: 'http://localhost:8000/api',
+    baseURL: `${API_ORIGIN}/api`,
     headers: {
         'Content-Type': 'application/json',
     },
@@ -49,11 +51,13 @@ export const compilePreview = async (latexContent: string): Promise<string> => {
 };
 
 export const editResume = async (currentContent: string,
-    instruction: string
+    instruction: string,
+    sectionName?: string
 ): Promise<GeneratedResume> => {
     const response = await api.post<GeneratedResume>('/edit', {
         current_content: currentContent,
         instruction,
+        section_name: sectionName,
     });
     return response.data;
 };
@@ -65,6 +69,26 @@ export const compilePDFBase64 = async (latexContent: string): Promise<{ success:
     return response.data;
 };
 
+export interface CompiledPDF {
+    success: boolean;
+    artifact_id: string | null;
+    pdf_url: string | null;
+    error: string | null;
+}
+
+// Compiles to a content-addressed artifact; unchanged sources keep the same
+// URL, so the browser cache (ETag + immutable) avoids refetching the PDF.
+export const compilePDF = async (latexContent: string): Promise<CompiledPDF> => {
+    const response = await api.post<CompiledPDF>('/compile-pdf', {
+        latex_content: latexContent,
+    });
+    const result = response.data;
+    return {
+        ...result,
+        pdf_url: result.pdf_url ? `${API_ORIGIN}${result.pdf_url}` : null,
+    };
+};
+
 export const chatEdit = async (message: string, latexContent: string): Promise<{ latex_content: string; success: boolean; error: string | null }> => {
     const response = await api.post<{ latex_content: string; success: boolean; error: string | null }>('/chat-edit', {
         message,
@@ -110,7 +134,7 @@ export const login = async (data: LoginData): Promise<AuthResponse> => {
 // Set auth token for API requests
 export const setAuthToken = (token: string | null) => {
     if (token) {
-        api.defaults.headers.common['Authorization'] = `Bearer ${token} `;
+        api.defaults.headers.common['Authorization'] = `Bearer ${token}`;
     } else {
         delete api.defaults.headers.common['Authorization'];
     }
@@ -7,7 +7,7 @@ import { FileTree } from '../components/editor/FileTree';
 import { CodePanel } from '../components/editor/CodePanel';
 import { PDFPreview } from '../components/editor/PDFPreview';
 import { ChatPanel } from '../components/editor/ChatPanel';
-import { compilePDFBase64, chatEdit } from '../api';
+import { compilePDF, chatEdit } from '../api';
 
 export function EditorPage() {
     const location = useLocation();
@@ -94,10 +94,10 @@ Database & SQL, MongoDB, MySQL, PostgreSQL, SQLite
         setCompilationError(null);
 
         try {
-            const result = await compilePDFBase64(latexContent);
+            const result = await compilePDF(latexContent);
 
-            if (result.success && result.pdf) {
-                setPdfData(result.pdf);
+            if (result.success && result.pdf_url) {
+                setPdfData(result.pdf_url);
             } else {
                 setCompilationError(result.error || 'Unknown compilation error');
             }
@@ -109,19 +109,11 @@ Database & SQL, MongoDB, MySQL, PostgreSQL, SQLite
         }
     };
 
-    const handleDownload = () => {
+    const handleDownload = async () => {
         if (pdfData) {
-            // Convert base64 to blob and download
-            const base64Data = pdfData.split(',')[1];
-            const binaryData = atob(base64Data);
-            const arrayBuffer = new ArrayBuffer(binaryData.length);
-            const uint8Array = new Uint8Array(arrayBuffer);
-
-            for (let i = 0; i < binaryData.length; i++) {
-                uint8Array[i] = binaryData.charCodeAt(i);
-            }
-
-            const blob = new Blob([uint8Array], { type: 'application/pdf' });
+            // The artifact is usually already in the browser cache
+            const response = await fetch(pdfData);
+            const blob = await response.blob();
             const url = URL.createObjectURL(blob);
             const link = document.createElement('a');
             link.href = url;